@@ -13,6 +13,8 @@ This module is built on top of the Pydle system.
 
 """
 import asyncio
+import contextlib
+import signal
 
 from loguru import logger
 
@@ -25,11 +27,12 @@ from src.packages import cli_manager
 from src.packages import ratmama  # pylint: disable=unused-import
 from src.packages.commands import command
 from src.packages.context import Context
+from src.packages.fact_manager import transaction_log
 from src.packages.permissions import require_permission, RAT
 
 
-@require_permission(RAT)
 @command("ping")
+@require_permission(RAT)
 async def cmd_ping(context: Context):
     """
     Pongs a ping. lets see if the bots alive (command decorator testing)
@@ -76,5 +79,11 @@ async def start():
 # entry point
 if __name__ == "__main__":
     LOOP = asyncio.get_event_loop()
-    LOOP.run_until_complete(start())
-    LOOP.run_forever()
+    # stopping the loop on SIGTERM as on ^C, so everything buffered still gets written
+    with contextlib.suppress(NotImplementedError):
+        LOOP.add_signal_handler(signal.SIGTERM, LOOP.stop)
+    try:
+        LOOP.run_until_complete(start())
+        LOOP.run_forever()
+    finally:
+        LOOP.run_until_complete(transaction_log.flush_all())
@@ -13,8 +13,11 @@ See LICENSE.md
 
 from ..config import setup
 from ..packages.cli_manager import cli_manager
-from ..packages.commands import command
+from ..packages.commands import command, stats
 from ..packages.context import Context
+from ..packages.database import metrics
+from ..packages.fact_manager import transaction_log
+from ..packages.outbound import Priority
 from ..packages.permissions import require_channel, require_permission, TECHRAT
 from loguru import logger
 from importlib import metadata
@@ -31,6 +34,9 @@ async def cmd_rehash(context: Context):
     logger.warning(f"config rehashing invoked by user {context.user.nickname}")
     path = cli_manager.GET_ARGUMENTS().config_file
     await context.reply(f"reloading configuration...")
+    # rows logged so far are written where the configuration they were logged under says
+    if not await transaction_log.flush_all():
+        logger.warning("transaction log rows left unwritten, they are kept for later.")
     try:
         _, resulting_hash = setup(path)
     except (KeyError, ValueError) as exc:
@@ -52,3 +58,37 @@ async def cmd_version(ctx: Context):
         return await ctx.reply(metadata.version("pipsqueak3"))
     except metadata.PackageNotFoundError:
         return await ctx.reply("version ?.?.? (dirty)")
+
+
+@command("stats")
+@require_permission(TECHRAT)
+async def cmd_stats(ctx: Context):
+    """
+    Invocation latency statistics.
+
+    Usage: !stats [name|database]
+
+    Without a name, shows the five invocations with the slowest 95th percentile.
+    """
+    if len(ctx.words) > 1 and ctx.words[1].casefold() == "database":
+        if not metrics.enabled():
+            return await ctx.reply("database statistics are disabled.")
+        for line in metrics.summarize():
+            await ctx.reply(line, priority=Priority.BULK)
+        return None
+
+    recorded = stats.snapshot()
+    if len(ctx.words) > 1:
+        wanted = ctx.words[1].casefold()
+        selected = [(key, value) for key, value in recorded.items() if key[1].casefold() == wanted]
+        if not selected:
+            return await ctx.reply(f"nothing recorded for {ctx.words[1]!r}.")
+    else:
+        if not recorded:
+            return await ctx.reply("nothing recorded yet.")
+        selected = sorted(recorded.items(),
+                          key=lambda item: (item[1].wall.quantile(0.95), item[1].wall.count),
+                          reverse=True)[:5]
+
+    for (kind, name), value in selected:
+        await ctx.reply(stats.summarize(kind, name, value), priority=Priority.BULK)
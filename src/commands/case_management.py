@@ -24,6 +24,7 @@ from ._list_flags import ListFlags
 from ..packages.commands import command
 from ..packages.context.context import Context
 from ..packages.epic import Epic
+from ..packages.outbound import Priority
 from ..packages.permissions.permissions import (
     require_permission,
     RAT,
@@ -60,9 +61,9 @@ def _validate(ctx: Context, validate: str) -> typing.Optional[Rescue]:
     return rescue
 
 
+@command("active", "activate", "inactive", "deactivate")
 @require_channel
 @require_permission(RAT)
-@command("active", "activate", "inactive", "deactivate")
 async def cmd_case_management_active(ctx: Context):
     """
     Toggles the indicated case as active or inactive.  Requires an OPEN case.
@@ -92,9 +93,9 @@ async def cmd_case_management_active(ctx: Context):
         await ctx.reply(f'{case.client}\'s case is now {"Active" if case.active else "Inactive"}.')
 
 
+@command("assign", "add", "go")
 @require_channel
 @require_permission(RAT)
-@command("assign", "add", "go")
 async def cmd_case_management_assign(ctx: Context):
     if len(ctx.words) <= 2:
         await ctx.reply("Usage: !assign <Client Name|Case Number> <Rat 1> <Rat 2> <Rat 3>")
@@ -128,9 +129,9 @@ async def cmd_case_management_assign(ctx: Context):
     )
 
 
+@command("clear", "close")
 @require_channel
 @require_permission(RAT)
-@command("clear", "close")
 async def cmd_case_management_clear(ctx: Context):
     if len(ctx.words) < 2 or len(ctx.words) > 3:
         await ctx.reply("Usage: !clear <Client Name|Board Index> [First Limpet Sender]")
@@ -171,9 +172,9 @@ async def cmd_case_management_clear(ctx: Context):
     await ctx.reply(f"Case {case.client} was cleared!")
 
 
+@command("cmdr", "commander")
 @require_channel
 @require_permission(RAT)
-@command("cmdr", "commander")
 async def cmd_case_management_cmdr(ctx: Context):
     if len(ctx.words) < 2:
         await ctx.reply("Usage: !cmdr <Client Name|Board Index> <CMDR name>")
@@ -191,9 +192,9 @@ async def cmd_case_management_cmdr(ctx: Context):
         await ctx.reply(f"Client for {case.board_index} is now CMDR {case.client}")
 
 
-@require_channel
-@require_channel(RAT)
 @command("codered", "casered", "cr")
+@require_channel
+@require_permission(RAT)
 async def cmd_case_management_codered(ctx: Context):
     if len(ctx.words) < 2:
         await ctx.reply("Usage: !codered <Client Name|Board Index>")
@@ -214,9 +215,9 @@ async def cmd_case_management_codered(ctx: Context):
             await ctx.reply(f"{case.client} is no longer a Code Red.")
 
 
+@command("delete")
 @require_channel
 @require_permission(OVERSEER)
-@command("delete")
 async def cmd_case_management_delete(ctx: Context):
     if len(ctx.words) < 2:
         await ctx.reply("Usage: !delete <API ID>")
@@ -238,9 +239,9 @@ async def cmd_case_management_delete(ctx: Context):
         await ctx.bot.board.remove_rescue(rescue)
 
 
+@command("epic")
 @require_channel
 @require_permission(RAT)
-@command("epic")
 async def cmd_case_management_epic(ctx: Context):
     # This command may be depreciated, and not used.  It's left in only as an artifact, or
     # if that changes.
@@ -275,9 +276,9 @@ async def cmd_case_management_epic(ctx: Context):
         await ctx.reply(f"Description: {new_epic.notes}")
 
 
+@command("grab")
 @require_channel
 @require_permission(RAT)
-@command("grab")
 async def cmd_case_management_grab(ctx: Context):
     if len(ctx.words) != 2:
         await ctx.reply("Usage: !grab <Client Name>")
@@ -318,9 +319,9 @@ async def cmd_case_management_grab(ctx: Context):
         )
 
 
+@command("inject")
 @require_channel
 @require_permission(RAT)
-@command("inject")
 async def cmd_case_management_inject(ctx: Context):
     if len(ctx.words) < 3:
         await ctx.reply("Usage: !inject <Client Name|Board Index> <Text to Add>")
@@ -347,11 +348,14 @@ async def cmd_case_management_inject(ctx: Context):
                 case.code_red = True
 
             await ctx.reply(
-                f"{case.client}'s case opened with: " f"{ctx.words_eol[2]}  (Case {case.board_index})"
+                f"{case.client}'s case opened with: " f"{ctx.words_eol[2]}  (Case {case.board_index})",
+                priority=Priority.SIGNAL,
             )
 
             if case.code_red:
-                await ctx.reply(f"Code Red! {case.client} is on Emergency Oxygen!")
+                await ctx.reply(
+                    f"Code Red! {case.client} is on Emergency Oxygen!", priority=Priority.SIGNAL
+                )
 
             return
 
@@ -363,9 +367,9 @@ async def cmd_case_management_inject(ctx: Context):
     )
 
 
+@command("ircnick", "nick", "nickname")
 @require_channel
 @require_permission(RAT)
-@command("ircnick", "nick", "nickname")
 async def cmd_case_management_ircnick(ctx: Context):
     if len(ctx.words) < 3:
         await ctx.reply("Usage: !ircnick <Client Name|Board Index> <New Client Name>")
@@ -391,9 +395,9 @@ async def cmd_case_management_ircnick(ctx: Context):
         )
 
 
+@command("pc", "ps", "xb")
 @require_channel
 @require_permission(RAT)
-@command("pc", "ps", "xb")
 async def cmd_case_management_system(ctx: Context):
     if len(ctx.words) < 2:
         await ctx.reply("Usage: !pc <Client Name|Board Index>")
@@ -411,9 +415,9 @@ async def cmd_case_management_system(ctx: Context):
         await ctx.reply(f"{case.client}'s platform set to {case.platform.value}.")
 
 
-@require_channel()
-@require_permission(RAT)
 @command("quote")
+@require_channel
+@require_permission(RAT)
 async def cmd_case_management_quote(ctx: Context):
     if len(ctx.words) < 2:
         await ctx.reply("Usage: !quote <Client Name|Board Index>")
@@ -440,12 +444,14 @@ async def cmd_case_management_quote(ctx: Context):
                 max_units=2,
             )
             quote_timestamp = f"{delta} ago"
-            await ctx.reply(f"[{i}][{quote.author} ({quote_timestamp})] {quote.message}")
+            await ctx.reply(
+                f"[{i}][{quote.author} ({quote_timestamp})] {quote.message}", priority=Priority.BULK
+            )
 
 
-@require_channel()
-@require_permission(OVERSEER)
 @command("quoteid")
+@require_channel
+@require_permission(OVERSEER)
 async def cmd_case_management_quoteid(ctx: Context):
     # TODO: Remove NYI Message when API capability is ready.
     await ctx.reply("Use !quote.  API is not available in offline mode.")
@@ -488,18 +494,18 @@ async def cmd_case_management_quoteid(ctx: Context):
             await ctx.reply(f"[{i}][{quote.author} ({quote_timestamp})] {quote.message}")
 
 
-@require_channel()
-@require_permission(OVERSEER)
 @command("reopen")
+@require_channel
+@require_permission(OVERSEER)
 async def cmd_case_management_reopen(ctx: Context):
     # TODO: Add Re-open command with API pass
     await ctx.reply("Not available in offline mode.")
     return
 
 
-@require_channel()
-@require_permission(OVERSEER)
 @command("sub")
+@require_channel
+@require_permission(OVERSEER)
 async def cmd_case_management(ctx: Context):
     if len(ctx.words) < 3:
         return await ctx.reply("Usage: !sub <Client Name|Board Index> <Quote Number> [New Text]")
@@ -542,9 +548,9 @@ async def cmd_case_management(ctx: Context):
         await ctx.reply(f"Deleted line {quote_id}.")
 
 
+@command("sys", "loc", "location")
 @require_channel
 @require_permission(RAT)
-@command("sys", "loc", "location")
 async def cmd_case_management(ctx: Context):
     if len(ctx.words) < 3:
         return await ctx.reply("Usage: !sys <Client Name|Board Index> <New System>")
@@ -559,9 +565,9 @@ async def cmd_case_management(ctx: Context):
         await ctx.reply(f"{case.client}'s system set to {ctx.words_eol[2]!r}")
 
 
+@command("title")
 @require_channel
 @require_permission(RAT)
-@command("title")
 async def cmd_case_management_title(ctx: Context):
     if len(ctx.words) < 2:
         await ctx.reply("Usage: !title <Client Name|Board Index> <Operation Title")
@@ -578,9 +584,9 @@ async def cmd_case_management_title(ctx: Context):
         await ctx.reply(f"{case.client}'s rescue title set to {ctx.words_eol[2]!r}")
 
 
+@command("unassign", "rm", "remove", "standdown")
 @require_channel
 @require_permission(RAT)
-@command("unassign", "rm", "remove", "standdown")
 async def cmd_case_management_unassign(ctx: Context):
     if len(ctx.words) < 3:
         return await ctx.reply("Usage: !unassign <Client Name|Case Number> <Rat 1> <Rat 2> <Rat 3>")
@@ -687,14 +693,14 @@ async def cmd_list(ctx: Context):
 
         output = _list_rescue(active_rescues, format_specifiers)
         if output:
-            await ctx.reply(output)
+            await ctx.reply(output, priority=Priority.BULK)
     if flags.show_inactive:
         if not inactive_rescues:
             return await ctx.reply("No inactive rescues.")
 
         output = _list_rescue(inactive_rescues, format_specifiers)
         if output:
-            await ctx.reply(output)
+            await ctx.reply(output, priority=Priority.BULK)
 
 
 def _list_rescue(rescue_collection, format_specifiers):
@@ -9,13 +9,13 @@ Licensed under the BSD 3-Clause License.
 See LICENSE.md
 """
 
-import asyncio
 import uuid
 from typing import Optional
 
 from ..packages.commands import command
 from ..packages.context.context import Context
 from ..packages.mark_for_deletion import MarkForDeletion
+from ..packages.outbound import Priority
 from ..packages.permissions.permissions import (
     require_permission,
     RAT,
@@ -44,9 +44,9 @@ def _validate(ctx: Context, validate: str) -> Optional[Rescue]:
     return rescue
 
 
+@command("md", "mdadd")
 @require_channel
 @require_permission(RAT)
-@command("md", "mdadd")
 async def del_management_md(ctx: Context):
     if len(ctx.words) <= 2:
         await ctx.reply("Usage: !md <Client Name|Board Index> <Reason for Deletion>")
@@ -73,11 +73,12 @@ async def del_management_md(ctx: Context):
     await ctx.bot.board.remove_rescue(rescue)
 
 
+@command("mdlist")
 @require_channel
 @require_permission(OVERSEER)
-@command("mdlist")
 async def del_management_mdlist(ctx: Context):
-    await ctx.reply("Marked for Deletion List:")
+    # pacing is left to the outbound scheduler, the whole listing shares the bulk lane.
+    await ctx.reply("Marked for Deletion List:", priority=Priority.BULK)
 
     for rescue in ctx.bot.board.values():
         if rescue.marked_for_deletion.marked:
@@ -85,8 +86,8 @@ async def del_management_mdlist(ctx: Context):
                 f"[@{rescue.api_id}] {rescue.client} "
                 f"{rescue.platform.value if rescue.platform else ''} "
                 f"Reason: {rescue.marked_for_deletion.reason}, "
-                f"Reporter: {rescue.marked_for_deletion.reporter}"
+                f"Reporter: {rescue.marked_for_deletion.reporter}",
+                priority=Priority.BULK,
             )
-            await asyncio.sleep(delay=0.5)
 
-    await ctx.reply("(End of Marked for Deletion list)")
+    await ctx.reply("(End of Marked for Deletion list)", priority=Priority.BULK)
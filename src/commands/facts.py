@@ -0,0 +1,60 @@
+"""
+facts.py - Fact lookup commands
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+from ..packages.commands import command
+from ..packages.context import Context
+from ..packages.ratelimit import expensive
+
+SEARCH_THRESHOLD = 0.2
+"""least similarity of a fact name to !factsearch for, looser than suggestions are"""
+
+SEARCH_LIMIT = 10
+"""most fact names !factsearch replies with"""
+
+FIND_LIMIT = 5
+"""most facts !factfind replies with"""
+
+
+@command("factsearch")
+@expensive
+async def cmd_factsearch(ctx: Context):
+    """
+    Search fact names and aliases similar to a word.
+
+    Usage: !factsearch <word> [lang]
+    """
+    if len(ctx.words) not in (2, 3):
+        return await ctx.reply("usage: !factsearch <word> [lang]")
+
+    word = ctx.words[1].casefold()
+    lang = ctx.words[2].casefold() if len(ctx.words) == 3 else "en"
+    found = await ctx.bot.fact_manager.suggest(word, lang, SEARCH_LIMIT, SEARCH_THRESHOLD)
+    if not found:
+        return await ctx.reply(f"No facts similar to {word!r}.")
+    return await ctx.reply(f"Facts similar to {word!r}: {', '.join(found)}")
+
+
+@command("factfind")
+@expensive
+async def cmd_factfind(ctx: Context):
+    """
+    Find facts whose messages mention some words, best match first.
+
+    Usage: !factfind <words>
+    """
+    if len(ctx.words) < 2:
+        return await ctx.reply("usage: !factfind <words>")
+
+    text = ctx.words_eol[1]
+    found = await ctx.bot.fact_manager.search_text(text, FIND_LIMIT)
+    if not found:
+        return await ctx.reply(f"No facts mention {text!r}.")
+    return await ctx.reply(f"Facts mentioning {text!r}: "
+                           f"{', '.join(f'{name}-{lang}' for name, lang in found)}")
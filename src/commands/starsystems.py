@@ -1,11 +1,13 @@
 from ..packages.context import Context
 from ..packages.commands import command
 from ..packages import permissions
+from ..packages.ratelimit import expensive
 from loguru import logger
 
 
-@permissions.require_permission(permissions.RAT)
 @command("search")
+@expensive
+@permissions.require_permission(permissions.RAT)
 async def cmd_search(ctx: Context):
     if len(ctx.words) != 2:
         return await ctx.reply("Usage: search <name of system>")
@@ -28,8 +30,9 @@ async def cmd_landmark_near(ctx: Context):
     return await ctx.reply(f"{nearest_landmark}")
 
 
-@permissions.require_permission([permissions.RAT])
 @command("landmark")
+@expensive
+@permissions.require_permission(permissions.RAT)
 async def cmd_landmark(ctx: Context):
     if len(ctx.words) < 2:
         return await ctx.reply("Valid subcommands: 'near'")
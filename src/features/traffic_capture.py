@@ -0,0 +1,56 @@
+"""
+traffic_capture.py - Capture of inbound IRC traffic, for later replay
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import typing
+
+from loguru import logger
+from pydle.features.rfc1459.client import RFC1459Support
+
+from ..packages.capture import CaptureWriter
+
+
+class TrafficCaptureClient(RFC1459Support):
+    # no __slots__, a second slotted mixin would conflict with MessageHistoryClient's layout
+
+    def __init__(self, nickname, fallback_nicknames=[], username=None, realname=None, eventloop=None,
+                 **kwargs):
+        super().__init__(nickname, fallback_nicknames, username, realname, eventloop, **kwargs)
+        self.__capture: typing.Optional[CaptureWriter] = None
+
+    async def on_message(self, target: str, by: str, message: str):
+        if self.__capture is not None:
+            user = self.users.get(by.casefold()) or {}
+            self.__capture.write(target, by, user.get("hostname"), message)
+
+        return await super().on_message(target, by, message)
+
+    def start_capture(self, path: str):
+        """
+        Starts capturing inbound messages into *path*, replacing any capture in progress.
+        """
+        self.stop_capture()
+        logger.info("capturing inbound traffic to {}", path)
+        self.__capture = CaptureWriter(path)
+
+    def stop_capture(self):
+        """
+        Stops capturing inbound messages, if a capture is in progress.
+        """
+        if self.__capture is not None:
+            logger.info("stopped capturing inbound traffic to {}", self.__capture.path)
+            self.__capture.close()
+            self.__capture = None
+
+    @property
+    def capturing(self) -> bool:
+        """
+        Whether inbound messages are being captured
+        """
+        return self.__capture is not None
@@ -0,0 +1,69 @@
+"""
+user_cache.py - Shared, event maintained User objects
+
+Building a `User` out of pydle's user data for every single inbound message is wasted effort, as
+that data only ever changes in response to a handful of IRC events. Users are built once, shared
+by every context, and forgotten whenever pydle syncs, renames or destroys their data.
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import typing
+
+from pydle.features.rfc1459.client import RFC1459Support
+
+from ..packages.user import User
+
+
+class UserCacheClient(RFC1459Support):
+    """
+    Must precede pydle's Client in the bases, some of its features don't pass events on to super.
+    """
+    # no __slots__, a second slotted mixin would conflict with MessageHistoryClient's layout
+
+    def _reset_attributes(self):
+        super()._reset_attributes()
+        # pydle starts over with an empty user database, so do we
+        self.__users: typing.Dict[str, typing.Tuple[typing.Dict, User]] = {}
+
+    def _sync_user(self, nick, metadata):
+        self.__users.pop(nick.casefold(), None)
+        super()._sync_user(nick, metadata)
+
+    def _rename_user(self, user, new):
+        self.__users.pop(user.casefold(), None)
+        self.__users.pop(new.casefold(), None)
+        super()._rename_user(user, new)
+
+    def _destroy_user(self, nickname, channel=None):
+        self.__users.pop(nickname.casefold(), None)
+        super()._destroy_user(nickname, channel)
+
+    def get_user(self, nickname: str) -> typing.Optional[User]:
+        """
+        Returns the User currently known by *nickname*, or None if there is no such user.
+        """
+        key = nickname.casefold()
+        data = self.users.get(key)
+        if data is None:
+            return None
+
+        cached = self.__users.get(key)
+        # the data itself being replaced doesn't go through pydle's events
+        if cached is not None and cached[0] is data:
+            return cached[1]
+
+        user = User(**data)
+        self.__users[key] = (data, user)
+        return user
+
+    @property
+    def cached_users(self) -> int:
+        """
+        Number of users currently cached
+        """
+        return len(self.__users)
@@ -17,15 +17,21 @@ from loguru import logger
 from uuid import uuid4
 
 from pydle import Client
+from pydle.features.rfc1459.protocol import MESSAGE_LENGTH_LIMIT
 from .packages.board import RatBoard
-from .packages.commands import trigger
+from .packages.commands import trigger, PreFilter, LineKind, stats
 from .packages.permissions import require_permission, TECHRAT
 from .packages.context.context import Context
+from .packages.dispatcher import Dispatcher, Lane
 from .packages.fact_manager.fact_manager import FactManager
 from .packages.galaxy import Galaxy
+from .packages.outbound import OutboundScheduler, Priority
+from .packages.ratelimit import RateLimiter
 from .packages.graceful_errors import graceful_errors
 from .packages.utils import sanitize
 from .features.message_history import MessageHistoryClient
+from .features.traffic_capture import TrafficCaptureClient
+from .features.user_cache import UserCacheClient
 
 from typing import Dict
 from datetime import datetime, timezone
@@ -36,7 +42,7 @@ async def _on_invite(ctx: Context):
     await ctx.bot.join(ctx.channel)
 
 
-class MechaClient(Client, MessageHistoryClient):
+class MechaClient(UserCacheClient, Client, TrafficCaptureClient, MessageHistoryClient):
     """
     MechaSqueak v3
     """
@@ -62,6 +68,10 @@ class MechaClient(Client, MessageHistoryClient):
         self._config = mecha_config if mecha_config else {}
         self._galaxy = None
         self._start_time = datetime.now(tz=timezone.utc)
+        self._prefilter = PreFilter()
+        self._dispatcher = Dispatcher(trigger, self._report_error)
+        self._outbound = OutboundScheduler(self._send_line, self._line_budget)
+        self._rate_limiter = RateLimiter()
         self._on_invite = require_permission(TECHRAT)(functools.partial(self._on_invite))
         super().__init__(*args, **kwargs)
 
@@ -77,6 +87,13 @@ class MechaClient(Client, MessageHistoryClient):
             await self.join(channel)
 
         logger.debug("joined channels.")
+        stats.start_exporter()
+        # warms the database connections up in the background, and keeps an eye on them
+        self.fact_manager.start_monitor()
+        self.fact_manager.start_refresh()
+        capture_file = self._config.get("capture", {}).get("file")
+        if capture_file and not self.capturing:
+            self.start_capture(capture_file)
         # call the super
         await super().on_connect()
 
@@ -104,7 +121,7 @@ class MechaClient(Client, MessageHistoryClient):
         :return:
         """
         await super().on_message(channel, user, message)
-        logger.debug(f"{channel}: <{user}> {message}")
+        logger.debug("{}: <{}> {}", channel, user, message)
 
         if user == self._config["irc"]["nickname"]:
             # don't do this and the bot can get int o an infinite
@@ -114,23 +131,64 @@ class MechaClient(Client, MessageHistoryClient):
         # await command execution
         # sanitize input string headed to command executor
         sanitized_message = sanitize(message)
-        logger.debug(f"Sanitized {sanitized_message}, Original: {message}")
+        logger.debug("Sanitized {}, Original: {}", sanitized_message, message)
         try:
             self._last_user_message[user.casefold()] = sanitized_message  # Store sanitized message
+            kind = self._prefilter.classify(sanitized_message)
+            if not kind.dispatchable:
+                # nothing could possibly be triggered, don't bother building a context.
+                logger.trace("ignoring chatter")
+                return
+
             ctx = await Context.from_message(self, channel, user, sanitized_message)
             if not ctx.words:
                 logger.trace("ignoring empty message")
                 return
 
-            await trigger(ctx)
+            # execution is queued, so one slow command doesn't hold up the whole connection.
+            lane = Lane.SIGNAL if kind is LineKind.PREFIXLESS else Lane.COMMAND
+            self._dispatcher.submit(ctx, lane)
 
         # Disable pylint's complaint here, as a broad catch is exactly what we want.
         except Exception as ex:  # pylint: disable=broad-except
-            ex_uuid = uuid4()
-            logger.exception(ex_uuid)
-            error_message = graceful_errors.make_graceful(ex, ex_uuid)
-            # and report it to the user
-            await self.message(channel, error_message)
+            await self._report_error(channel, ex)
+
+    async def _report_error(self, target, ex: Exception):
+        """
+        Log an exception and report it, gracefully, to the user
+
+        Args:
+            target: channel to report to, or the context of the failing command
+            ex: the exception
+        """
+        if isinstance(target, Context):
+            target = target.target
+        ex_uuid = uuid4()
+        logger.exception(ex_uuid)
+        error_message = graceful_errors.make_graceful(ex, ex_uuid)
+        # and report it to the user
+        await self.message(target, error_message)
+
+    async def message(self, target: str, message: str, priority: Priority = Priority.REPLY):
+        """
+        Queue a message to a channel or user, sent as fast as flood limits permit
+
+        Args:
+            target: channel or nickname to send to
+            message: message body, split as necessary
+            priority: outbound lane to queue the message onto
+        """
+        self._outbound.submit(target, message, priority)
+
+    async def _send_line(self, target: str, line: str):
+        await super().message(target, line)
+
+    def _line_budget(self, target: str) -> int:
+        """
+        Byte budget of a single PRIVMSG payload to *target*, leaving the same leeway pydle does
+        """
+        hostmask = self._format_user_mask(self.nickname)
+        return MESSAGE_LENGTH_LIMIT - len(f"{hostmask} PRIVMSG {target} :".encode()) - 25
 
     # Vhost Handler
     async def on_raw_396(self, message):
@@ -246,6 +304,34 @@ class MechaClient(Client, MessageHistoryClient):
         del self._galaxy
         self._galaxy = None
 
+    @property
+    def prefilter(self) -> PreFilter:
+        """
+        Inbound line pre-classifier, exposes the hit/drop counters
+        """
+        return self._prefilter
+
+    @property
+    def dispatcher(self) -> Dispatcher:
+        """
+        Command dispatcher, exposes the queue depths and lane metrics
+        """
+        return self._dispatcher
+
+    @property
+    def outbound(self) -> OutboundScheduler:
+        """
+        Outbound message scheduler, exposes the lane depths and counters
+        """
+        return self._outbound
+
+    @property
+    def rate_limiter(self) -> RateLimiter:
+        """
+        Per-caller command rate limiter, exposes the dropped request counters
+        """
+        return self._rate_limiter
+
     @property
     def last_user_message(self) -> Dict[str, str]:
         return self._last_user_message
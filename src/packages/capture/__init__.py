@@ -0,0 +1,17 @@
+"""
+__init__.py - Capture of inbound IRC traffic
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+from src.config import PLUGIN_MANAGER
+from .capture import CaptureWriter, CaptureFormatError, Record, read_capture
+from . import capture as _capture
+
+__all__ = ["CaptureWriter", "CaptureFormatError", "Record", "read_capture"]
+
+PLUGIN_MANAGER.register(_capture, "capture")
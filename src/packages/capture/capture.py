@@ -0,0 +1,183 @@
+"""
+capture.py - Compact on-disk format for captured inbound IRC traffic
+
+A capture file starts with a header line holding the format version and the wall clock time the
+capture started at. Every following line is a single inbound message, as tab separated fields:
+
+    offset  channel  sender  hostname  message
+
+where *offset* is the number of seconds since the capture started. Tabs, newlines and backslashes
+within fields are backslash escaped. Files whose name ends in ``.gz`` are gzip compressed.
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+from __future__ import annotations
+
+import gzip
+import re
+import typing
+from datetime import datetime, timezone
+from time import monotonic, time
+
+from src.config import CONFIG_MARKER
+
+MAGIC = "#mecha-capture"
+VERSION = 1
+
+_ESCAPES = {"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"}
+_UNESCAPES = {escaped: raw for raw, escaped in _ESCAPES.items()}
+_ESCAPE_RE = re.compile(r"[\\\t\n\r]")
+_UNESCAPE_RE = re.compile(r"\\[\\tnr]")
+
+_FLUSH_EVERY = 64
+"""number of records written between flushes"""
+
+
+class CaptureFormatError(ValueError):
+    """
+    The file is not a capture, or a record of it is malformed
+    """
+
+
+@CONFIG_MARKER
+def validate_config(data: typing.Dict):
+    """
+    Validate new configuration data.
+
+    The capture section is optional.
+
+    Args:
+        data (typing.Dict): new configuration data  to validate
+
+    Raises:
+        ValueError:  config section failed to validate.
+    """
+    section = data.get("capture", {})
+
+    if "file" in section and not isinstance(section["file"], str):
+        raise ValueError("[capture]file must be a string.")
+
+
+@CONFIG_MARKER
+def rehash_handler(data: typing.Dict):  # pylint: disable=unused-argument
+    """
+    Apply new configuration data
+
+    Capturing is started upon connecting, there is nothing to apply on rehash.
+
+    Args:
+        data (typing.Dict): new configuration data to apply.
+    """
+
+
+def _escape(field: str) -> str:
+    return _ESCAPE_RE.sub(lambda match: _ESCAPES[match.group()], field)
+
+
+def _unescape(field: str) -> str:
+    return _UNESCAPE_RE.sub(lambda match: _UNESCAPES[match.group()], field)
+
+
+def _open(path: str, mode: str) -> typing.TextIO:
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+class Record(typing.NamedTuple):
+    """
+    A single captured inbound message
+    """
+    offset: float
+    """seconds since the capture started"""
+    timestamp: datetime
+    """wall clock time the message was received at"""
+    channel: str
+    sender: str
+    hostname: typing.Optional[str]
+    """the sender's hostname at the time, if it was known"""
+    message: str
+    """the raw, unsanitized message"""
+
+
+class CaptureWriter:
+    """
+    Appends inbound messages to a new capture file.
+
+    Args:
+        path: file to write, truncated if it exists
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._file = _open(path, "w")
+        self._started = monotonic()
+        self._pending = 0
+        self._file.write(f"{MAGIC} {VERSION} {time():.3f}\n")
+
+    def write(self, channel: str, sender: str, hostname: typing.Optional[str], message: str):
+        """
+        Record a single inbound message, as received right now.
+        """
+        offset = monotonic() - self._started
+        fields = (channel, sender, hostname or "", message)
+        self._file.write(f"{offset:.6f}\t" + "\t".join(map(_escape, fields)) + "\n")
+        self._pending += 1
+        if self._pending >= _FLUSH_EVERY:
+            self.flush()
+
+    def flush(self):
+        """
+        Flush buffered records to disk.
+        """
+        self._file.flush()
+        self._pending = 0
+
+    def close(self):
+        """
+        Flush and close the capture file.
+        """
+        self._file.close()
+
+    @property
+    def path(self) -> str:
+        """
+        Path of the capture file
+        """
+        return self._path
+
+    def __enter__(self) -> CaptureWriter:
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_capture(path: str) -> typing.Iterator[Record]:
+    """
+    Read the records of a capture file, in order.
+
+    Raises:
+        CaptureFormatError: *path* is not a capture file, or holds malformed records.
+    """
+    with _open(path, "r") as file:
+        header = file.readline().split()
+        if len(header) != 3 or header[0] != MAGIC:
+            raise CaptureFormatError(f"{path} is not a capture file.")
+        if int(header[1]) != VERSION:
+            raise CaptureFormatError(f"unsupported capture version {header[1]}.")
+        started = float(header[2])
+
+        for number, line in enumerate(file, start=2):
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) != 5:
+                raise CaptureFormatError(f"{path}:{number} is malformed.")
+            offset = float(fields[0])
+            channel, sender, hostname, message = map(_unescape, fields[1:])
+            yield Record(offset, datetime.fromtimestamp(started + offset, tz=timezone.utc),
+                         channel, sender, hostname or None, message)
@@ -11,7 +11,12 @@ Licensed under the BSD 3-Clause License.
 See LICENSE.md
 """
 
+from src.config import PLUGIN_MANAGER
 from . import rat_command
+from . import stats
 from .rat_command import command, trigger
+from .prefilter import PreFilter, LineKind
 
-__all__ = ["command", "trigger"]
+__all__ = ["command", "trigger", "PreFilter", "LineKind", "stats"]
+
+PLUGIN_MANAGER.register(stats, "stats")
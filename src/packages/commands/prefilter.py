@@ -0,0 +1,99 @@
+"""
+prefilter.py - Cheap classification of inbound lines ahead of context construction
+
+Most of what the bot sees is chatter that neither carries our prefix nor could possibly match a
+prefixless rule. Building a full :class:`Context` for such a line, only for `trigger` to discard it,
+is wasted effort; the :class:`PreFilter` decides from the raw line whether that effort is needed.
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import collections
+import enum
+import typing
+
+from ..context import Context
+from ..ratmama.ratmama_parser import ANNOUNCEMENT_PREFIX
+from ..rules import has_candidates
+
+
+class LineKind(enum.Enum):
+    """
+    Classification of an inbound line
+    """
+    EMPTY = "empty"
+    """The line has no content"""
+    PREFIXED = "prefixed"
+    """The line carries our prefix, it is a command, rule or fact invocation"""
+    PREFIXLESS = "prefixless"
+    """The line could match a prefixless rule or is a RatMama announcement"""
+    CHATTER = "chatter"
+    """Nothing could possibly be triggered by the line"""
+
+    @property
+    def dispatchable(self) -> bool:
+        """
+        Whether lines of this kind need to be handed to the command dispatcher
+        """
+        return self in (LineKind.PREFIXED, LineKind.PREFIXLESS)
+
+
+class PreFilter:
+    """
+    Single-pass pre-classifier for sanitized inbound lines.
+
+    Examples:
+        >>> PreFilter().classify("")
+        <LineKind.EMPTY: 'empty'>
+    """
+    __slots__ = ["_counters"]
+
+    def __init__(self):
+        self._counters: typing.Counter[LineKind] = collections.Counter()
+
+    def classify(self, message: str) -> LineKind:
+        """
+        Classify a sanitized line, counting the result.
+
+        Args:
+            message (str): sanitized message, as it would be handed to `Context.from_message`
+
+        Returns:
+            LineKind: the line's classification
+        """
+        if not message:
+            kind = LineKind.EMPTY
+        elif message.startswith(Context.PREFIX):
+            kind = LineKind.PREFIXED
+        elif message.startswith(ANNOUNCEMENT_PREFIX) or has_candidates(message[0], prefixless=True):
+            kind = LineKind.PREFIXLESS
+        else:
+            kind = LineKind.CHATTER
+
+        self._counters[kind] += 1
+        return kind
+
+    @property
+    def counters(self) -> typing.Dict[LineKind, int]:
+        """
+        Number of classified lines, by kind
+        """
+        return dict(self._counters)
+
+    @property
+    def hits(self) -> int:
+        """
+        Number of lines that were passed on for dispatch
+        """
+        return sum(count for kind, count in self._counters.items() if kind.dispatchable)
+
+    @property
+    def drops(self) -> int:
+        """
+        Number of lines that were dropped before constructing a context
+        """
+        return sum(count for kind, count in self._counters.items() if not kind.dispatchable)
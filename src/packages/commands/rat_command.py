@@ -13,13 +13,16 @@ This module is built on top of the Pydle system.
 """
 
 from loguru import logger
-from typing import Callable, Any
+from typing import Callable, Any, Optional
 
 import psycopg2
 
 from src.packages.rules.rules import get_rule, clear_rules
 from ..context import Context
-from ..ratmama.ratmama_parser import handle_ratmama_announcement
+from ..permissions import Guards, guards_of
+from ..ratelimit import Cost, cost_of
+from .stats import measure, Kind
+from ..ratmama.ratmama_parser import handle_ratmama_announcement, ANNOUNCEMENT_PREFIX
 
 
 # set the logger for rat_command
@@ -44,6 +47,11 @@ class NameCollisionException(CommandException):
 
 
 _registered_commands = {}  # pylint: disable=invalid-name
+_command_names = {}
+"""name invocations of a command get recorded under, by alias"""
+
+MAX_FACTS = 3
+"""most facts a single message may invoke"""
 
 
 async def trigger(ctx) -> Any:
@@ -60,14 +68,17 @@ async def trigger(ctx) -> Any:
         return  # empty message, bail out
 
     if ctx.prefixed:
-        if ctx.words[0].casefold() in _registered_commands:
+        alias = ctx.words[0].casefold()
+        if alias in _registered_commands:
             # A regular command
-            command_fun = _registered_commands[ctx.words[0].casefold()]
+            command_fun = _registered_commands[alias]
             extra_args = ()
+            kind, name = Kind.COMMAND, _command_names.get(alias, alias)
             logger.debug(f"Regular command {ctx.words[0]} invoked.")
         else:
             # Might be a regular rule
             command_fun, extra_args = get_rule(ctx.words, ctx.words_eol, prefixless=False)
+            kind, name = Kind.RULE, getattr(command_fun, "__name__", "")
             if command_fun:
                 logger.debug(
                     f"Rule {getattr(command_fun, '__name__', '')} matching {ctx.words[0]} found.")
@@ -76,21 +87,37 @@ async def trigger(ctx) -> Any:
     else:
         # Might still be a prefixless rule
         command_fun, extra_args = get_rule(ctx.words, ctx.words_eol, prefixless=True)
+        kind, name = Kind.RULE, getattr(command_fun, "__name__", "")
         if command_fun:
             logger.debug(
                 f"Prefixless rule {getattr(command_fun, '__name__', '')} matching {ctx.words[0]} "
                 f"found.")
 
-    if ctx.words_eol[0].startswith("Incoming Client:"):
+    if ctx.words_eol[0].startswith(ANNOUNCEMENT_PREFIX):
         command_fun = handle_ratmama_announcement
+        kind, name = Kind.ANNOUNCEMENT, "ratmama"
 
     if command_fun:
-        return await command_fun(ctx, *extra_args)
+        # prefixless rules and announcements are channel traffic, not requests of the caller
+        limited = ctx.prefixed and kind is not Kind.ANNOUNCEMENT
+        if limited and not ctx.bot.rate_limiter.allow(ctx.user, cost_of(command_fun)):
+            return None
+        guards = guards_of(command_fun)
+        if guards is not None:
+            # checked right here, sparing the guard's wrapper a coroutine frame
+            denied = guards.check(ctx)
+            if denied is not None:
+                return await ctx.reply(denied)
+            command_fun = guards.target
+        return await measure(kind, name, command_fun(ctx, *extra_args))
 
     # neither a rule nor a command, possibly a fact
     result = False
-    if ctx.prefixed:
-        result = await handle_fact(ctx)
+    # facts answered from memory are cheap, handle_fact takes the expensive budget only for those
+    # fetched from the database
+    if ctx.prefixed and ctx.bot.rate_limiter.allow(ctx.user, Cost.CHEAP):
+        # facts are recorded collectively, their names are user input
+        result = await measure(Kind.FACT, "fact", handle_fact(ctx))
     if not result:
         logger.debug(f"Ignoring message '{ctx.words_eol[0]}'. Not a command or rule.")
 
@@ -98,29 +125,66 @@ async def trigger(ctx) -> Any:
 async def handle_fact(context: Context):
     """
     Handles potential facts
+
+    Further prefixed words directly following the first fact are facts, too, such as in
+    `!prep !pcquit-de SomeClient`. All of them are fetched at once.
+
+    If none of them exist and [facts]suggest is enabled, facts named similarly to the first are
+    suggested.
+
+    Facts answered from memory cost the caller nothing more, facts to be fetched from the
+    database are paid for from their expensive budget, and dropped if it is spent.
     """
     logger.trace("entering fact handler")
 
     raw, *users = context.words
-    logger.debug("checking {!r} for facts...", raw)
-    if "-" in raw:
-        fact, lang, *_ = raw.split("-")
-    else:
-        fact = raw
-        lang = 'en'
-    try:
-        # don't do anything if the fact doesn't exist
-        if not await context.bot.fact_manager.exists(fact.casefold(), lang.casefold()):
-            logger.debug("no such fact name={!r} lang={!r}", fact, lang)
-            return False
+    raws = [raw]
+    while users and len(raws) < MAX_FACTS and users[0].startswith(Context.PREFIX) \
+            and len(users[0]) > len(Context.PREFIX):
+        raws.append(users.pop(0)[len(Context.PREFIX):])
+
+    requests = []
+    for raw in raws:
+        logger.debug("checking {!r} for facts...", raw)
+        if "-" in raw:
+            fact, lang, *_ = raw.split("-")
+        else:
+            fact = raw
+            lang = 'en'
+        requests.append((fact.casefold(), lang.casefold()))
 
-        logger.debug("fact exists, retrieving and returning!")
-        fact = await context.bot.fact_manager.find(fact.casefold(), lang.casefold())
-        await context.reply(f"{' '.join(users)} : {fact.message}")
-        return True
+    try:
+        facts = await context.bot.fact_manager.find_many(
+            requests, admit=lambda: context.bot.rate_limiter.allow(context.user, Cost.EXPENSIVE))
     except psycopg2.Error:
         logger.exception("failed to fetch fact")
         return False
+    if facts is None:
+        # over the caller's budget for database work
+        return False
+
+    found = False
+    for (name, lang), fact in zip(requests, facts):
+        # don't do anything if the fact doesn't exist
+        if fact is None:
+            logger.debug("no such fact name={!r} lang={!r}", name, lang)
+            continue
+        if fact.lang != lang:
+            logger.debug("fact {!r} falls back from {} to {}", name, lang, fact.lang)
+        await context.reply(f"{' '.join(users)} : {fact.message}")
+        found = True
+
+    if not found and context.bot.fact_manager.suggestions_enabled():
+        name, lang = requests[0]
+        try:
+            suggestions = await context.bot.fact_manager.suggest(name, lang)
+        except psycopg2.Error:
+            logger.exception("failed to suggest facts")
+            return False
+        if suggestions:
+            names = ", ".join(f"{Context.PREFIX}{suggestion}" for suggestion in suggestions)
+            await context.reply(f"No fact named {name!r}, did you mean {names}?")
+    return found
 
 
 def _register(func, names: list or str) -> bool:
@@ -147,10 +211,26 @@ def _register(func, names: list or str) -> bool:
         else:
             formed_dict = {alias: func}
             _registered_commands.update(formed_dict)
+            _command_names[alias] = names[0]
 
     return True
 
 
+def get_guards(alias: str) -> Optional[Guards]:
+    """
+    Returns the guards of a registered command, without invoking it.
+
+    Args:
+        alias (str): any alias of the command
+
+    Returns:
+        Guards: the command's guards
+        None: the command isn't guarded, or no such command is registered
+    """
+    func = _registered_commands.get(alias.casefold())
+    return guards_of(func) if func is not None else None
+
+
 def command(*aliases):
     """
     Registers a command by aliases
@@ -0,0 +1,324 @@
+"""
+stats.py - Invocation latency histograms
+
+Every command, rule, fact and announcement invocation passing through `trigger` is timed. Wall
+time is split into the time spent executing our own code and the time spent awaiting I/O, by
+driving the invocation's coroutine through a small trampoline that times each step the event loop
+hands it. Both are recorded into fixed-bucket histograms, alongside the invocation's outcome.
+
+The histograms are queryable from IRC and can periodically be written to disk in the Prometheus
+text exposition format, to be picked up by node_exporter's textfile collector. Database statistics,
+if enabled, are written alongside.
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import asyncio
+import collections
+import enum
+import os
+import typing
+from time import perf_counter
+
+from loguru import logger
+
+from src.config import CONFIG_MARKER
+from ..database import metrics as database_metrics
+from ..utils.histogram import BUCKETS, Histogram, format_duration
+
+_config: typing.Dict = {"prometheus_file": "", "interval": 60}
+"""
+Statistics configuration, as applied by the last rehash
+"""
+
+
+class Kind(enum.Enum):
+    """
+    What got invoked
+    """
+    COMMAND = "command"
+    RULE = "rule"
+    FACT = "fact"
+    ANNOUNCEMENT = "announcement"
+
+
+class Outcome(enum.Enum):
+    """
+    How an invocation ended
+    """
+    OK = "ok"
+    ERROR = "error"
+    """the invocation raised"""
+    MISS = "miss"
+    """a fact that doesn't exist was asked for"""
+
+
+@CONFIG_MARKER
+def validate_config(data: typing.Dict):
+    """
+    Validate new configuration data.
+
+    The stats section is optional, missing keys fall back to their defaults.
+
+    Args:
+        data (typing.Dict): new configuration data  to validate
+
+    Raises:
+        ValueError:  config section failed to validate.
+    """
+    section = data.get("stats", {})
+
+    if "prometheus_file" in section and not isinstance(section["prometheus_file"], str):
+        raise ValueError("[stats]prometheus_file must be a string.")
+
+    if "interval" in section and (
+            not isinstance(section["interval"], (int, float)) or section["interval"] <= 0):
+        raise ValueError("[stats]interval must be a positive number.")
+
+
+@CONFIG_MARKER
+def rehash_handler(data: typing.Dict):
+    """
+    Apply new configuration data
+
+    A running exporter picks up the new file and interval after its current interval elapsed.
+
+    Args:
+        data (typing.Dict): new configuration data to apply.
+
+    """
+    _config.update(data.get("stats", {}))
+    if asyncio.get_event_loop().is_running():
+        # rehashed at runtime, the exporter may just have been enabled
+        start_exporter()
+
+
+class InvocationStats:
+    """
+    Statistics of everything invoked under a single name
+    """
+    __slots__ = ["wall", "awaited", "outcomes"]
+
+    def __init__(self):
+        self.wall = Histogram()
+        """total time from invocation to completion"""
+        self.awaited = Histogram()
+        """part of the wall time spent awaiting I/O rather than executing"""
+        self.outcomes: typing.Counter[Outcome] = collections.Counter()
+
+
+_stats: typing.Dict[typing.Tuple[Kind, str], InvocationStats] = {}
+_exporter: typing.Optional[asyncio.Future] = None
+
+
+class _Step:
+    """
+    Awaitable handing a single yielded value of the timed coroutine to the event loop
+    """
+    __slots__ = ["_value"]
+
+    def __init__(self, value):
+        self._value = value
+
+    def __await__(self):
+        return (yield self._value)
+
+
+class Stopwatch:
+    """
+    Measures the time a coroutine spends executing, as opposed to awaiting.
+
+    Every step of the coroutine is timed individually, the time between steps is time the
+    coroutine spent suspended awaiting something.
+    """
+    __slots__ = ["busy"]
+
+    def __init__(self):
+        self.busy = 0.0
+        """seconds spent executing so far"""
+
+    async def run(self, awaitable: typing.Awaitable) -> typing.Any:
+        """
+        Await *awaitable*, timing its steps.
+
+        Returns:
+            the result of *awaitable*
+        """
+        steps = awaitable.__await__()
+        value, error = None, None
+        while True:
+            started = perf_counter()
+            try:
+                yielded = steps.send(value) if error is None else steps.throw(error)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                self.busy += perf_counter() - started
+
+            value, error = None, None
+            try:
+                value = await _Step(yielded)
+            # whatever interrupted the wait (cancellation, most likely) belongs to the coroutine
+            except BaseException as ex:  # pylint: disable=broad-except
+                error = ex
+
+
+async def measure(kind: Kind, name: str, invocation: typing.Awaitable) -> typing.Any:
+    """
+    Await an invocation, recording its timings and outcome.
+
+    Facts resolving to a falsy result are recorded as misses.
+
+    Args:
+        kind: what gets invoked
+        name: name to record the invocation under
+        invocation: the invocation
+
+    Returns:
+        the invocation's result
+    """
+    outcome = Outcome.ERROR
+    stopwatch = Stopwatch()
+    started = perf_counter()
+    try:
+        result = await stopwatch.run(invocation)
+        outcome = Outcome.MISS if kind is Kind.FACT and not result else Outcome.OK
+        return result
+    finally:
+        wall = perf_counter() - started
+        record(kind, name, wall, max(0.0, wall - stopwatch.busy), outcome)
+
+
+def record(kind: Kind, name: str, wall: float, awaited: float, outcome: Outcome):
+    """
+    Record a single invocation.
+
+    Args:
+        kind: what got invoked
+        name: name the invocation gets recorded under
+        wall: seconds from invocation to completion
+        awaited: seconds thereof spent awaiting
+        outcome: how the invocation ended
+    """
+    key = (kind, name)
+    stats = _stats.get(key)
+    if stats is None:
+        stats = _stats[key] = InvocationStats()
+    stats.wall.observe(wall)
+    stats.awaited.observe(awaited)
+    stats.outcomes[outcome] += 1
+
+
+def snapshot() -> typing.Dict[typing.Tuple[Kind, str], InvocationStats]:
+    """
+    Statistics recorded so far, by kind and name
+    """
+    return dict(_stats)
+
+
+def reset():
+    """
+    Forget all recorded statistics
+    """
+    _stats.clear()
+
+
+def summarize(kind: Kind, name: str, stats: InvocationStats) -> str:
+    """
+    One line, human readable summary of an invocation's statistics.
+
+    Examples:
+        >>> stats = InvocationStats()
+        >>> stats.wall.observe(0.02)
+        >>> stats.awaited.observe(0.015)
+        >>> stats.outcomes[Outcome.OK] += 1
+        >>> summarize(Kind.COMMAND, "quote", stats)
+        'command quote: n=1 p50=20ms p95=20ms max=20ms awaited=75% ok=1'
+    """
+    wall = stats.wall
+    share = stats.awaited.total / wall.total if wall.total else 0.0
+    outcomes = " ".join(f"{outcome.value}={stats.outcomes[outcome]}"
+                        for outcome in Outcome if stats.outcomes[outcome])
+    return (f"{kind.value} {name}: n={wall.count} p50={format_duration(wall.quantile(0.5))} "
+            f"p95={format_duration(wall.quantile(0.95))} max={format_duration(wall.maximum)} "
+            f"awaited={share:.0%} {outcomes}")
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _sorted_stats() -> typing.List[typing.Tuple[typing.Tuple[Kind, str], InvocationStats]]:
+    return sorted(_stats.items(), key=lambda item: (item[0][0].value, item[0][1]))
+
+
+def render_prometheus() -> str:
+    """
+    Render all recorded statistics in the Prometheus text exposition format.
+
+    Examples:
+        >>> reset()
+        >>> record(Kind.COMMAND, "ping", 0.002, 0.0, Outcome.OK)
+        >>> print(render_prometheus().splitlines()[2])
+        mecha_invocation_seconds_bucket{kind="command",name="ping",le="0.001"} 0
+    """
+    lines = []
+    for metric, attribute, description in (
+            ("mecha_invocation_seconds", "wall", "Wall time of an invocation"),
+            ("mecha_invocation_awaited_seconds", "awaited", "Time an invocation spent awaiting")):
+        lines.append(f"# HELP {metric} {description}.")
+        lines.append(f"# TYPE {metric} histogram")
+        for (kind, name), stats in _sorted_stats():
+            histogram: Histogram = getattr(stats, attribute)
+            labels = f'kind="{kind.value}",name="{_escape(name)}"'
+            lines.extend(histogram.render_prometheus(metric, labels))
+
+    lines.append("# HELP mecha_invocations_total Invocations, by outcome.")
+    lines.append("# TYPE mecha_invocations_total counter")
+    for (kind, name), stats in _sorted_stats():
+        for outcome in Outcome:
+            lines.append(f'mecha_invocations_total{{kind="{kind.value}",name="{_escape(name)}",'
+                         f'outcome="{outcome.value}"}} {stats.outcomes[outcome]}')
+
+    lines.extend(database_metrics.render_prometheus())
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path: str):
+    """
+    Write all recorded statistics to *path*, atomically replacing it.
+    """
+    temporary = f"{path}.tmp"
+    with open(temporary, "w", encoding="utf-8") as file:
+        file.write(render_prometheus())
+    os.replace(temporary, path)
+
+
+async def _export():
+    while _config["prometheus_file"]:
+        await asyncio.sleep(_config["interval"])
+        path = _config["prometheus_file"]
+        if not path:
+            break
+        try:
+            write_prometheus(path)
+        except OSError:
+            logger.exception("failed to write statistics to {}", path)
+
+
+def start_exporter():
+    """
+    Start periodically writing statistics to the configured Prometheus file, if one is configured.
+
+    Calling this while the exporter is already running does nothing.
+    """
+    global _exporter  # pylint: disable=global-statement, invalid-name
+    if not _config["prometheus_file"] or (_exporter is not None and not _exporter.done()):
+        return
+    logger.info("writing statistics to {} every {} seconds",
+                _config["prometheus_file"], _config["interval"])
+    _exporter = asyncio.ensure_future(_export())
@@ -11,10 +11,13 @@ Licensed under the BSD 3-Clause License.
 See LICENSE.md
 """
 from __future__ import annotations  # for forward references standard in >=3.8
+from collections import abc
+from itertools import accumulate
 from loguru import logger
 import typing
 
 from src.config import CONFIG_MARKER
+from ..outbound import Priority
 from ..user import User
 
 if typing.TYPE_CHECKING:
@@ -56,7 +59,7 @@ class Context:
                  user: User,
                  target: str,
                  words: [str],
-                 words_eol: [str],
+                 words_eol: typing.Sequence[str],
                  prefixed: bool = False
                  ):
         """
@@ -67,14 +70,14 @@ class Context:
             bot (Modules.mechaclient.MechaClient): Mechaclient instance
             target(str): channel of invoking channel
             words ([str]): list of words from command invocation
-            words_eol ([str]): list of words from command invocation to EOL
+            words_eol (Sequence[str]): list of words from command invocation to EOL
             prefixed (bool): marker if the message is prefixed
         """
         self._user: User = user
         self._bot: MechaClient = bot
         self._target: str = target
         self._words: [str] = words
-        self._words_eol: [str] = words_eol
+        self._words_eol: typing.Sequence[str] = words_eol
         self._prefixed: bool = prefixed
 
     @property
@@ -117,12 +120,12 @@ class Context:
         return self._words
 
     @property
-    def words_eol(self) -> typing.List[str]:
+    def words_eol(self) -> typing.Sequence[str]:
         """
         Words in invoking message to EOL
 
         Returns:
-            list[str]
+            Sequence[str]
         """
         return self._words_eol
 
@@ -166,26 +169,82 @@ class Context:
 
         # build the words and words_eol lists
         words, words_eol = _split_message(message)
-        # get the user from a WHOIS query
-        user = await User.from_pydle(bot, sender)
+        # the user as last synced from IRC, shared with every other context of theirs
+        user = bot.get_user(sender)
 
         # return a built context object
         return cls(bot, user, channel, words, words_eol, prefixed=prefixed)
 
-    async def reply(self, msg: str):
+    async def reply(self, msg: str, priority: Priority = Priority.REPLY):
         """
         Sends a message in the same channel or query window as the command was sent.
 
         Arguments:
             msg (str): Message to send.
+            priority (Priority): Outbound lane to send the message on.
         """
         if self.channel is not None:
-            await self.bot.message(self.channel, msg)
+            await self.bot.message(self.channel, msg, priority=priority)
         else:
-            await self.bot.message(self.user.nickname, msg)
+            await self.bot.message(self.user.nickname, msg, priority=priority)
 
 
-def _split_message(string: str) -> typing.Tuple[typing.List[str], typing.List[str]]:
+class WordsEol(abc.Sequence):
+    """
+    Words of a message, each including everything up to the end of the message.
+
+    Rather than storing every suffix of the message, only the message itself and the offsets at
+    which its words start are kept. Suffixes are sliced on demand, so building one is linear in
+    the length of the message and items nobody looks at cost nothing.
+
+    Behaves like the list it replaces:
+
+    Examples:
+        >>> words_eol = WordsEol("pink fluffy unicorns", [0, 5, 12])
+        >>> words_eol[1]
+        'fluffy unicorns'
+        >>> words_eol[-1]
+        'unicorns'
+        >>> len(words_eol)
+        3
+        >>> words_eol == ['pink fluffy unicorns', 'fluffy unicorns', 'unicorns']
+        True
+        >>> words_eol[1:]
+        ['fluffy unicorns', 'unicorns']
+    """
+    __slots__ = ["_message", "_offsets"]
+
+    def __init__(self, message: str, offsets: typing.Sequence[int]):
+        """
+        Args:
+            message (str): the whitespace-normalized message
+            offsets (Sequence[int]): indices at which the words of *message* start
+        """
+        self._message = message
+        self._offsets = offsets
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._message[offset:] for offset in self._offsets[index]]
+        return self._message[self._offsets[index]:]
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, WordsEol):
+            return self._message == other._message and self._offsets == other._offsets
+        if isinstance(other, (list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    __hash__ = None  # mutable sequences aren't hashable, neither is the list we replace
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+
+def _split_message(string: str) -> typing.Tuple[typing.List[str], WordsEol]:
     """
     Split up a string into words and words_eol
 
@@ -193,10 +252,10 @@ def _split_message(string: str) -> typing.Tuple[typing.List[str], typing.List[st
         string: Any string.
 
     Returns:
-        (list of str, list of str):
+        (list of str, WordsEol):
             A 2-tuple of (words, words_eol), where words is a list of the words of *string*,
-            seperated by whitespace, and words_eol is a list of the same length, with each element
-            including the word and everything up to the end of *string*
+            seperated by whitespace, and words_eol is a sequence of the same length, with each
+            element including the word and everything up to the end of *string*
 
     Example:
         >>> _split_message("pink fluffy unicorns")
@@ -205,7 +264,11 @@ def _split_message(string: str) -> typing.Tuple[typing.List[str], typing.List[st
     # get the words
     words = string.split()
 
-    # reconstruct the original phrase EOL style, through clever usage of slice
-    words_eol = [" ".join(words[i:]) for i, _ in enumerate(words)]
+    # words_eol items are separated by single spaces, sanitized input already is, anything else
+    # needs normalizing once.
+    normalized = " ".join(words)
+
+    # every word starts one space after the end of the previous one
+    offsets = list(accumulate((len(word) + 1 for word in words[:-1]), initial=0)) if words else []
 
-    return words, words_eol
+    return words, WordsEol(normalized, offsets)
@@ -9,8 +9,13 @@ Licensed under the BSD 3-Clause License.
 See LICENSE.md
 """
 from src.config import PLUGIN_MANAGER
-from .database_manager import DatabaseManager
+from . import metrics
+from .circuit_breaker import CircuitBreaker, CircuitOpenError, State
+from .database_manager import DatabaseManager, Transaction
+from .statement import Statement
 
-__all__ = ["DatabaseManager"]
+__all__ = ["DatabaseManager", "Transaction", "Statement", "CircuitBreaker", "CircuitOpenError",
+           "State", "metrics"]
 
 PLUGIN_MANAGER.register(DatabaseManager, "Database")
+PLUGIN_MANAGER.register(metrics, "database_metrics")
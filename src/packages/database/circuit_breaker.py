@@ -0,0 +1,113 @@
+"""
+circuit_breaker.py - Fail fast while the database is unreachable
+
+Every round trip to an unreachable database waits out a connection timeout before failing. After
+a number of consecutive connectivity failures the circuit breaker opens, and callers are turned
+away right away instead. Once it has been open for a while, it lets a trial through: a success
+closes it again, a failure keeps it open for another while.
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import enum
+import typing
+from time import monotonic
+
+import psycopg2
+
+
+class CircuitOpenError(psycopg2.OperationalError):
+    """
+    Raised in place of a round trip to the database while the circuit breaker is open.
+    """
+
+
+class State(enum.Enum):
+    """
+    State of a circuit breaker
+    """
+    CLOSED = "closed"
+    """calls go through"""
+    OPEN = "open"
+    """calls are turned away"""
+    HALF_OPEN = "half open"
+    """calls go through on trial, the first outcome decides whether the breaker closes"""
+
+
+class CircuitBreaker:
+    """
+    Counts consecutive failures, opening once there were too many of them.
+
+    Args:
+        threshold: consecutive failures opening the breaker
+        reset_timeout: seconds the breaker stays open before letting a trial through
+
+    Examples:
+        >>> breaker = CircuitBreaker(threshold=2, reset_timeout=30)
+        >>> breaker.failure(now=0), breaker.failure(now=1)
+        (None, <State.OPEN: 'open'>)
+        >>> breaker.allow(now=10), breaker.allow(now=31)
+        (False, True)
+        >>> breaker.success()
+        <State.CLOSED: 'closed'>
+    """
+    __slots__ = ["threshold", "reset_timeout", "_state", "_failures", "_opened"]
+
+    def __init__(self, threshold: int, reset_timeout: float):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._state = State.CLOSED
+        self._failures = 0
+        self._opened = 0.0
+
+    @property
+    def state(self) -> State:
+        """
+        Current state, an open breaker due a trial still shows as open
+        """
+        return self._state
+
+    def allow(self, now: typing.Optional[float] = None) -> bool:
+        """
+        Whether a call may go through right now.
+        """
+        if self._state is State.OPEN:
+            if (monotonic() if now is None else now) < self._opened + self.reset_timeout:
+                return False
+            self._state = State.HALF_OPEN
+        return True
+
+    def success(self) -> typing.Optional[State]:
+        """
+        Records a call that went through.
+
+        Returns:
+            the state the breaker changed to, None if it didn't change
+        """
+        self._failures = 0
+        if self._state is State.CLOSED:
+            return None
+        self._state = State.CLOSED
+        return self._state
+
+    def failure(self, now: typing.Optional[float] = None) -> typing.Optional[State]:
+        """
+        Records a call that failed to reach the database.
+
+        Returns:
+            the state the breaker changed to, None if it didn't change
+        """
+        self._failures += 1
+        if self._state is State.OPEN:
+            return None
+        if self._state is State.HALF_OPEN or self._failures >= self.threshold:
+            # a failed trial reopens, without telling anyone it was ever closed
+            reopened = self._state is State.HALF_OPEN
+            self._state = State.OPEN
+            self._opened = monotonic() if now is None else now
+            return None if reopened else self._state
+        return None
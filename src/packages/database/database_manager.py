@@ -7,12 +7,25 @@ Licensed under the BSD 3-Clause License.
 See LICENSE.md
 """
 
+import asyncio
+import contextlib
 import typing
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
 import psycopg2
 from loguru import logger
 from psycopg2 import sql, pool
+from psycopg2.extensions import QueryCanceledError, STATUS_READY
 
 from src.config import CONFIG_MARKER
+from ..offline_awareness import OfflineAwareABC
+from . import metrics
+from .circuit_breaker import CircuitBreaker, CircuitOpenError, State
+from .statement import Statement
+
+Query = typing.Union[sql.SQL, Statement]
+"""what may be queried, an ad hoc composed SQL object or a declared statement"""
 
 
 class DatabaseManager:
@@ -34,8 +47,24 @@ class DatabaseManager:
         Instantiation of the DBM is not intended to be done per method, but rather once as a
         class property, and the DatabaseManage.query() method used to perform a query.
 
-        Connections are managed by a SimpleConnectionPool, keeping a minimum of 5 and a maximum
-        of 10 connections, able to dynamically open/close ports as needed.
+        Connections are managed by a ThreadedConnectionPool, keeping a minimum of 5 and a maximum
+        of 10 connections, able to dynamically open/close ports as needed.  None are opened on
+        instantiation, .start_monitor() opens the first 5 in the background and goes on to
+        check the database's health every [database]health_interval seconds.  With all 10
+        checked out, queries and transactions wait for one to be released.
+
+        After [database]failure_threshold consecutive failures to reach the database, a circuit
+        breaker opens, failing queries right away with a CircuitOpenError rather than having each
+        wait out a connection timeout.  The system moves to offline mode meanwhile.  After
+        [database]reset_timeout seconds a trial query or health check is let through, moving
+        back to online mode should it succeed.
+
+        With [stats]database enabled, statements, pool checkouts and errors are recorded under
+        the manager's SUBSYSTEM, see metrics.py.
+
+        psycopg2 blocks while talking to the database, so every round trip is run on a thread
+        pool of its own rather than on the event loop.  A statement running longer than
+        [database]timeout seconds, or whose caller got cancelled, is cancelled server side.
 
         Performing A Query:
         .query() does not accept a direct string.  You must use a psycopg2 composed SQL (sql.SQL)
@@ -49,8 +78,40 @@ class DatabaseManager:
 
         >>> dbm.query(query, ('tuple','of','values'))# doctest: +SKIP
 
+        Statements run over and over are declared once instead, under a name of their own.  They
+        are prepared server side on every connection they run on, so the server parses and plans
+        them once per connection rather than on every query.
+
+        >>> statement = dbm.statement("table_find", query)  # doctest: +SKIP
+        >>> dbm.query(statement, ('tuple','of','values'))# doctest: +SKIP
+
+        Units Of Work:
+        Statements that must succeed or fail together are run through .transaction(), on a
+        single connection within a single transaction.  The transaction is committed once the
+        block is left, and rolled back if anything raised within it.
+
+        >>> async with dbm.transaction() as transaction:  # doctest: +SKIP
+        ...     await transaction.query(query, ('tuple','of','values'))
+
     """
 
+    DEFAULTS: typing.ClassVar[typing.Dict] = {
+        "timeout": 10.0,
+        "failure_threshold": 3,
+        "reset_timeout": 30.0,
+        "health_interval": 30.0,
+    }
+    """optional [database] settings, and their defaults"""
+
+    MIN_CONNECTIONS: typing.ClassVar[int] = 5
+    """connections kept open, once warmed up"""
+
+    MAX_CONNECTIONS: typing.ClassVar[int] = 10
+    """connections open at most, checkouts beyond wait for one to be released"""
+
+    SUBSYSTEM: typing.ClassVar[str] = "database"
+    """subsystem statements and the pool are recorded under by the database statistics"""
+
     _config: typing.ClassVar[typing.Dict] = {}
 
     @classmethod
@@ -77,6 +138,20 @@ class DatabaseManager:
 
         module_config = data["database"]
 
+        # Optional settings
+        for key in ("timeout", "reset_timeout", "health_interval"):
+            if key in module_config and (
+                    not isinstance(module_config[key], (int, float))
+                    or isinstance(module_config[key], bool)
+                    or module_config[key] <= 0):
+                raise ValueError(f"[database]{key} must be a positive number.")
+
+        if "failure_threshold" in module_config and (
+                not isinstance(module_config["failure_threshold"], int)
+                or isinstance(module_config["failure_threshold"], bool)
+                or module_config["failure_threshold"] <= 0):
+            raise ValueError("[database]failure_threshold must be a positive integer.")
+
         # Require all values to be set
         for setting in module_config.values():
             if not setting:
@@ -126,79 +201,471 @@ class DatabaseManager:
             )
             assert self._dbpass
 
-        # Create Database Connections Pool
+            settings = {**self.DEFAULTS, **self._config.get("database", {})}
+            self._timeout = settings["timeout"]
+            self._health_interval = settings["health_interval"]
+            self._breaker = CircuitBreaker(settings["failure_threshold"],
+                                           settings["reset_timeout"])
+            self._monitor: typing.Optional[asyncio.Future] = None
+            self._statements: typing.Dict[str, Statement] = {}
+
+        # Create Database Connections Pool, connections are opened as they are first needed
+        self._dbpool = _LazyPool(
+            self.MIN_CONNECTIONS,
+            self.MAX_CONNECTIONS,
+            host=self._dbhost,
+            port=self._dbport,
+            dbname=self._dbname,
+            user=self._dbuser,
+            password=self._dbpass,
+            connection_factory=_Connection,
+        )
+        metrics.track(self.SUBSYSTEM, self._dbpool)
+
+        # the pool raises rather than wait once exhausted, checkouts wait for a free connection
+        # on the event loop instead. Waiting on the thread pool would starve the very statements
+        # about to release one.
+        self._slots: typing.Optional[asyncio.Semaphore] = None
+        self._slots_loop: typing.Optional[asyncio.AbstractEventLoop] = None
+
+        # one thread per pooled connection, more could only wait for a connection to be freed
+        self._executor = ThreadPoolExecutor(max_workers=self.MAX_CONNECTIONS,
+                                            thread_name_prefix="database")
+
+    async def _run(self, function: typing.Callable, *args) -> typing.Any:
+        """
+        Run a blocking function on the database's thread pool.
+        """
+        return await asyncio.get_event_loop().run_in_executor(self._executor, function, *args)
+
+    async def _statement(self, connection, pending: typing.List[asyncio.Future],
+                         timeout: typing.Optional[float], function: typing.Callable,
+                         *args) -> typing.Any:
+        """
+        Run a statement on the database's thread pool, cancelling it server side if it exceeds
+        its timeout or the awaiting task gets cancelled.
+
+        A statement being cancelled still holds its connection.  It is appended to *pending*,
+        along with the cancellation, and the connection must not be released before both are
+        done.
+
+        Raises:
+            QueryCanceledError: the statement exceeded its timeout
+        """
+        loop = asyncio.get_event_loop()
+        timeout = self._timeout if timeout is None else timeout
+        work = loop.run_in_executor(self._executor, function, *args)
         try:
-            self._dbpool = psycopg2.pool.SimpleConnectionPool(
-                5,
-                10,
-                host=self._dbhost,
-                port=self._dbport,
-                dbname=self._dbname,
-                user=self._dbuser,
-                password=self._dbpass,
-            )
+            return await asyncio.wait_for(asyncio.shield(work), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("cancelling a statement exceeding its timeout of {}s", timeout)
+            raise QueryCanceledError(
+                f"statement exceeded its timeout of {timeout} seconds") from None
+        finally:
+            if not work.done():
+                # sending the cancel request blocks as well, and mustn't queue up behind the
+                # very statement it's meant to cancel
+                pending.extend((work, loop.run_in_executor(None, _cancel, connection)))
+
+    def statement(self, name: str, query: sql.SQL, prepare: bool = True) -> Statement:
+        """
+        Declare a named statement, to be queried in place of its composed SQL object.
 
-        except psycopg2.DatabaseError as error:
-            logger.exception("Unable to connect to database!")
+        Declaring a statement again under the same name returns the statement declared first,
+        as long as its query is the same.
+
+        Args:
+            name: name of the statement, unique amongst this manager's statements
+            query: composed SQL query object
+            prepare: whether to prepare the statement server side, worth it for statements run
+                over and over.  Statements whose number of parameters varies can't be prepared.
+
+        Returns:
+            Statement: the statement, to pass to .query() or Transaction.query()
+
+        Raises:
+            ValueError: another statement was declared under the same name
+        """
+        declared = self._statements.get(name)
+        if declared is not None:
+            if declared.query.string != query.string or declared.prepare != prepare:
+                raise ValueError(f"statement {name!r} is already declared differently")
+            return declared
+        declared = self._statements[name] = Statement(name, query, prepare)
+        return declared
+
+    def _acquire(self, transaction: bool):
+        connection = self._dbpool.getconn()
+        if transaction:
+            connection.autocommit = False
+        return connection
+
+    def _free_slots(self) -> asyncio.Semaphore:
+        """
+        Counts the connections left to be checked out, see __init__.
+        """
+        loop = asyncio.get_event_loop()
+        # bound to the loop it is created on, there is one per loop
+        if self._slots_loop is not loop:
+            self._slots, self._slots_loop = asyncio.Semaphore(self.MAX_CONNECTIONS), loop
+        return self._slots
+
+    async def _checkout(self, transaction: bool):
+        """
+        Checks a connection out of the pool, waiting for one to be released if all of them are
+        checked out.  The wait is recorded if database statistics are on.
+
+        The connection is handed back through _checkin.  Should the awaiting task be cancelled,
+        the connection still gets checked out on the thread pool, and is handed back right away.
+        """
+        started = perf_counter() if metrics.enabled() else None
+        slots = self._free_slots()
+        await slots.acquire()
+        work = asyncio.get_event_loop().run_in_executor(self._executor, self._acquire, transaction)
+        try:
+            connection = await asyncio.shield(work)
+        except asyncio.CancelledError:
+            work.add_done_callback(self._abandoned)
+            raise
+        except BaseException:
+            slots.release()
+            raise
+        if started is not None:
+            metrics.record_checkout(self.SUBSYSTEM, perf_counter() - started)
+        return connection
+
+    def _checkin(self, connection):
+        """
+        Hands a connection checked out through _checkout back to the pool.
+        """
+        self._dbpool.putconn(connection)
+        self._free_slots().release()
+
+    def _abandoned(self, work: asyncio.Future):
+        """
+        Hands back a connection whose checkout got cancelled, once it is checked out.
+        """
+        if work.cancelled() or work.exception() is not None:
+            self._free_slots().release()
+        else:
+            self._checkin(work.result())
+
+    async def _finish(self, connection, commit: bool, pending: typing.List[asyncio.Future]):
+        """
+        Commit or roll back a transaction, which carries on should the awaiting task be
+        cancelled.
+        """
+        work = asyncio.get_event_loop().run_in_executor(self._executor, _end, connection, commit)
+        pending.append(work)
+        await asyncio.shield(work)
+
+    async def _release(self, connection, pending: typing.List[asyncio.Future]):
+        """
+        Release a connection back to the pool, once its pending statements are done.
+        """
+        if pending:
+            await asyncio.wait(pending)
+            for future in pending:
+                # retrieved, so they don't get logged as never retrieved
+                future.exception()
+        self._checkin(connection)
+
+    async def _warm_up(self):
+        # opens the connections kept open, handing them all back once they're open
+        connections = []
+        try:
+            for _ in range(self.MIN_CONNECTIONS):
+                connections.append(await self._checkout(False))
+        finally:
+            for connection in connections:
+                self._checkin(connection)
+
+    @contextlib.contextmanager
+    def _guard(self):
+        """
+        Guards a round trip to the database by the circuit breaker, recording its outcome.
+
+        Raises:
+            CircuitOpenError: the breaker is open, nothing was attempted
+        """
+        if not self._breaker.allow():
+            error = CircuitOpenError("the database is unavailable, not trying again just yet")
+            if metrics.enabled():
+                metrics.record_error(self.SUBSYSTEM, error)
             raise error
+        try:
+            yield
+        except psycopg2.Error as error:
+            if metrics.enabled():
+                metrics.record_error(self.SUBSYSTEM, error)
+            # the pool failing to hand out a connection says nothing about the database
+            if isinstance(error, pool.PoolError):
+                raise
+            # a statement too slow for its timeout is no sign of the database being unreachable,
+            # any other error but a connectivity one means the database answered
+            if (isinstance(error, (psycopg2.OperationalError, psycopg2.InterfaceError))
+                    and not isinstance(error, QueryCanceledError)):
+                self._transition(self._breaker.failure())
+            else:
+                self._transition(self._breaker.success())
+            raise
+        else:
+            self._transition(self._breaker.success())
+
+    def _transition(self, state: typing.Optional[State]):
+        if state is State.OPEN:
+            logger.error("Database unreachable, failing queries for the next {} seconds.",
+                         self._breaker.reset_timeout)
+            asyncio.ensure_future(OfflineAwareABC.go_offline())
+        elif state is State.CLOSED:
+            logger.info("Database reachable again.")
+            asyncio.ensure_future(OfflineAwareABC.go_online())
+
+    @property
+    def circuit(self) -> State:
+        """
+        State of the circuit breaker guarding the database
+        """
+        return self._breaker.state
 
     async def is_connected(self) -> bool:
         """
-        Private method.  Verifies the isolation level as an alternative to
-        an actual query to check if the connection is still alive and valid.
+        Checks the database is reachable with a trivial query, on a pooled connection.
+        While the circuit breaker is open, the database counts as unreachable without checking.
         """
         try:
-            with self._dbpool.getconn() as connection:
-                heartbeat = connection.isolation_level
-                self._dbpool.putconn(connection)
-        except psycopg2.OperationalError:
+            with self._guard():
+                connection = await self._checkout(False)
+                try:
+                    await self._run(_heartbeat, connection)
+                finally:
+                    self._checkin(connection)
+        except psycopg2.Error:
             logger.warning("Potential Connectivity issues with database!")
             return False
 
         return True
 
+    async def _watch(self):
+        try:
+            with self._guard():
+                await self._warm_up()
+        except psycopg2.Error:
+            logger.exception("Unable to connect to database!")
+        while True:
+            await asyncio.sleep(self._health_interval)
+            try:
+                await self.is_connected()
+            except Exception:
+                # keep checking, a check gone wrong doesn't take the monitor down with it
+                logger.exception("Database health check failed unexpectedly!")
+
+    def start_monitor(self):
+        """
+        Opens pooled connections in the background, then checks the database's health every
+        [database]health_interval seconds.
+
+        Calling this while the monitor is already running does nothing.
+        """
+        metrics.start_summaries()
+        if self._monitor is not None and not self._monitor.done():
+            return
+        self._monitor = asyncio.ensure_future(self._watch())
+
     async def query(
-        self, query: sql.SQL, values: typing.Union[typing.Tuple, typing.Dict]
+        self, query: Query, values: typing.Union[typing.Tuple, typing.Dict],
+        timeout: typing.Optional[float] = None
     ) -> typing.List:
         """
         Send a query to the connected database.  Pulls a connection from the pool and creates
         a cursor, executing the composed query with the values.
-        Requires a composed SQL object (See psycopg2 docs)
+        Requires a composed SQL object (See psycopg2 docs) or a declared statement
 
         Args:
-            query: composed SQL query object
+            query: composed SQL query object, or statement declared through .statement()
             values: tuple or dict of values for query
+            timeout: seconds the query may run, [database]timeout if omitted
         Returns:
             List of rows matching query.  May return an empty list if there are no matching rows.
+        Raises:
+            QueryCanceledError: the query exceeded its timeout
         """
-        # Verify composed SQL object
-        if not isinstance(query, sql.SQL):
-            raise TypeError("Expected composed SQL object for query.")
+        _verify(query, values)
+
+        with self._guard():
+            # Pull a connection from the pool
+            connection = await self._checkout(False)
+            pending: typing.List[asyncio.Future] = []
+            try:
+                return await self._statement(connection, pending, timeout,
+                                             _execute_once, connection, query, values,
+                                             self.SUBSYSTEM)
+            finally:
+                if pending:
+                    # the caller needn't wait for the cancellation to be done with
+                    asyncio.ensure_future(self._release(connection, pending))
+                else:
+                    self._checkin(connection)
 
-        # Verify value is tuple or dict.
-        if not isinstance(values, (dict, tuple)):
-            raise TypeError(f"Expected tuple or dict for query values.")
+    @contextlib.asynccontextmanager
+    async def transaction(
+        self, timeout: typing.Optional[float] = None
+    ) -> typing.AsyncIterator["Transaction"]:
+        """
+        Run a unit of work, several statements on a single connection within a single
+        transaction.
 
-        # Pull a connection from the pool, and create a cursor from it.
-        with self._dbpool.getconn() as connection:
-            # If we could set these at connection time, we would,
-            # but they must be set outside the pool.
+        The transaction is committed once the block is left, or rolled back if anything raised
+        within it.  Either way the connection is released back to the pool.
+
+        Args:
+            timeout: seconds each statement may run, [database]timeout if omitted
+
+        Yields:
+            Transaction: runs the statements of the unit of work
+        """
+        with self._guard():
+            connection = await self._checkout(True)
+            pending: typing.List[asyncio.Future] = []
+            try:
+                with connection.cursor() as cursor:
+                    try:
+                        yield Transaction(self, connection, cursor, pending, timeout)
+                    except BaseException:
+                        # waits for a cancelled statement to be done, holding the connection's
+                        # lock
+                        await self._finish(connection, False, pending)
+                        raise
+                    await self._finish(connection, True, pending)
+            finally:
+                await self._release(connection, pending)
+
+
+class Transaction:
+    """
+    Runs the statements of a unit of work, see DatabaseManager.transaction.
+    """
+    __slots__ = ["_manager", "_connection", "_cursor", "_pending", "_timeout"]
+
+    def __init__(self, manager: DatabaseManager, connection, cursor,
+                 pending: typing.List[asyncio.Future], timeout: typing.Optional[float]):
+        self._manager = manager
+        self._connection = connection
+        self._cursor = cursor
+        self._pending = pending
+        self._timeout = timeout
+
+    async def query(
+        self, query: Query, values: typing.Union[typing.Tuple, typing.Dict],
+        timeout: typing.Optional[float] = None
+    ) -> typing.List:
+        """
+        Send a query within the transaction.
+
+        Args:
+            query: composed SQL query object, or declared statement
+            values: tuple or dict of values for query
+            timeout: seconds the query may run, the transaction's timeout if omitted
+        Returns:
+            List of rows matching query.  May return an empty list if there are no matching rows.
+        Raises:
+            QueryCanceledError: the query exceeded its timeout
+        """
+        _verify(query, values)
+        # pylint: disable=protected-access
+        return await self._manager._statement(
+            self._connection, self._pending, self._timeout if timeout is None else timeout,
+            _execute, self._cursor, query, values, self._manager.SUBSYSTEM)
+
+
+class _LazyPool(psycopg2.pool.ThreadedConnectionPool):
+    """
+    Connection pool opening connections as they are first needed, rather than on creation.
+
+    Once opened, up to *minconn* connections are kept open.
+    """
+
+    def __init__(self, minconn: int, maxconn: int, *args, **kwargs):
+        super().__init__(0, maxconn, *args, **kwargs)
+        self.minconn = minconn
+
+
+class _Connection(psycopg2.extensions.connection):
+    """
+    Pooled connection, whose session is set up once, when it is opened.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.autocommit = True
+        self.set_client_encoding("utf-8")
+        self.prepared: typing.Set[str] = set()
+        """names of the statements prepared on this connection's session"""
+
+
+def _heartbeat(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+
+
+def _verify(query: Query, values: typing.Union[typing.Tuple, typing.Dict]):
+    # Verify composed SQL object
+    if not isinstance(query, (sql.SQL, Statement)):
+        raise TypeError("Expected composed SQL object for query.")
+
+    # Verify value is tuple or dict.
+    if not isinstance(values, (dict, tuple)):
+        raise TypeError(f"Expected tuple or dict for query values.")
+
+
+def _cancel(connection):
+    try:
+        connection.cancel()
+    except psycopg2.Error:
+        logger.exception("failed to cancel a statement")
+
+
+def _end(connection, commit: bool):
+    # ends a transaction, handing the connection back with its session as it was set up
+    try:
+        if commit:
+            connection.commit()
+        else:
+            connection.rollback()
+    finally:
+        if not connection.closed:
+            if connection.status != STATUS_READY:
+                connection.rollback()
             connection.autocommit = True
-            connection.set_client_encoding("utf-8")
-            # Create cursor, and execute the query.
-            with connection.cursor() as cursor:
-                if __debug__:
-                    logger.debug("executing query {}", query)  # noinspection PyUnreachableCode
-                cursor.execute(query, values)
-                # Check if cursor.description is NONE - meaning no results returned.
-                if cursor.description:
-                    result = cursor.fetchall()
-                else:
-                    # Return a blank tuple if there are no results, since we are
-                    # forcing this to a list.
-                    result = ()
 
-        # Release connection back to the pool.
-        self._dbpool.putconn(connection)
 
-        return list(result)
+def _execute_once(connection, query: Query,
+                  values: typing.Union[typing.Tuple, typing.Dict], subsystem: str) -> typing.List:
+    # Create cursor, and execute the query.
+    with connection.cursor() as cursor:
+        return _execute(cursor, query, values, subsystem)
+
+
+def _execute(cursor, query: Query,
+             values: typing.Union[typing.Tuple, typing.Dict], subsystem: str) -> typing.List:
+    if __debug__:
+        logger.debug("executing query {}", query)  # noinspection PyUnreachableCode
+    started = perf_counter() if metrics.enabled() else None
+    if not isinstance(query, Statement):
+        cursor.execute(query, values)
+    elif not query.prepare:
+        cursor.execute(query.query, values)
+    else:
+        prepared = cursor.connection.prepared
+        if query.name not in prepared:
+            # not a transactional command, the statement stays prepared even if rolled back
+            cursor.execute(query.prepared_text)
+            prepared.add(query.name)
+        cursor.execute(query.execute_text, values)
+    # Check if cursor.description is NONE - meaning no results returned.
+    rows = cursor.fetchall() if cursor.description else []
+    if started is not None:
+        metrics.record_statement(subsystem,
+                                 query.name if isinstance(query, Statement) else metrics.AD_HOC,
+                                 perf_counter() - started, len(rows))
+    return rows
@@ -0,0 +1,292 @@
+"""
+metrics.py - Database query and pool instrumentation
+
+With `[stats]database` enabled, every statement's execution time and rows returned are recorded,
+along with the time spent waiting to check a connection out of the pool and the errors raised, by
+psycopg2 error class. Statements are recorded under the subsystem declaring them and their name,
+ad hoc queries under their subsystem alone. Pool sizes are read off the pools as they are.
+
+Everything recorded is queryable from IRC through `!stats database`, written alongside the
+invocation statistics to the Prometheus file, and can periodically be summarized into the log.
+
+Recording happens on the database's worker threads as well as on the event loop, and is
+serialized by a lock. Disabled, nothing is recorded, checking costs a dictionary lookup.
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import asyncio
+import collections
+import threading
+import typing
+import weakref
+
+from loguru import logger
+
+from src.config import CONFIG_MARKER
+from ..utils.histogram import Histogram, format_duration
+
+AD_HOC = "ad hoc"
+"""name ad hoc queries are recorded under"""
+
+_config: typing.Dict = {"database": False, "database_log_interval": 300}
+"""
+Database statistics configuration, as applied by the last rehash
+"""
+
+
+@CONFIG_MARKER
+def validate_config(data: typing.Dict):
+    """
+    Validate new configuration data.
+
+    Both keys live in the optional stats section, missing keys fall back to their defaults.
+
+    Args:
+        data (typing.Dict): new configuration data  to validate
+
+    Raises:
+        ValueError:  config section failed to validate.
+    """
+    section = data.get("stats", {})
+
+    if "database" in section and not isinstance(section["database"], bool):
+        raise ValueError("[stats]database must be a boolean.")
+
+    if "database_log_interval" in section and (
+            not isinstance(section["database_log_interval"], (int, float))
+            or isinstance(section["database_log_interval"], bool)
+            or section["database_log_interval"] < 0):
+        raise ValueError("[stats]database_log_interval must be a non-negative number.")
+
+
+@CONFIG_MARKER
+def rehash_handler(data: typing.Dict):
+    """
+    Apply new configuration data
+
+    Args:
+        data (typing.Dict): new configuration data to apply.
+
+    """
+    section = data.get("stats", {})
+    _config.update({key: section[key] for key in _config if key in section})
+    if asyncio.get_event_loop().is_running():
+        # rehashed at runtime, summaries may just have been enabled
+        start_summaries()
+
+
+class StatementStats:
+    """
+    Statistics of a single statement
+    """
+    __slots__ = ["duration", "rows"]
+
+    def __init__(self):
+        self.duration = Histogram()
+        """execution time, fetching the rows included"""
+        self.rows = 0
+        """rows returned, in total"""
+
+
+class PoolStats:
+    """
+    Statistics of the pools of a single subsystem
+    """
+    __slots__ = ["checkout", "errors"]
+
+    def __init__(self):
+        self.checkout = Histogram()
+        """time spent waiting for a connection"""
+        self.errors: typing.Counter[str] = collections.Counter()
+        """errors raised, by psycopg2 error class"""
+
+
+_lock = threading.Lock()
+_statements: typing.Dict[typing.Tuple[str, str], StatementStats] = {}
+_pools: typing.Dict[str, PoolStats] = {}
+_tracked: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_summarizer: typing.Optional[asyncio.Future] = None
+
+
+def enabled() -> bool:
+    """
+    Whether database statistics are being recorded
+    """
+    return _config["database"]
+
+
+def _pool_stats(subsystem: str) -> PoolStats:
+    stats = _pools.get(subsystem)
+    if stats is None:
+        stats = _pools[subsystem] = PoolStats()
+    return stats
+
+
+def record_statement(subsystem: str, name: str, seconds: float, rows: int):
+    """
+    Record a single execution of a statement.
+
+    Args:
+        subsystem: subsystem that declared the statement
+        name: name of the statement, AD_HOC for queries that weren't declared
+        seconds: execution time
+        rows: rows returned
+    """
+    with _lock:
+        stats = _statements.get((subsystem, name))
+        if stats is None:
+            stats = _statements[(subsystem, name)] = StatementStats()
+        stats.duration.observe(seconds)
+        stats.rows += rows
+
+
+def record_checkout(subsystem: str, seconds: float):
+    """
+    Record the time spent waiting for a connection to be checked out of the pool.
+    """
+    with _lock:
+        _pool_stats(subsystem).checkout.observe(seconds)
+
+
+def record_error(subsystem: str, error: Exception):
+    """
+    Record an error raised by a round trip to the database.
+    """
+    with _lock:
+        _pool_stats(subsystem).errors[type(error).__name__] += 1
+
+
+def track(subsystem: str, pool):
+    """
+    Report the size of *pool* under *subsystem*, for as long as the pool is around.
+    """
+    _tracked[pool] = subsystem
+
+
+def pool_sizes() -> typing.Dict[str, typing.Tuple[int, int]]:
+    """
+    Connections open and connections in use, by subsystem
+    """
+    sizes: typing.Dict[str, typing.Tuple[int, int]] = {}
+    # pylint: disable=protected-access
+    for pool, subsystem in list(_tracked.items()):
+        used = len(pool._used)
+        size, in_use = sizes.get(subsystem, (0, 0))
+        sizes[subsystem] = (size + used + len(pool._pool), in_use + used)
+    return sizes
+
+
+def reset():
+    """
+    Forget all recorded statistics
+    """
+    with _lock:
+        _statements.clear()
+        _pools.clear()
+
+
+def summarize() -> typing.List[str]:
+    """
+    Human readable summary lines, one per subsystem and one per statement.
+
+    Examples:
+        >>> reset()
+        >>> record_statement("facts", "fact_find", 0.002, 1)
+        >>> record_checkout("facts", 0.0001)
+        >>> summarize()[1]
+        'statement facts.fact_find: n=1 p50=2ms p95=2ms max=2ms rows=1'
+    """
+    sizes = pool_sizes()
+    with _lock:
+        lines = []
+        for subsystem in sorted(set(sizes) | set(_pools)):
+            size, in_use = sizes.get(subsystem, (0, 0))
+            stats = _pools.get(subsystem) or PoolStats()
+            checkout = stats.checkout
+            errors = " ".join(f"{name}={count}" for name, count in sorted(stats.errors.items()))
+            lines.append(f"pool {subsystem}: size={size} in use={in_use} "
+                         f"checkouts={checkout.count} p95={format_duration(checkout.quantile(0.95))} "
+                         f"max={format_duration(checkout.maximum)}"
+                         + (f" errors {errors}" if errors else ""))
+        for (subsystem, name), stats in sorted(_statements.items()):
+            duration = stats.duration
+            lines.append(f"statement {subsystem}.{name}: n={duration.count} "
+                         f"p50={format_duration(duration.quantile(0.5))} "
+                         f"p95={format_duration(duration.quantile(0.95))} "
+                         f"max={format_duration(duration.maximum)} rows={stats.rows}")
+    return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render_prometheus() -> typing.List[str]:
+    """
+    Lines of all recorded statistics in the Prometheus text exposition format, none while
+    disabled.
+    """
+    if not enabled():
+        return []
+    sizes = pool_sizes()
+    lines = ["# HELP mecha_db_pool_connections Pooled database connections, by state.",
+             "# TYPE mecha_db_pool_connections gauge"]
+    for subsystem, (size, in_use) in sorted(sizes.items()):
+        lines.append(f'mecha_db_pool_connections{{subsystem="{subsystem}",state="idle"}} '
+                     f'{size - in_use}')
+        lines.append(f'mecha_db_pool_connections{{subsystem="{subsystem}",state="used"}} '
+                     f'{in_use}')
+
+    with _lock:
+        lines.append("# HELP mecha_db_checkout_seconds Time spent waiting for a pooled connection.")
+        lines.append("# TYPE mecha_db_checkout_seconds histogram")
+        for subsystem, stats in sorted(_pools.items()):
+            lines.extend(stats.checkout.render_prometheus("mecha_db_checkout_seconds",
+                                                          f'subsystem="{subsystem}"'))
+
+        lines.append("# HELP mecha_db_errors_total Errors raised by the database, by class.")
+        lines.append("# TYPE mecha_db_errors_total counter")
+        for subsystem, stats in sorted(_pools.items()):
+            for error, count in sorted(stats.errors.items()):
+                lines.append(f'mecha_db_errors_total{{subsystem="{subsystem}",'
+                             f'error="{error}"}} {count}')
+
+        lines.append("# HELP mecha_db_statement_seconds Execution time of a statement.")
+        lines.append("# TYPE mecha_db_statement_seconds histogram")
+        for (subsystem, name), stats in sorted(_statements.items()):
+            lines.extend(stats.duration.render_prometheus(
+                "mecha_db_statement_seconds", f'subsystem="{subsystem}",name="{_escape(name)}"'))
+
+        lines.append("# HELP mecha_db_statement_rows_total Rows returned by a statement.")
+        lines.append("# TYPE mecha_db_statement_rows_total counter")
+        for (subsystem, name), stats in sorted(_statements.items()):
+            lines.append(f'mecha_db_statement_rows_total{{subsystem="{subsystem}",'
+                         f'name="{_escape(name)}"}} {stats.rows}')
+    return lines
+
+
+async def _summarize_periodically():
+    while enabled() and _config["database_log_interval"]:
+        await asyncio.sleep(_config["database_log_interval"])
+        if not enabled():
+            break
+        for line in summarize():
+            logger.info("database {}", line)
+
+
+def start_summaries():
+    """
+    Start periodically logging a summary of the database statistics, if enabled.
+
+    Calling this while summaries are already being logged does nothing.
+    """
+    global _summarizer  # pylint: disable=global-statement, invalid-name
+    if not enabled() or not _config["database_log_interval"] or (
+            _summarizer is not None and not _summarizer.done()):
+        return
+    _summarizer = asyncio.ensure_future(_summarize_periodically())
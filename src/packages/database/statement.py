@@ -0,0 +1,78 @@
+"""
+statement.py - Named statements, declared once and prepared server side
+
+A statement is declared once through `DatabaseManager.statement`, rather than composed anew for
+every query. Statements declared for preparation are prepared on each pooled connection the first
+time they run on it, and executed by name from then on, so the server parses and plans them once
+per connection instead of on every execution.
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import re
+import typing
+
+from psycopg2 import sql
+
+_PLACEHOLDER = re.compile(r"%%|%\((\w+)\)s|%s")
+"""a psycopg2 placeholder, named or positional, or an escaped percent sign"""
+
+
+class Statement:
+    """
+    A named statement, see `DatabaseManager.statement`.
+
+    Args:
+        name: name of the statement, unique amongst the statements of a database manager
+        query: composed SQL query object, with psycopg2 placeholders
+        prepare: whether to prepare the statement server side
+
+    Examples:
+        >>> statement = Statement("fact_find", sql.SQL("SELECT * FROM fact WHERE name=%s"))
+        >>> statement.prepared_text
+        'PREPARE "fact_find" AS SELECT * FROM fact WHERE name=$1'
+        >>> statement.execute_text
+        'EXECUTE "fact_find" (%s)'
+    """
+    __slots__ = ["name", "query", "prepare", "prepared_text", "execute_text"]
+
+    def __init__(self, name: str, query: sql.SQL, prepare: bool = True):
+        if not isinstance(query, sql.SQL):
+            raise TypeError("Expected composed SQL object for query.")
+        if not re.fullmatch(r"\w+", name):
+            raise ValueError(f"statement name {name!r} must be a single word")
+
+        self.name = name
+        self.query = query
+        self.prepare = prepare
+
+        # PostgreSQL numbers its parameters, psycopg2 fills its placeholders in order or by name
+        named: typing.List[str] = []
+        positional = 0
+
+        def number(match: typing.Match) -> str:
+            nonlocal positional
+            if match.group() == "%%":
+                return "%"
+            if match.group(1):
+                if match.group(1) not in named:
+                    named.append(match.group(1))
+                return f"${named.index(match.group(1)) + 1}"
+            positional += 1
+            return f"${positional}"
+
+        text = _PLACEHOLDER.sub(number, query.string)
+        if named and positional:
+            raise ValueError(f"statement {name!r} mixes named and positional placeholders")
+        parameters = [f"%({parameter})s" for parameter in named] or ["%s"] * positional
+
+        self.prepared_text = f'PREPARE "{name}" AS {text}'
+        self.execute_text = (f'EXECUTE "{name}" ({", ".join(parameters)})' if parameters
+                             else f'EXECUTE "{name}"')
+
+    def __repr__(self) -> str:
+        return f"Statement({self.name!r}, prepare={self.prepare})"
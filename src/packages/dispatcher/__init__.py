@@ -0,0 +1,17 @@
+"""
+__init__.py - Per-target ordered command execution
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+from src.config import PLUGIN_MANAGER
+from .dispatcher import Dispatcher, Lane, OverflowPolicy, LaneMetrics
+from . import dispatcher as _dispatcher
+
+__all__ = ["Dispatcher", "Lane", "OverflowPolicy", "LaneMetrics"]
+
+PLUGIN_MANAGER.register(_dispatcher, "dispatcher")
@@ -0,0 +1,278 @@
+"""
+dispatcher.py - Per-target ordered command execution
+
+Commands are no longer awaited inline by the IRC message handler. Instead each invocation is
+queued onto a lane of its target (channel or query), every lane being drained in order by its own
+worker task. Workers only exist while their lane has work queued.
+
+Two lanes exist per target:
+
+- the SIGNAL lane carries prefixless rule hits (ratsignals, RatMama announcements). It is never
+  subject to the global in-flight cap, and thus never waits behind slow network-bound commands.
+- the COMMAND lane carries everything else, and is subject to the global in-flight cap.
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+from __future__ import annotations
+
+import asyncio
+import collections
+import enum
+import typing
+from time import perf_counter
+
+from loguru import logger
+
+from src.config import CONFIG_MARKER
+from ..context import Context
+
+_config: typing.Dict = {"max_in_flight": 8, "queue_size": 32, "overflow": "drop_newest"}
+"""
+Dispatcher configuration, as applied by the last rehash
+"""
+
+
+class Lane(enum.Enum):
+    """
+    Execution lanes, every target has one queue per lane
+    """
+    SIGNAL = "signal"
+    """Ratsignals and announcements, never capped"""
+    COMMAND = "command"
+    """Regular commands, subject to the global in-flight cap"""
+
+
+class OverflowPolicy(enum.Enum):
+    """
+    What to do when an invocation arrives at a full queue
+    """
+    DROP_NEWEST = "drop_newest"
+    """Drop the arriving invocation"""
+    DROP_OLDEST = "drop_oldest"
+    """Evict the oldest queued invocation to make room for the arriving one"""
+
+
+@CONFIG_MARKER
+def validate_config(data: typing.Dict):
+    """
+    Validate new configuration data.
+
+    The dispatcher section is optional, missing keys fall back to their defaults.
+
+    Args:
+        data (typing.Dict): new configuration data  to validate
+
+    Raises:
+        ValueError:  config section failed to validate.
+    """
+    section = data.get("dispatcher", {})
+
+    for key in ("max_in_flight", "queue_size"):
+        if key in section and (not isinstance(section[key], int) or section[key] <= 0):
+            raise ValueError(f"[dispatcher]{key} must be a positive integer.")
+
+    if "overflow" in section:
+        # raises ValueError by itself on unknown policies
+        OverflowPolicy(section["overflow"])
+
+
+@CONFIG_MARKER
+def rehash_handler(data: typing.Dict):
+    """
+    Apply new configuration data
+
+    Changes apply to dispatchers created after the rehash.
+
+    Args:
+        data (typing.Dict): new configuration data to apply.
+
+    """
+    _config.update(data.get("dispatcher", {}))
+
+
+class _Job(typing.NamedTuple):
+    context: Context
+    enqueued: float
+
+
+class LaneMetrics:
+    """
+    Counters of a single lane, summed over all targets
+    """
+    __slots__ = ["submitted", "dropped", "completed", "failed", "total_wait", "max_wait"]
+
+    def __init__(self):
+        self.submitted = 0
+        """invocations accepted into a queue"""
+        self.dropped = 0
+        """invocations dropped due to a full queue"""
+        self.completed = 0
+        """invocations that have finished executing, successfully or not"""
+        self.failed = 0
+        """invocations that raised an exception"""
+        self.total_wait = 0.0
+        """seconds spent waiting in a queue, summed over all started invocations"""
+        self.max_wait = 0.0
+        """longest time an invocation has spent waiting in a queue, in seconds"""
+
+    @property
+    def mean_wait(self) -> float:
+        """
+        mean seconds an invocation spends waiting in a queue
+        """
+        started = self.completed
+        return self.total_wait / started if started else 0.0
+
+    def __repr__(self) -> str:
+        return (f"LaneMetrics(submitted={self.submitted}, dropped={self.dropped}, "
+                f"completed={self.completed}, failed={self.failed}, "
+                f"mean_wait={self.mean_wait:.6f}, max_wait={self.max_wait:.6f})")
+
+
+class Dispatcher:
+    """
+    Executes command invocations, ordered per target and lane.
+
+    Args:
+        handler: coroutine function executing an invocation, such as `trigger`
+        error_handler: coroutine function invoked with the context and the exception
+            whenever *handler* raises
+        max_in_flight: maximum number of COMMAND lane invocations executing concurrently
+        queue_size: maximum number of queued invocations per target and lane
+        overflow: what to do once a queue is full
+    """
+
+    def __init__(self,
+                 handler: typing.Callable[[Context], typing.Awaitable],
+                 error_handler: typing.Callable[[Context, Exception], typing.Awaitable],
+                 *,
+                 max_in_flight: typing.Optional[int] = None,
+                 queue_size: typing.Optional[int] = None,
+                 overflow: typing.Optional[OverflowPolicy] = None):
+        self._handler = handler
+        self._error_handler = error_handler
+        self._max_in_flight = max_in_flight if max_in_flight else _config["max_in_flight"]
+        self._queue_size = queue_size if queue_size else _config["queue_size"]
+        self._overflow = overflow if overflow else OverflowPolicy(_config["overflow"])
+
+        self._queues: typing.Dict[typing.Tuple[str, Lane], typing.Deque[_Job]] = {}
+        self._workers: typing.Dict[typing.Tuple[str, Lane], asyncio.Task] = {}
+        self._in_flight = 0
+        # created on first use, so it binds to the running event loop
+        self._slots: typing.Optional[asyncio.Semaphore] = None
+        self._metrics = {lane: LaneMetrics() for lane in Lane}
+
+    def submit(self, context: Context, lane: Lane = Lane.COMMAND) -> bool:
+        """
+        Queue an invocation for execution.
+
+        Args:
+            context: the invocation's context
+            lane: lane to queue the invocation onto
+
+        Returns:
+            bool: False if the invocation was dropped due to a full queue.
+        """
+        key = (context.target.casefold(), lane)
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = collections.deque()
+
+        metrics = self._metrics[lane]
+        if len(queue) >= self._queue_size:
+            metrics.dropped += 1
+            if self._overflow is OverflowPolicy.DROP_NEWEST:
+                logger.warning("{} queue for {} is full, dropping {!r}",
+                               lane.value, context.target, context.words_eol[0])
+                return False
+            evicted = queue.popleft()
+            logger.warning("{} queue for {} is full, evicting {!r}",
+                           lane.value, context.target, evicted.context.words_eol[0])
+
+        queue.append(_Job(context, perf_counter()))
+        metrics.submitted += 1
+
+        if key not in self._workers:
+            self._workers[key] = asyncio.ensure_future(self._work(key, queue))
+        return True
+
+    async def _work(self, key: typing.Tuple[str, Lane], queue: typing.Deque[_Job]):
+        """
+        Drains a single queue, in order, then retires.
+        """
+        _, lane = key
+        metrics = self._metrics[lane]
+
+        try:
+            while queue:
+                job = queue.popleft()
+                if lane is Lane.SIGNAL:
+                    await self._execute(job, metrics)
+                    continue
+
+                if self._slots is None:
+                    self._slots = asyncio.Semaphore(self._max_in_flight)
+                async with self._slots:
+                    await self._execute(job, metrics)
+        finally:
+            # nothing may be queued between the empty check above and this point, as we don't
+            # yield. Should the worker die early, the next submission starts a fresh one draining
+            # what is left.
+            del self._workers[key]
+            if not queue:
+                del self._queues[key]
+
+    async def _execute(self, job: _Job, metrics: LaneMetrics):
+        """
+        Executes a single invocation, accounting for it in *metrics*.
+        """
+        wait = perf_counter() - job.enqueued
+        metrics.total_wait += wait
+        metrics.max_wait = max(metrics.max_wait, wait)
+
+        self._in_flight += 1
+        try:
+            await self._handler(job.context)
+        # a broad catch is exactly what we want, one failing command mustn't kill the worker
+        except Exception as ex:  # pylint: disable=broad-except
+            metrics.failed += 1
+            try:
+                await self._error_handler(job.context, ex)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("failed to report the failure of {!r}", job.context.words_eol[0])
+        finally:
+            self._in_flight -= 1
+            metrics.completed += 1
+
+    async def join(self):
+        """
+        Waits until every queue has been drained.
+        """
+        while self._workers:
+            await asyncio.gather(*self._workers.values(), return_exceptions=True)
+
+    @property
+    def in_flight(self) -> int:
+        """
+        Number of invocations currently executing
+        """
+        return self._in_flight
+
+    @property
+    def depths(self) -> typing.Dict[typing.Tuple[str, Lane], int]:
+        """
+        Number of queued invocations, by target and lane. Drained queues are omitted.
+        """
+        return {key: len(queue) for key, queue in self._queues.items() if queue}
+
+    @property
+    def metrics(self) -> typing.Dict[Lane, LaneMetrics]:
+        """
+        Counters of every lane
+        """
+        return self._metrics
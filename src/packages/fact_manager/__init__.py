@@ -8,7 +8,15 @@ Licensed under the BSD 3-Clause License.
 
 See LICENSE.md
 """
-__all__ = ["fact_manager", "fact"]
+__all__ = ["fact_manager", "fact", "fact_cache", "fact_index", "transaction_log"]
 
+from src.config import PLUGIN_MANAGER
 from .fact_manager import *
 from .fact import Fact
+from .fact_cache import FactCache, CacheInfo
+from .fact_index import FuzzyIndex, TextIndex
+from .transaction_log import TransactionLogWriter
+from . import fact_cache, transaction_log
+
+PLUGIN_MANAGER.register(fact_cache, "fact_cache")
+PLUGIN_MANAGER.register(transaction_log, "transaction_log")
@@ -0,0 +1,212 @@
+"""
+fact_cache.py - In-process cache of facts
+
+Facts are read thousands of times for every edit, so the `FactManager` keeps recently used facts
+in memory. The cache is a plain LRU keyed by `(name, lang)`, every write the manager performs
+invalidates the entries it touches. Writes made by anyone else, another instance or someone
+editing the table directly, show once the cached fact expired, after [facts]ttl seconds.
+
+Most lookups of facts that don't exist are typos or commands of other bots sharing our prefix,
+which get asked for over and over again. Those are remembered as missing for a while, too.
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import collections
+import math
+import typing
+from time import monotonic
+
+from src.config import CONFIG_MARKER
+from .fact import Fact
+
+_config: typing.Dict = {"cache_size": 512, "ttl": 60, "negative_ttl": 300, "fallback": ["en"],
+                        "suggest": False, "preload": False, "refresh_interval": 60}
+"""
+Fact configuration, as applied by the last rehash
+"""
+
+
+@CONFIG_MARKER
+def validate_config(data: typing.Dict):
+    """
+    Validate new configuration data.
+
+    The facts section is optional, missing keys fall back to their defaults.
+
+    Args:
+        data (typing.Dict): new configuration data  to validate
+
+    Raises:
+        ValueError:  config section failed to validate.
+    """
+    section = data.get("facts", {})
+
+    if "cache_size" in section and (
+            not isinstance(section["cache_size"], int) or section["cache_size"] < 0):
+        raise ValueError("[facts]cache_size must be a non-negative integer.")
+
+    for key in ("ttl", "negative_ttl"):
+        if key in section and (
+                not isinstance(section[key], (int, float)) or section[key] < 0):
+            raise ValueError(f"[facts]{key} must be a non-negative number.")
+
+    if "fallback" in section and (
+            not isinstance(section["fallback"], list)
+            or not all(isinstance(lang, str) and lang for lang in section["fallback"])):
+        raise ValueError("[facts]fallback must be a list of language IDs.")
+
+    for key in ("suggest", "preload"):
+        if key in section and not isinstance(section[key], bool):
+            raise ValueError(f"[facts]{key} must be a boolean.")
+
+    if "refresh_interval" in section and (
+            not isinstance(section["refresh_interval"], (int, float))
+            or section["refresh_interval"] <= 0):
+        raise ValueError("[facts]refresh_interval must be a positive number.")
+
+
+@CONFIG_MARKER
+def rehash_handler(data: typing.Dict):
+    """
+    Apply new configuration data
+
+    Cache size and TTLs apply to fact managers created after the rehash. A running refresh
+    picks up the new interval after its current interval elapsed, and stops if preloading got
+    disabled.
+
+    Args:
+        data (typing.Dict): new configuration data to apply.
+
+    """
+    _config.update(data.get("facts", {}))
+
+
+class CacheInfo(typing.NamedTuple):
+    """
+    Fact cache counters
+    """
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+    capacity: int
+
+
+class FactCache:
+    """
+    Least recently used cache of facts, keyed by `(name, lang)`.
+
+    Cached facts are shared by everyone reading them and must not be modified, each is served for
+    *ttl* seconds. Facts known not to exist are remembered separately, up to as many as facts are
+    cached, for *negative_ttl* seconds each.
+
+    Args:
+        capacity: maximum number of facts held, zero disables caching
+        ttl: seconds a fact is served from the cache, zero serves it until evicted, for
+            deployments where nobody but this instance writes to the fact table
+        negative_ttl: seconds a fact is remembered as missing, zero disables doing so
+    """
+
+    def __init__(self, capacity: typing.Optional[int] = None,
+                 negative_ttl: typing.Optional[float] = None, ttl: typing.Optional[float] = None):
+        self._capacity = _config["cache_size"] if capacity is None else capacity
+        self._ttl = _config["ttl"] if ttl is None else ttl
+        self._negative_ttl = _config["negative_ttl"] if negative_ttl is None else negative_ttl
+        # facts and their expiry, least recently used first
+        self._facts: typing.OrderedDict[typing.Tuple[str, str], typing.Tuple[Fact, float]] = \
+            collections.OrderedDict()
+        # expiry of facts known to be missing, soonest first
+        self._missing: typing.OrderedDict[typing.Tuple[str, str], float] = \
+            collections.OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, name: str, lang: str) -> typing.Optional[Fact]:
+        """
+        Returns the cached fact, or None if it isn't cached.
+        """
+        if (name, lang) not in self:
+            self._misses += 1
+            return None
+
+        self._hits += 1
+        self._facts.move_to_end((name, lang))
+        return self._facts[(name, lang)][0]
+
+    def put(self, fact: Fact):
+        """
+        Caches *fact*, evicting the least recently used fact if the cache is full.
+        """
+        if not self._capacity:
+            return
+        key = (fact.name, fact.lang)
+        self._facts[key] = (fact, monotonic() + self._ttl if self._ttl else math.inf)
+        self._facts.move_to_end(key)
+        while len(self._facts) > self._capacity:
+            self._facts.popitem(last=False)
+            self._evictions += 1
+
+    def put_missing(self, name: str, lang: str):
+        """
+        Remembers a fact as missing, evicting the one soonest to expire if there are too many.
+        """
+        if not self._capacity or not self._negative_ttl:
+            return
+        key = (name, lang)
+        self._missing[key] = monotonic() + self._negative_ttl
+        self._missing.move_to_end(key)
+        while len(self._missing) > self._capacity:
+            self._missing.popitem(last=False)
+
+    def is_missing(self, name: str, lang: str) -> bool:
+        """
+        Whether a fact is known not to exist.
+        """
+        expiry = self._missing.get((name, lang))
+        if expiry is None:
+            return False
+        if expiry <= monotonic():
+            del self._missing[(name, lang)]
+            return False
+        return True
+
+    def invalidate(self, name: str, lang: str):
+        """
+        Forgets a fact, if it is cached or known to be missing.
+        """
+        self._facts.pop((name, lang), None)
+        self._missing.pop((name, lang), None)
+
+    def clear(self):
+        """
+        Forgets every cached fact, and every fact known to be missing.
+        """
+        self._facts.clear()
+        self._missing.clear()
+
+    def __contains__(self, key: typing.Tuple[str, str]) -> bool:
+        entry = self._facts.get(key)
+        if entry is None:
+            return False
+        if entry[1] <= monotonic():
+            # expired, it has to be fetched afresh
+            del self._facts[key]
+            return False
+        return True
+
+    def __len__(self) -> int:
+        return len(self._facts)
+
+    @property
+    def info(self) -> CacheInfo:
+        """
+        Current counters of the cache
+        """
+        return CacheInfo(self._hits, self._misses, self._evictions, len(self._facts),
+                         self._capacity)
@@ -0,0 +1,203 @@
+"""
+fact_index.py - In-memory indices of fact names and messages
+
+Asking for a fact that doesn't exist is mostly a typo of one that does. Fact names are kept in a
+trigram index, the way PostgreSQL's pg_trgm indexes text, so the names closest to a miss can be
+suggested without scanning the fact table.
+
+Fact messages are kept in an inverted index, so facts mentioning a word can be found without
+pattern matching every message in the fact table.
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import collections
+import math
+import re
+import typing
+
+SUGGEST_THRESHOLD = 0.3
+"""least similarity of a name to be suggested, pg_trgm's default"""
+
+_WORD = re.compile(r"\w+")
+
+
+def trigrams(word: str) -> typing.FrozenSet[str]:
+    """
+    Trigrams of a word, padded with two spaces in front and one behind.
+
+    Examples:
+        >>> sorted(trigrams("PC"))
+        ['  p', ' pc', 'pc ']
+    """
+    padded = f"  {word.casefold()} "
+    return frozenset(padded[index:index + 3] for index in range(len(padded) - 2))
+
+
+class FuzzyIndex:
+    """
+    Trigram index of fact names, by language.
+
+    Similarity of two names is the share of their trigrams they have in common, from 0 for
+    nothing in common to 1 for equal names.
+
+    Args:
+        names: (name, lang) pairs to index right away
+    """
+    __slots__ = ["_postings", "_trigrams"]
+
+    def __init__(self, names: typing.Iterable[typing.Tuple[str, str]] = ()):
+        # names, by trigram, by language
+        self._postings: typing.Dict[str, typing.Dict[str, typing.Set[str]]] = {}
+        self._trigrams: typing.Dict[typing.Tuple[str, str], typing.FrozenSet[str]] = {}
+        for name, lang in names:
+            self.add(name, lang)
+
+    def add(self, name: str, lang: str):
+        """
+        Indexes a name, if it isn't already.
+        """
+        if (name, lang) in self._trigrams:
+            return
+        self._trigrams[(name, lang)] = grams = trigrams(name)
+        postings = self._postings.setdefault(lang, {})
+        for gram in grams:
+            postings.setdefault(gram, set()).add(name)
+
+    def remove(self, name: str, lang: str):
+        """
+        Forgets a name, if it is indexed.
+        """
+        grams = self._trigrams.pop((name, lang), None)
+        if grams is None:
+            return
+        postings = self._postings[lang]
+        for gram in grams:
+            postings[gram].discard(name)
+            if not postings[gram]:
+                del postings[gram]
+
+    def search(self, text: str, lang: str, limit: int = 3,
+               threshold: float = SUGGEST_THRESHOLD) -> typing.List[str]:
+        """
+        Names of a language most similar to *text*, most similar first.
+
+        Args:
+            text: what to search for
+            lang: language whose names to search
+            limit: most names to return
+            threshold: least similarity of a name returned
+
+        Examples:
+            >>> index = FuzzyIndex([("assign", "en"), ("prep", "en"), ("pcwing", "en")])
+            >>> index.search("assing", "en")
+            ['assign']
+        """
+        wanted = trigrams(text)
+        postings = self._postings.get(lang, {})
+        common: typing.Counter[str] = collections.Counter()
+        for gram in wanted:
+            common.update(postings.get(gram, ()))
+
+        scored = []
+        for name, shared in common.items():
+            similarity = shared / (len(wanted) + len(self._trigrams[(name, lang)]) - shared)
+            if similarity >= threshold:
+                scored.append((-similarity, name))
+        scored.sort()
+        return [name for _, name in scored[:limit]]
+
+    def __contains__(self, key: typing.Tuple[str, str]) -> bool:
+        return key in self._trigrams
+
+    def __len__(self) -> int:
+        return len(self._trigrams)
+
+
+def words(text: str) -> typing.List[str]:
+    """
+    Casefolded words of a text, formatting codes and punctuation dropped.
+
+    Examples:
+        >>> words("Turn your \x02Beacon\x02 on, then re-log!")
+        ['turn', 'your', 'beacon', 'on', 'then', 're', 'log']
+    """
+    return _WORD.findall(text.casefold())
+
+
+class TextIndex:
+    """
+    Inverted index of fact messages, keyed by `(name, lang)`.
+
+    Facts are ranked by TF-IDF, words occurring in few facts weigh more than words occurring in
+    many, and facts mentioning a word often rank above facts mentioning it in passing.
+    """
+    __slots__ = ["_postings", "_documents", "_lengths"]
+
+    def __init__(self, facts: typing.Iterable[typing.Tuple[str, str, str]] = ()):
+        # occurrences in each fact, by word
+        self._postings: typing.Dict[str, typing.Dict[typing.Tuple[str, str], int]] = {}
+        self._documents: typing.Dict[typing.Tuple[str, str], typing.Counter[str]] = {}
+        # words in each fact
+        self._lengths: typing.Dict[typing.Tuple[str, str], int] = {}
+        for name, lang, message in facts:
+            self.add(name, lang, message)
+
+    def add(self, name: str, lang: str, message: str):
+        """
+        Indexes a fact's message, replacing the message indexed before, if any.
+        """
+        key = (name, lang)
+        self.remove(name, lang)
+        found = words(message)
+        self._documents[key] = counts = collections.Counter(found)
+        self._lengths[key] = len(found)
+        for word, count in counts.items():
+            self._postings.setdefault(word, {})[key] = count
+
+    def remove(self, name: str, lang: str):
+        """
+        Forgets a fact's message, if it is indexed.
+        """
+        counts = self._documents.pop((name, lang), None)
+        if counts is None:
+            return
+        del self._lengths[(name, lang)]
+        for word in counts:
+            postings = self._postings[word]
+            del postings[(name, lang)]
+            if not postings:
+                del self._postings[word]
+
+    def search(self, text: str, limit: int = 5) -> typing.List[typing.Tuple[str, str]]:
+        """
+        Facts whose messages mention the words of *text*, best match first.
+
+        Examples:
+            >>> index = TextIndex([("prep", "en", "Drop from supercruise, then stop."),
+            ...                    ("beacon", "en", "Turn your wing beacon on."),
+            ...                    ("wing", "en", "Send a wing invite, then beacon.")])
+            >>> index.search("beacon")
+            [('beacon', 'en'), ('wing', 'en')]
+        """
+        scores: typing.Dict[typing.Tuple[str, str], float] = collections.defaultdict(float)
+        for word in set(words(text)):
+            postings = self._postings.get(word)
+            if not postings:
+                continue
+            weight = math.log(1 + len(self._documents) / len(postings))
+            for key, count in postings.items():
+                scores[key] += weight * count / self._lengths[key]
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [key for key, _ in ranked[:limit]]
+
+    def __contains__(self, key: typing.Tuple[str, str]) -> bool:
+        return key in self._documents
+
+    def __len__(self) -> int:
+        return len(self._documents)
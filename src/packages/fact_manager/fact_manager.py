@@ -11,12 +11,16 @@ Licensed under the BSD 3-Clause License.
 
 See LICENSE.md
 """
+import asyncio
 import datetime
 import psycopg2
 import typing
 from psycopg2 import sql, pool
 from loguru import logger
 from .fact import Fact
+from .fact_cache import FactCache, CacheInfo, _config as _facts_config
+from .fact_index import FuzzyIndex, TextIndex, SUGGEST_THRESHOLD
+from .transaction_log import TransactionLogWriter
 from ..database import DatabaseManager
 from src.config import CONFIG_MARKER
 
@@ -26,15 +30,43 @@ class FactManager(DatabaseManager):
     Fact Manager class inherits DatabaseManager to provide methods for interfacing with Fact objects
     stored in a fact table.
 
+    Facts read are cached in-process, writes going through the manager invalidate the facts they
+    touch. Writes made to the fact table by anyone else show once the cached fact expired, after
+    [facts]ttl seconds.
+    Facts found missing are remembered as such for [facts]negative_ttl seconds.
+
+    Facts may have aliases, names they can be asked for by other than their own. Aliases are
+    resolved through an in-memory index of the whole table's aliases, writes going through the
+    manager keep it up to date. The index is loaded and reloaded every [facts]refresh_interval
+    seconds by the background refresh, or on every refresh when preloading, never on the way of a
+    read. Aliases set by anyone else show once it got reloaded.
+    Fact names and aliases are fuzzily indexed alongside, to suggest facts close to a miss.
+    Fact messages are indexed alongside, loaded and reloaded alike.
+
+    Changes to facts are logged write-behind, see transaction_log, the commands making them don't
+    wait for their log rows to be written.
+
+    With [facts]preload enabled, the whole fact table is instead loaded into a snapshot serving
+    every read. A background refresh probes the table for changes made by anyone else and reloads
+    what changed. Should the database become unavailable, reads keep being served from the last
+    snapshot loaded.
+
     Args:
         fact_table: (Optional) defaults to "fact2", name of fact table.
         fact_log: (Optional) defaults ot "fact_transaction", name of transaction log table.
+        cache_size: (Optional) defaults to [facts]cache_size, facts held in the cache.
 
     Returns:
         Nothing
     """
     _config: typing.ClassVar[typing.Dict]
 
+    SUBSYSTEM = "facts"
+    """subsystem the fact statements are recorded under, see DatabaseManager"""
+
+    _COLUMNS = "name, lang, message, tsvector_to_array(aliases), author, edited, editedby, mfd"
+    """columns selected to make up a fact, see _fact_from_row"""
+
     @classmethod
     @CONFIG_MARKER
     def rehash_handler(cls, data: typing.Dict):
@@ -47,7 +79,7 @@ class FactManager(DatabaseManager):
         """
         cls._config = data
 
-    def __init__(self, fact_table=None, fact_log=None):
+    def __init__(self, fact_table=None, fact_log=None, cache_size=None):
 
         # Pull table names from config file
         self._fact_table = fact_table if fact_table else self._config['database']['fact_table']
@@ -60,10 +92,80 @@ class FactManager(DatabaseManager):
         if not isinstance(self._fact_log, str):
             raise TypeError("Fact log table name must be a string")
 
+        self._cache = FactCache(cache_size)
+        self._snapshot: typing.Optional[typing.Dict[typing.Tuple[str, str], Fact]] = None
+        # table row count, last edit and facts marked for deletion, as of the snapshot
+        self._version: typing.Optional[typing.Tuple] = None
+        self._refresher: typing.Optional[asyncio.Future] = None
+        # canonical fact name, by alias and language
+        self._aliases: typing.Optional[typing.Dict[typing.Tuple[str, str], str]] = None
+        self._names: typing.Optional[FuzzyIndex] = None
+        self._texts: typing.Optional[TextIndex] = None
+
         # Proclaim loudly into the void that we are loaded.
         super().__init__()
+        self._declare_statements()
+        self._log = TransactionLogWriter(self, self._statements["fact_log"])
         logger.info("Fact Manager Initialized.")
 
+    def _declare_statements(self):
+        """
+        Declares the statements run against the fact and log tables.
+
+        Whole table loads run rarely, they aren't worth preparing.
+        """
+        table, log, columns = self._fact_table, self._fact_log, self._COLUMNS
+        for name, query, prepare in (
+                ("fact_find", f"SELECT {columns} FROM {table} WHERE name=%s AND lang=%s", True),
+                ("fact_exists", f"SELECT COUNT(*) FROM {table} WHERE name=%s AND lang=%s", True),
+                ("fact_add", f"INSERT INTO {table} "
+                             f"(name, lang, message, aliases, author, edited, editedby, mfd) "
+                             f"VALUES (%s, %s, %s, array_to_tsvector(%s::text[]), "
+                             f"%s, %s, %s, %s) RETURNING {columns}", True),
+                ("fact_destroy", f"DELETE FROM {table} WHERE name=%s AND lang=%s", True),
+                # only a fact marked for deletion is deleted, checked and done in one statement
+                ("fact_delete", f"DELETE FROM {table} "
+                                f"WHERE name=%s AND lang=%s AND mfd RETURNING name", True),
+                # edited and logged in one statement, returning the message edited over as well
+                # as the edited fact
+                ("fact_edit", f"WITH changed AS ("
+                              f"UPDATE {table} SET message=%(message)s, "
+                              f"edited=%(edit_time)s FROM (SELECT name AS old_name, "
+                              f"lang AS old_lang, message AS old_message FROM {table} "
+                              f"WHERE name=%(name)s AND lang=%(lang)s FOR UPDATE) AS old "
+                              f"WHERE name=old_name AND lang=old_lang "
+                              f"RETURNING old_message, {columns}), "
+                              f"logged AS (INSERT INTO {log} "
+                              f"(name, lang, author, message, old, new, ts) "
+                              f"SELECT name, lang, %(editor)s, 'Edited', old_message, message, "
+                              f"%(edit_time)s FROM changed) "
+                              f"SELECT * FROM changed", True),
+                # a fact never marked counts as unmarked
+                ("fact_mfd", f"UPDATE {table} SET mfd=NOT COALESCE(mfd, FALSE) "
+                             f"WHERE name=%s AND lang=%s RETURNING {columns}", True),
+                ("fact_mfd_list", f"SELECT name, lang FROM {table} WHERE mfd=%s "
+                                  f"ORDER BY edited DESC LIMIT %s", True),
+                ("fact_lock_aliases", f"SELECT tsvector_to_array(aliases) FROM {table} "
+                                      f"WHERE name=%s AND lang=%s FOR UPDATE", True),
+                ("fact_set_aliases", f"UPDATE {table} "
+                                     f"SET aliases=array_to_tsvector(%s::text[]), edited=%s "
+                                     f"WHERE name=%s AND lang=%s RETURNING {columns}", True),
+                # a whole batch of log rows in one statement, one array per column
+                ("fact_log", f"INSERT INTO {log} (name, lang, author, message, old, new, ts) "
+                             f"SELECT * FROM unnest(%s::varchar[], %s::varchar[], "
+                             f"%s::varchar[], %s::varchar[], %s::varchar[], %s::varchar[], "
+                             f"%s::timestamptz[])", True),
+                ("fact_history", f"SELECT name, lang, author, message, ts, old, new "
+                                 f"FROM {log} WHERE name=%s AND lang=%s "
+                                 f"ORDER BY ts DESC LIMIT 5", True),
+                ("fact_probe", f"SELECT COUNT(*), MAX(edited), COUNT(*) FILTER (WHERE mfd) "
+                               f"FROM {table}", True),
+                ("fact_edited_since", f"SELECT {columns} FROM {table} WHERE edited >= %s", True),
+                ("fact_all", f"SELECT {columns} FROM {table}", False),
+                ("fact_indices", f"SELECT name, lang, tsvector_to_array(aliases), message "
+                                 f"FROM {table}", False)):
+            self.statement(name, sql.SQL(query), prepare)
+
     async def add(self, fact: Fact):
         """
         Adds a new fact to the database.  This will result in a ProgrammingError being thrown
@@ -71,33 +173,33 @@ class FactManager(DatabaseManager):
 
         VERIFY IF THE FACT EXISTS WITH self.EXISTS() FIRST.
 
-        Aliases cannot be inserted this way, at this time.  None is forced for fact.aliases.
-
         Args:
-            fact: Fact Object to add.
+            fact: Fact Object to add, its aliases may be omitted.
 
         Returns:
             Nothing.
 
         Raises:
             TypeError: Attempt to commit incomplete Fact.
+            ValueError: The fact's name, or one of its aliases, is already taken.
             pyscopg2.DatabaseError: Database Unavailable.
             psycopg2.IntegrityError: Primary Key violation on table.
         """
-        # I said don't judge my SQL :(
-        add_query = sql.SQL(f"INSERT INTO {self._fact_table} "
-                            f"(name, lang, message, aliases, author, edited, editedby, mfd) "
-                            f"VALUES ( %s, %s, %s, %s, %s, %s, %s, %s )")
-
         try:
             if not fact.complete:
                 raise TypeError("Attempted commit on incomplete Fact.")
 
-            add_values = (fact.name, fact.lang, fact.message, None,
+            await self._ensure_names()
+            if self._canonical(fact.name, fact.lang) != fact.name:
+                raise ValueError(f"'{fact.name}' is already an alias of another fact.")
+            aliases = await self._free_aliases(fact.name, fact.lang, fact.aliases or [])
+
+            add_values = (fact.name, fact.lang, fact.message, aliases or None,
                           fact.author, fact.edited, fact.editedby, fact.mfd)
 
             # run INSERT query
-            await self.query(add_query, add_values)
+            rows = await self.query(self._statements["fact_add"], add_values)
+            await self._written(fact.name, fact.lang, rows)
 
         except (psycopg2.DatabaseError, psycopg2.IntegrityError) as error:
             # Database is not available, or fact already exists and wasn't checked.
@@ -116,9 +218,8 @@ class FactManager(DatabaseManager):
 
         Returns: Nothing.
         """
-        del_query = sql.SQL(f"DELETE FROM {self._fact_table} WHERE name=%s AND lang=%s")
-
-        await self.query(del_query, (name, lang))
+        await self.query(self._statements["fact_destroy"], (name, lang))
+        await self._written(name, lang, [])
 
     async def delete(self, name: str, lang: str):
         """
@@ -134,15 +235,16 @@ class FactManager(DatabaseManager):
 
         Raises: psycopg2.ProgrammingError if fact is not marked for deletion.
         """
-        fact = await self.find(name, lang)
+        await self._ensure_names()
+        name = self._canonical(name, lang)
 
-        # Check the fact's property to verify it is marked for deletion
-        if fact is None or not fact.mfd:
+        # Only a fact marked for deletion is deleted, checked and done in a single statement.
+        if not await self.query(self._statements["fact_delete"], (name, lang)):
             logger.exception("Attempted deletion of fact not marked for delete or does not exist.")
             raise psycopg2.ProgrammingError(f"{name}-{lang} is not marked for "
                                             f"deletion or does not exist")
 
-        await self._destroy(name, lang)
+        await self._written(name, lang, [])
 
     async def edit_message(self, name: str, lang: str, editor: str, new_message: str):
         """
@@ -158,31 +260,31 @@ class FactManager(DatabaseManager):
         Returns: Nothing
 
         Raises:
+            ValueError: No such fact.
             psycopg2.ProgrammingError: On query failure.
             psycopg2.DatabaseError: On any connectivity issue or no database available.
         """
-        if not await self.exists(name, lang):
-            logger.exception("Attempted edit on non-existent fact.")
-            raise ValueError
-
-        try:
-            current_fact = await self.find(name, lang)
-
-            edit_query = sql.SQL(f"UPDATE {self._fact_table} SET message=%(message)s, "
-                                 f"edited=%(edit_time)s WHERE name=%(name)s AND lang=%(lang)s")
+        await self._ensure_names()
+        name = self._canonical(name, lang)
 
-            query_values = {"edit_time": datetime.datetime.now(datetime.timezone.utc),
-                            "message": new_message, "name": name, "lang": lang}
+        # Edit and log it in a single statement, returning the message edited over as well as
+        # the edited fact.
+        query_values = {"edit_time": datetime.datetime.now(datetime.timezone.utc),
+                        "message": new_message, "name": name, "lang": lang, "editor": editor}
 
-            logger.debug(f"query_values = {query_values}")
+        logger.debug(f"query_values = {query_values}")
 
-            await self.query(edit_query, query_values)
+        try:
+            rows = await self.query(self._statements["fact_edit"], query_values)
         except (psycopg2.ProgrammingError, psycopg2.DatabaseError) as error:
             logger.exception(f"Editing fact '{name}-{lang}' failed.")
             raise error
-        else:
-            await self.add_transaction(fact_name=name, fact_lang=lang, author=editor, msg='Edited',
-                                       new_field=new_message, old_field=current_fact.message)
+
+        if not rows:
+            logger.exception("Attempted edit on non-existent fact.")
+            raise ValueError
+
+        await self._written(name, lang, [row[1:] for row in rows])
 
     async def exists(self, name: str, lang: str) -> bool:
         """
@@ -194,11 +296,17 @@ class FactManager(DatabaseManager):
 
         Returns: True/False, if already exists.
         """
-        query = sql.SQL(f"SELECT COUNT(*) message FROM "
-                        f"{self._fact_table} WHERE name=%s AND lang=%s")
+        name = self._canonical(name, lang)
+        if self._snapshot is not None:
+            return (name, lang) in self._snapshot
+
+        if (name, lang) in self._cache:
+            return True
+        if self._cache.is_missing(name, lang):
+            return False
 
         try:
-            result = await self.query(query, (name, lang))
+            result = await self.query(self._statements["fact_exists"], (name, lang))
         except (psycopg2.ProgrammingError, psycopg2.DatabaseError, psycopg2.pool.PoolError) as error:
             # Check for offline database
             if isinstance(error, psycopg2.pool.PoolError):
@@ -215,8 +323,91 @@ class FactManager(DatabaseManager):
 
         # We are only getting a single integer as a response, so we can unpack it by index.
         # it will always return a single integer.
+        if not result[0][0]:
+            self._cache.put_missing(name, lang)
         return result[0][0]
 
+    @staticmethod
+    def _chain(lang: str) -> typing.List[str]:
+        """
+        Languages to look a fact up in, best first: the requested one, its base language and the
+        configured fallbacks.
+
+        Examples:
+            >>> FactManager._chain("pt_br")
+            ['pt_br', 'pt', 'en']
+        """
+        chain = [lang, lang.split("_")[0], *_facts_config["fallback"]]
+        return list(dict.fromkeys(chain))
+
+    async def find_many(self, requests: typing.Sequence[typing.Tuple[str, str]],
+                        admit: typing.Optional[typing.Callable[[], bool]] = None
+                        ) -> typing.Optional[typing.List[typing.Optional[Fact]]]:
+        """
+        Finds several facts at once, each in the best language available.
+
+        Every fact falls back from the requested language to its base language, then to the
+        languages of [facts]fallback. Whatever isn't cached is fetched in a single query, no
+        matter how many facts or languages that spans.
+
+        Args:
+            requests: name and language ID of each fact wanted
+            admit: (Optional) asked right before going to the database, the lookup is abandoned
+                if it declines. Lookups answered from memory never ask.
+
+        Returns:
+            the best match of each fact, in order, None where no language has it. The language
+            a fact came in is its `lang`. None instead of a list if *admit* declined.
+        """
+        # candidate (name, lang) keys of each fact, best first
+        chains = []
+        for name, lang in requests:
+            chains.append([(self._canonical(name, candidate), candidate)
+                           for candidate in self._chain(lang)])
+
+        if self._snapshot is not None:
+            return [next((self._snapshot[key] for key in chain if key in self._snapshot), None)
+                    for chain in chains]
+
+        wanted = {}
+        for chain in chains:
+            for key in chain:
+                if key in self._cache:
+                    break
+                if not self._cache.is_missing(*key):
+                    wanted[key] = None
+
+        fetched = {}
+        if wanted and admit is not None and not admit():
+            return None
+        if wanted:
+            # takes as many parameters as facts are wanted, so it can't be a prepared statement
+            query = sql.SQL(f"SELECT {self._COLUMNS} FROM "
+                            f"{self._fact_table} WHERE (name, lang) IN %s")
+            try:
+                rows = await self.query(query, (tuple(wanted),))
+            except (psycopg2.DatabaseError, psycopg2.ProgrammingError) as error:
+                logger.exception("Unable to find facts due to exception.")
+                raise error
+
+            for row in rows:
+                fact = self._fact_from_row(row)
+                fetched[(fact.name, fact.lang)] = fact
+                self._cache.put(fact)
+            for key in wanted:
+                if key not in fetched:
+                    self._cache.put_missing(*key)
+
+        def best(chain) -> typing.Optional[Fact]:
+            for key in chain:
+                if key in fetched:
+                    return fetched[key]
+                if key in self._cache:
+                    return self._cache.get(*key)
+            return None
+
+        return [best(chain) for chain in chains]
+
     async def fact_history(self, fact_name: str, fact_lang: str) -> list:
         """
         Pulls the last 5 transaction logs for a fact, as a tuple
@@ -227,14 +418,12 @@ class FactManager(DatabaseManager):
 
         Returns: tuple of transaction log items, for fact.
         """
-        query = sql.SQL(f"SELECT name, lang, author, message, ts, old, new "
-                        f"FROM {self._fact_log} WHERE name=%s AND lang=%s "
-                        f"ORDER BY ts DESC LIMIT 5")
-
         query_data = (fact_name, fact_lang)
 
+        # entries still buffered are part of the history
+        await self._log.flush()
         try:
-            result = await self.query(query, query_data)
+            result = await self.query(self._statements["fact_history"], query_data)
         except (psycopg2.ProgrammingError, psycopg2.DatabaseError) as error:
             # ProgrammingError is a query failure, DatabaseError is database unavailable.
             logger.exception(f"Unable to retrieve history for {fact_name}-{fact_lang}")
@@ -252,14 +441,21 @@ class FactManager(DatabaseManager):
             name: name of fact to search, ie. 'prep'
             lang: language ID for fact, defaults to 'en' (see Fact Class)
 
-        Returns: Fact()
+        Returns: Fact(), shared with the cache and not to be modified.
         """
-        # Build SQL Object for our query
-        query = sql.SQL(f"SELECT name, lang, message, aliases, author, edited, editedby, mfd from "
-                        f"{self._fact_table} where name=%s AND lang=%s")
+        name = self._canonical(name, lang)
+        if self._snapshot is not None:
+            return self._snapshot.get((name, lang))
+
+        cached = self._cache.get(name, lang)
+        if cached is not None:
+            return cached
+        if self._cache.is_missing(name, lang):
+            return None
+
         # await our raw result from query
         try:
-            rows = await self.query(query, (name, lang))
+            rows = await self.query(self._statements["fact_find"], (name, lang))
         except (psycopg2.DatabaseError, psycopg2.ProgrammingError) as error:
             # Check for offline database, or query errors
             logger.exception("Unable to find fact due to exception.")
@@ -268,20 +464,390 @@ class FactManager(DatabaseManager):
         # unpack query into a fact object, or return None if there is no result.
 
         if rows:
-            result = rows[0]
-            return Fact(name=result[0],
-                        lang=result[1],
-                        message=result[2],
-                        aliases=result[3],
-                        author=result[4],
-                        edited=result[5],
-                        editedby=result[6],
-                        mfd=result[7])
+            fact = self._fact_from_row(rows[0])
+            self._cache.put(fact)
+            return fact
+        self._cache.put_missing(name, lang)
+
+    @property
+    def cache_info(self) -> CacheInfo:
+        """
+        Counters of the fact cache
+        """
+        return self._cache.info
+
+    @staticmethod
+    def _fact_from_row(row: typing.Sequence) -> Fact:
+        return Fact(name=row[0],
+                    lang=row[1],
+                    message=row[2],
+                    aliases=row[3],
+                    author=row[4],
+                    edited=row[5],
+                    editedby=row[6],
+                    mfd=row[7])
+
+    @property
+    def preloaded(self) -> bool:
+        """
+        Whether reads are served from a snapshot of the fact table
+        """
+        return self._snapshot is not None
+
+    async def _written(self, name: str, lang: str,
+                       rows: typing.Optional[typing.List[typing.Sequence]] = None):
+        """
+        Brings cache, snapshot and alias index up to date after a fact got written.
+
+        Args:
+            name: name of the fact written
+            lang: langID of the fact written
+            rows: the fact's row as written, empty if it got deleted, None to reload it
+        """
+        self._cache.invalidate(name, lang)
+        if self._snapshot is None and self._aliases is None and self._texts is None:
+            return
+
+        if rows is None:
+            try:
+                rows = await self.query(self._statements["fact_find"], (name, lang))
+            except psycopg2.Error:
+                # the write went through, the next refresh catches up on it.
+                logger.exception(f"Unable to reload '{name}-{lang}' into the fact snapshot.")
+                return
+
+        fact = self._fact_from_row(rows[0]) if rows else None
+        self._index_fact(name, lang, fact)
+        if self._snapshot is None:
+            return
+        if fact is not None:
+            self._snapshot[(name, lang)] = fact
+        else:
+            self._snapshot.pop((name, lang), None)
+
+    async def _probe(self) -> typing.Tuple:
+        """
+        Cheaply summarizes the fact table, any write to it changes the summary.
+
+        Toggling the mfd flag doesn't touch `edited`, hence the count of marked facts.
+        """
+        rows = await self.query(self._statements["fact_probe"], ())
+        return tuple(rows[0])
+
+    async def preload(self):
+        """
+        Loads the whole fact table into a fresh snapshot, serving all reads from then on.
+
+        Raises:
+            psycopg2.Error: the table couldn't be loaded, reads are served as before.
+        """
+        version = await self._probe()
+        rows = await self.query(self._statements["fact_all"], ())
+
+        self._snapshot = {(row[0], row[1]): self._fact_from_row(row) for row in rows}
+        self._version = version
+        self._aliases = {(alias, lang): name
+                         for (name, lang), fact in self._snapshot.items()
+                         for alias in fact.aliases or ()}
+        self._names = FuzzyIndex([*self._snapshot, *self._aliases])
+        self._texts = TextIndex((name, lang, fact.message)
+                                for (name, lang), fact in self._snapshot.items())
+        self._cache.clear()
+        logger.info(f"Preloaded {len(self._snapshot)} facts.")
+
+    async def refresh(self) -> bool:
+        """
+        Reloads whatever changed in the fact table since the snapshot was taken.
+
+        Facts edited since are reloaded on their own, additions, deletions and mfd toggles
+        reload the whole table. Database errors are logged, the snapshot stays as it is.
+
+        Returns:
+            bool: whether the snapshot changed
+        """
+        if self._snapshot is None:
+            return False
+
+        try:
+            version = await self._probe()
+            if version == self._version:
+                return False
+
+            count, edited, marked = version
+            known_count, known_edited, known_marked = self._version
+            if count == known_count and marked == known_marked and known_edited is not None:
+                for row in await self.query(self._statements["fact_edited_since"],
+                                            (known_edited,)):
+                    fact = self._fact_from_row(row)
+                    self._index_fact(fact.name, fact.lang, fact)
+                    self._snapshot[(fact.name, fact.lang)] = fact
+                self._version = version
+                # a deletion offset by an addition went unnoticed, there's no cheap way around it.
+                if len(self._snapshot) == count:
+                    return True
+
+            await self.preload()
+        except psycopg2.Error:
+            logger.exception("Unable to refresh the fact snapshot, serving the last one loaded.")
+            return False
+
+        return True
+
+    async def _refresh_periodically(self):
+        while True:
+            if not _facts_config["preload"]:
+                # preloading got disabled, if it ever was, go back to reading through
+                self._snapshot = None
+                self._version = None
+                await self._reload_indices()
+            elif self._snapshot is None:
+                try:
+                    await self.preload()
+                except psycopg2.Error:
+                    logger.exception("Unable to preload facts, retrying after the refresh interval.")
+            else:
+                await self.refresh()
+            await asyncio.sleep(_facts_config["refresh_interval"])
+
+    async def _reload_indices(self):
+        """
+        Reloads the indices a snapshot would otherwise keep, keeping the ones known on failure.
+        """
+        try:
+            await self._load_indices()
+        except psycopg2.Error:
+            logger.exception("Unable to load fact indices, retrying after the refresh interval.")
+
+    def start_refresh(self):
+        """
+        Keeps the fact indices up to date in the background, every [facts]refresh_interval
+        seconds. With [facts]preload enabled, the whole fact table is preloaded and refreshed
+        instead.
+
+        Calling this while the refresh is already running does nothing.
+        """
+        if self._refresher is not None and not self._refresher.done():
+            return
+        logger.info("refreshing facts every {} seconds", _facts_config["refresh_interval"])
+        self._refresher = asyncio.ensure_future(self._refresh_periodically())
+
+    @staticmethod
+    def preload_enabled() -> bool:
+        """
+        Whether [facts]preload is enabled
+        """
+        return _facts_config["preload"]
+
+    def _index_fact(self, name: str, lang: str, fact: typing.Optional[Fact]):
+        """
+        Points alias, fuzzy and text index at the current names and message of a fact, None if
+        it got deleted.
+        """
+        if self._texts is not None:
+            if fact is None:
+                self._texts.remove(name, lang)
+            else:
+                self._texts.add(name, lang, fact.message)
+        if self._aliases is None:
+            return
+        for key in [key for key, canonical in self._aliases.items()
+                    if canonical == name and key[1] == lang]:
+            del self._aliases[key]
+            self._names.remove(*key)
+        if fact is None:
+            self._names.remove(name, lang)
+            return
+        self._names.add(name, lang)
+        for alias in fact.aliases or ():
+            self._aliases[(alias, lang)] = name
+            self._names.add(alias, lang)
+
+    async def _load_indices(self):
+        """
+        Loads alias, fuzzy and text index in a single pass over the fact table.
+        """
+        rows = await self.query(self._statements["fact_indices"], ())
+        self._aliases = {(alias, lang): name for name, lang, aliases, _ in rows
+                         for alias in aliases or ()}
+        self._names = FuzzyIndex([*((name, lang) for name, lang, _, _ in rows), *self._aliases])
+        self._texts = TextIndex((name, lang, message) for name, lang, _, message in rows)
+
+    async def _ensure_names(self):
+        """
+        Loads alias, fuzzy and text index, unless they are loaded already.
+
+        Only writes wait for the index, they mustn't take the name of another fact's alias. Reads
+        make do with whatever the background refresh loaded so far.
+        """
+        if self._aliases is None:
+            await self._load_indices()
+
+    def _canonical(self, name: str, lang: str) -> str:
+        """
+        Resolves an alias to the name of the fact it belongs to, other names resolve to themselves.
+        Until the alias index is loaded, every name resolves to itself.
+        """
+        if self._aliases is None:
+            return name
+        return self._aliases.get((name, lang), name)
+
+    async def suggest(self, name: str, lang: str, limit: int = 3,
+                      threshold: float = SUGGEST_THRESHOLD) -> typing.List[str]:
+        """
+        Names and aliases of facts similar to *name*, most similar first.
+
+        Searches the languages *lang* falls back to in order, the first language with a similar
+        name wins.
+
+        Args:
+            name: what to search for
+            lang: language ID to search in
+            limit: most names to return
+            threshold: least similarity of a name returned, between 0 and 1
+        """
+        if self._names is None:
+            # not loaded yet, nothing to suggest from
+            return []
+        for candidate in self._chain(lang):
+            found = self._names.search(name, candidate, limit, threshold)
+            if found:
+                return found
+        return []
+
+    async def search_text(self, text: str, limit: int = 5) -> typing.List[typing.Tuple[str, str]]:
+        """
+        Facts whose messages mention the words of *text*, best match first.
+
+        Messages are searched in the index kept by the background refresh, nothing is found
+        until it got loaded.
+
+        Args:
+            text: the words to search for
+            limit: most facts to return
+
+        Returns:
+            name and language ID of each fact found
+        """
+        if self._texts is None:
+            return []
+        return self._texts.search(text, limit)
+
+    @staticmethod
+    def suggestions_enabled() -> bool:
+        """
+        Whether [facts]suggest is enabled
+        """
+        return _facts_config["suggest"]
+
+    async def _free_aliases(self, name: str, lang: str,
+                            aliases: typing.Iterable[str]) -> typing.List[str]:
+        """
+        Casefolds aliases about to be given to a fact, verifying nothing else goes by them.
+
+        Raises:
+            ValueError: an alias is taken by another fact, or is another fact's name.
+        """
+        free = []
+        for alias in aliases:
+            alias = alias.casefold()
+            if alias == name or alias in free:
+                continue
+            owner = self._canonical(alias, lang)
+            if owner != alias:
+                if owner != name:
+                    raise ValueError(f"'{alias}' is already an alias of '{owner}-{lang}'.")
+            elif await self.exists(alias, lang):
+                raise ValueError(f"'{alias}' is already the name of a fact.")
+            free.append(alias)
+        return free
+
+    async def _change_aliases(self, name: str, lang: str, editor: str,
+                              added: typing.Optional[str] = None,
+                              removed: typing.Optional[str] = None):
+        """
+        Adds or removes an alias of a fact as a single unit of work, logging the change once it
+        is committed.
+
+        Raises:
+            ValueError: no such fact, or the alias to remove isn't one of the fact's.
+        """
+        edit_time = datetime.datetime.now(datetime.timezone.utc)
+
+        try:
+            async with self.transaction() as transaction:
+                current = await transaction.query(self._statements["fact_lock_aliases"],
+                                                  (name, lang))
+                if not current:
+                    raise ValueError(f"{name}-{lang} does not exist.")
+
+                aliases = current[0][0] or []
+                if added is not None:
+                    if added in aliases:
+                        return
+                    aliases.append(added)
+                if removed is not None:
+                    if removed not in aliases:
+                        raise ValueError(f"'{removed}' is not an alias of {name}-{lang}.")
+                    aliases.remove(removed)
+
+                rows = await transaction.query(self._statements["fact_set_aliases"],
+                                               (aliases or None, edit_time, name, lang))
+        except (psycopg2.ProgrammingError, psycopg2.DatabaseError) as error:
+            logger.exception(f"Unable to change aliases of '{name}-{lang}'.")
+            raise error
+
+        self._log.append((name, lang, editor,
+                          'Alias added' if added is not None else 'Alias removed',
+                          removed, added, edit_time))
+        await self._written(name, lang, rows)
+
+    async def add_alias(self, name: str, lang: str, alias: str, editor: str):
+        """
+        Gives a fact an additional name it can be asked for by.
+        Generates a transaction log record.
+
+        Args:
+            name: name of fact, or one of its aliases
+            lang: langID of fact
+            alias: the alias to add
+            editor: editor of fact (use context.user.nickname)
+
+        Raises:
+            ValueError: no such fact, or the alias is already taken.
+            psycopg2.DatabaseError: On any connectivity issue or no database available.
+        """
+        await self._ensure_names()
+        name = self._canonical(name, lang)
+        free = await self._free_aliases(name, lang, [alias])
+        if not free:
+            # it is the fact's own name
+            return
+
+        await self._change_aliases(name, lang, editor, added=free[0])
+
+    async def remove_alias(self, name: str, lang: str, alias: str, editor: str):
+        """
+        Takes an alias away from the fact it belongs to.
+        Generates a transaction log record.
+
+        Args:
+            name: name of fact, or one of its aliases
+            lang: langID of fact
+            alias: the alias to remove
+            editor: editor of fact (use context.user.nickname)
+
+        Raises:
+            ValueError: no such fact, or the alias isn't one of the fact's.
+            psycopg2.DatabaseError: On any connectivity issue or no database available.
+        """
+        await self._ensure_names()
+        name = self._canonical(name, lang)
+        await self._change_aliases(name, lang, editor, removed=alias.casefold())
 
     async def add_transaction(self, fact_name: str, fact_lang: str, author: str, msg: str,
                               new_field=None, old_field=None):
         """
-        Writes a transaction log entry to the transaction log table.
+        Logs a transaction log entry, written to the transaction log table with the next batch.
         The msg field should be only be one of the following (by convention):
 
         * Added
@@ -289,6 +855,8 @@ class FactManager(DatabaseManager):
         * Edited
         * Marked for delete
         * Unmarked for delete
+        * Alias added
+        * Alias removed
 
         Args:
             fact_name: Name of fact this applies to.
@@ -300,18 +868,8 @@ class FactManager(DatabaseManager):
 
         Returns: Nothing.
         """
-        log_query = sql.SQL(f"INSERT INTO {self._fact_log} "
-                            f"(name, lang, author, message, old, new, ts) "
-                            f"VALUES (%s, %s, %s, %s, %s, %s, %s)")
-
-        query_data = (fact_name, fact_lang, author, msg, old_field, new_field,
-                      datetime.datetime.utcnow())
-
-        try:
-            await self.query(log_query, query_data)
-        except (psycopg2.ProgrammingError, psycopg2.DatabaseError) as error:
-            logger.exception("Unable to write transaction log to table.")
-            raise error
+        self._log.append((fact_name, fact_lang, author, msg, old_field, new_field,
+                          datetime.datetime.utcnow()))
 
     async def mfd(self, name: str, lang: str) -> bool:
         """
@@ -324,27 +882,26 @@ class FactManager(DatabaseManager):
 
         Returns:
             bool: True/False that fact was set to.
-        """
-
-        query = sql.SQL(f"SELECT mfd FROM "
-                        f"{self._fact_table} WHERE name=%s AND lang=%s")
 
-        mfd_query = sql.SQL(f"UPDATE {self._fact_table} "
-                            f"SET mfd=%s WHERE name=%s AND lang=%s")
+        Raises:
+            ValueError: No such fact.
+        """
+        await self._ensure_names()
+        name = self._canonical(name, lang)
 
+        # Invert MFD field value in place, a fact never marked counts as unmarked.
         try:
-            result = await self.query(query, (name, lang))
-
-            # Invert MFD field value, and set it again.
-            mfd_value = not result[0][0]
-            await self.query(mfd_query, (mfd_value, name, lang))
-
+            rows = await self.query(self._statements["fact_mfd"], (name, lang))
         except (psycopg2.ProgrammingError, psycopg2.DatabaseError) as error:
             # ProgrammingError is a query failure, DatabaseError is database unavailable.
             logger.exception(f"Error setting MFD field value for {name}-{lang}")
             raise error
 
-        return mfd_value
+        if not rows:
+            raise ValueError(f"{name}-{lang} does not exist.")
+
+        await self._written(name, lang, rows)
+        return self._fact_from_row(rows[0]).mfd
 
     async def mfd_list(self, num_results=5) -> list:
         """
@@ -356,12 +913,8 @@ class FactManager(DatabaseManager):
         Returns:
             list: facts marked for deletion.
         """
-        query = sql.SQL(f"SELECT name, lang FROM "
-                        f"{self._fact_table} WHERE mfd=%s "
-                        f"ORDER BY edited DESC LIMIT {num_results}")
-
         try:
-            raw_results = await self.query(query, (True,))
+            raw_results = await self.query(self._statements["fact_mfd_list"], (True, num_results))
         except (psycopg2.ProgrammingError, psycopg2.DatabaseError) as error:
             # ProgrammingError is a query failure, DatabaseError is database unavailable.
             logger.exception(f"Error getting MFD list.")
@@ -0,0 +1,208 @@
+"""
+transaction_log.py - Write-behind writer of the fact transaction log
+
+Logging a change to a fact used to cost an INSERT of its own, on the latency path of the command
+making the change. Log rows are instead buffered in memory and written in batches: once
+[facts]log_batch_size rows are waiting, or [facts]log_flush_interval seconds after the first of
+them was logged, whichever comes first. A batch is written by a single prepared statement, in a
+single round trip, however many rows it holds.
+
+While the database is unavailable, rows are kept and retried every [facts]log_flush_interval
+seconds, a retry finding the circuit breaker open failing right away. At most
+[facts]log_backlog rows are kept, the oldest are dropped first. Everything still buffered is
+written upon `!rehash` and on shutdown, see `flush_all`.
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import asyncio
+import collections
+import typing
+import weakref
+
+import psycopg2
+from loguru import logger
+
+from src.config import CONFIG_MARKER
+from ..database import DatabaseManager, Statement
+
+_config: typing.Dict = {"log_batch_size": 50, "log_flush_interval": 1, "log_backlog": 1000}
+"""
+Transaction log configuration, as applied by the last rehash
+"""
+
+_writers: "weakref.WeakSet[TransactionLogWriter]" = weakref.WeakSet()
+
+
+@CONFIG_MARKER
+def validate_config(data: typing.Dict):
+    """
+    Validate new configuration data.
+
+    The keys live in the optional facts section, missing keys fall back to their defaults.
+
+    Args:
+        data (typing.Dict): new configuration data  to validate
+
+    Raises:
+        ValueError:  config section failed to validate.
+    """
+    section = data.get("facts", {})
+
+    for key in ("log_batch_size", "log_backlog"):
+        if key in section and (
+                not isinstance(section[key], int) or isinstance(section[key], bool)
+                or section[key] <= 0):
+            raise ValueError(f"[facts]{key} must be a positive integer.")
+
+    if "log_flush_interval" in section and (
+            not isinstance(section["log_flush_interval"], (int, float))
+            or isinstance(section["log_flush_interval"], bool)
+            or section["log_flush_interval"] <= 0):
+        raise ValueError("[facts]log_flush_interval must be a positive number.")
+
+
+@CONFIG_MARKER
+def rehash_handler(data: typing.Dict):
+    """
+    Apply new configuration data
+
+    Changes apply to rows logged after the rehash. `!rehash` flushes the rows buffered before it.
+
+    Args:
+        data (typing.Dict): new configuration data to apply.
+
+    """
+    section = data.get("facts", {})
+    _config.update({key: section[key] for key in _config if key in section})
+
+
+class TransactionLogWriter:
+    """
+    Buffers log rows, writing them in batches through *statement*.
+
+    The statement takes a batch as one array per column, see `FactManager`.
+
+    Args:
+        manager: database manager to run the statement on
+        statement: statement inserting a batch of rows
+    """
+
+    def __init__(self, manager: DatabaseManager, statement: Statement):
+        self._manager = manager
+        self._statement = statement
+        self._pending: typing.Deque[typing.Tuple] = collections.deque()
+        self._writing: typing.Optional[asyncio.Future] = None
+        self._timer: typing.Optional[asyncio.TimerHandle] = None
+        # set while waiting out a failed write, only the timer retries in the meantime
+        self._backoff = False
+        self._overflowing = False
+        self._written = 0
+        self._dropped = 0
+        _writers.add(self)
+
+    def append(self, row: typing.Tuple):
+        """
+        Logs a row, to be written with the next batch.
+        """
+        self._pending.append(row)
+        while len(self._pending) > _config["log_backlog"]:
+            self._pending.popleft()
+            self._dropped += 1
+            if not self._overflowing:
+                self._overflowing = True
+                logger.warning("Transaction log backlog full, dropping the oldest rows.")
+
+        if len(self._pending) >= _config["log_batch_size"] and not self._backoff:
+            self._start_write()
+        elif self._timer is None:
+            self._timer = asyncio.get_event_loop().call_later(_config["log_flush_interval"],
+                                                              self._elapsed)
+
+    def _elapsed(self):
+        self._timer = None
+        self._backoff = False
+        if self._pending:
+            self._start_write()
+
+    def _start_write(self) -> asyncio.Future:
+        if self._writing is None or self._writing.done():
+            self._writing = asyncio.ensure_future(self._write())
+        return self._writing
+
+    async def _write(self) -> bool:
+        """
+        Writes buffered rows in batches until none are left.
+
+        Returns:
+            False if a batch failed to be written, its rows being kept for the next attempt.
+        """
+        while self._pending:
+            batch = [self._pending.popleft()
+                     for _ in range(min(len(self._pending), _config["log_batch_size"]))]
+            try:
+                await self._manager.query(self._statement, tuple(map(list, zip(*batch))))
+            except psycopg2.Error:
+                logger.exception("Unable to write {} transaction log rows, retrying later.",
+                                 len(batch))
+                self._pending.extendleft(reversed(batch))
+                self._backoff = True
+                if self._timer is None:
+                    self._timer = asyncio.get_event_loop().call_later(
+                        _config["log_flush_interval"], self._elapsed)
+                return False
+            self._written += len(batch)
+            self._overflowing = False
+
+        self._backoff = False
+        if self._timer is not None:
+            # nothing left for it to write
+            self._timer.cancel()
+            self._timer = None
+        return True
+
+    async def flush(self) -> bool:
+        """
+        Writes every buffered row right away.
+
+        Returns:
+            False if the rows couldn't all be written, those left are kept.
+        """
+        # a write in progress carries on until nothing is buffered, rows logged since included
+        return await asyncio.shield(self._start_write())
+
+    @property
+    def pending(self) -> int:
+        """
+        Number of rows waiting to be written
+        """
+        return len(self._pending)
+
+    @property
+    def written(self) -> int:
+        """
+        Number of rows written, in total
+        """
+        return self._written
+
+    @property
+    def dropped(self) -> int:
+        """
+        Number of rows dropped from a full backlog, in total
+        """
+        return self._dropped
+
+
+async def flush_all() -> bool:
+    """
+    Writes the rows buffered by every transaction log writer.
+
+    Returns:
+        False if some rows couldn't be written.
+    """
+    results = await asyncio.gather(*(writer.flush() for writer in list(_writers)))
+    return all(results)
@@ -0,0 +1,18 @@
+"""
+__init__.py - Outbound message scheduling
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+from src.config import PLUGIN_MANAGER
+from .scheduler import OutboundScheduler, Priority, TokenBucket
+from .splitter import split_message
+from . import scheduler as _scheduler
+
+__all__ = ["OutboundScheduler", "Priority", "TokenBucket", "split_message"]
+
+PLUGIN_MANAGER.register(_scheduler, "outbound")
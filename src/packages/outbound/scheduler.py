@@ -0,0 +1,338 @@
+"""
+scheduler.py - Priority-laned, flood-aware outbound message scheduler
+
+Outbound lines are queued onto one of three priority lanes and drained by a single sender task,
+which keeps to a connection-wide token bucket as well as one bucket per target. The highest
+priority lane holding a line whose target has a token available always goes first, so a
+ratsignal is never stuck behind a `!list` dump.
+
+When a target is backed up beyond what its buckets allow to be sent right away, consecutive
+lines of the same lane are coalesced into as few lines as the byte budget permits.
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import asyncio
+import collections
+import enum
+import typing
+from time import monotonic
+
+from loguru import logger
+
+from src.config import CONFIG_MARKER
+from .splitter import split_message, _FORMAT_CODE
+
+_config: typing.Dict = {
+    "rate": 2.0,
+    "burst": 5,
+    "target_rate": 1.0,
+    "target_burst": 4,
+    "coalesce": True,
+    "separator": " | ",
+}
+"""
+Outbound configuration, as applied by the last rehash
+"""
+
+
+class Priority(enum.IntEnum):
+    """
+    Outbound priority lanes, lower values are sent first
+    """
+    SIGNAL = 0
+    """Ratsignals and case announcements"""
+    REPLY = 1
+    """Regular command replies"""
+    BULK = 2
+    """Bulk output, such as case listings"""
+
+
+@CONFIG_MARKER
+def validate_config(data: typing.Dict):
+    """
+    Validate new configuration data.
+
+    The outbound section is optional, missing keys fall back to their defaults.
+
+    Args:
+        data (typing.Dict): new configuration data  to validate
+
+    Raises:
+        ValueError:  config section failed to validate.
+    """
+    section = data.get("outbound", {})
+
+    for key in ("rate", "target_rate"):
+        if key in section and (not isinstance(section[key], (int, float)) or section[key] <= 0):
+            raise ValueError(f"[outbound]{key} must be a positive number.")
+
+    for key in ("burst", "target_burst"):
+        if key in section and (not isinstance(section[key], int) or section[key] <= 0):
+            raise ValueError(f"[outbound]{key} must be a positive integer.")
+
+    if "coalesce" in section and not isinstance(section["coalesce"], bool):
+        raise ValueError("[outbound]coalesce must be a boolean.")
+
+    if "separator" in section and not isinstance(section["separator"], str):
+        raise ValueError("[outbound]separator must be a string.")
+
+
+@CONFIG_MARKER
+def rehash_handler(data: typing.Dict):
+    """
+    Apply new configuration data
+
+    Changes apply to schedulers created after the rehash.
+
+    Args:
+        data (typing.Dict): new configuration data to apply.
+
+    """
+    _config.update(data.get("outbound", {}))
+
+
+class TokenBucket:
+    """
+    Classic token bucket, starts out full.
+
+    Args:
+        rate: tokens regained per second
+        burst: capacity of the bucket
+    """
+    __slots__ = ["rate", "burst", "_tokens", "_stamp"]
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._stamp = monotonic()
+
+    def _refill(self, now: float):
+        # callers may hold a timestamp from before the bucket was created
+        if now > self._stamp:
+            self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+
+    def tokens(self, now: float) -> float:
+        """
+        Tokens available at *now*.
+        """
+        self._refill(now)
+        return self._tokens
+
+    def delay(self, now: float) -> float:
+        """
+        Seconds from *now* until a token is available, zero if one is available right away.
+        """
+        self._refill(now)
+        return max(0.0, (1 - self._tokens) / self.rate)
+
+    def take(self, now: float):
+        """
+        Consume a single token.
+        """
+        self._refill(now)
+        self._tokens -= 1
+
+
+class _Line(typing.NamedTuple):
+    text: str
+    limit: int
+
+
+class OutboundScheduler:
+    """
+    Paces outbound messages.
+
+    Args:
+        send: coroutine function sending a single line to a target
+        budget: returns the byte budget of a single line's payload to the given target
+        rate: connection-wide lines per second
+        burst: connection-wide burst capacity, in lines
+        target_rate: lines per second to a single target
+        target_burst: burst capacity of a single target, in lines
+        coalesce: whether backed up lines may be coalesced
+        separator: string joining coalesced lines
+    """
+
+    def __init__(self,
+                 send: typing.Callable[[str, str], typing.Awaitable],
+                 budget: typing.Callable[[str], int],
+                 *,
+                 rate: typing.Optional[float] = None,
+                 burst: typing.Optional[int] = None,
+                 target_rate: typing.Optional[float] = None,
+                 target_burst: typing.Optional[int] = None,
+                 coalesce: typing.Optional[bool] = None,
+                 separator: typing.Optional[str] = None):
+        self._send = send
+        self._budget = budget
+        self._target_rate = target_rate if target_rate else _config["target_rate"]
+        self._target_burst = target_burst if target_burst else _config["target_burst"]
+        self._coalesce = _config["coalesce"] if coalesce is None else coalesce
+        self._separator = _config["separator"] if separator is None else separator
+
+        self._global = TokenBucket(rate if rate else _config["rate"],
+                                   burst if burst else _config["burst"])
+        self._buckets: typing.Dict[str, TokenBucket] = {}
+        self._lanes: typing.Dict[Priority, typing.Dict[str, typing.Deque[_Line]]] = {
+            priority: collections.OrderedDict() for priority in Priority
+        }
+        self._sender: typing.Optional[asyncio.Future] = None
+
+        self._sent: typing.Counter[Priority] = collections.Counter()
+        self._coalesced = 0
+        self._throttled = 0
+
+    def submit(self, target: str, message: str, priority: Priority = Priority.REPLY) -> int:
+        """
+        Queue a message for sending.
+
+        The message is split into lines on embedded newlines and on the byte budget of its target.
+
+        Args:
+            target: channel or nickname to send to
+            message: the message
+            priority: lane to queue the message onto
+
+        Returns:
+            int: the number of lines queued
+        """
+        limit = self._budget(target)
+        lines = [_Line(line, limit) for line in split_message(message, limit)]
+
+        lane = self._lanes[priority]
+        queue = lane.get(target)
+        if queue is None:
+            queue = lane[target] = collections.deque()
+        queue.extend(lines)
+
+        if self._sender is None:
+            self._sender = asyncio.ensure_future(self._run())
+        return len(lines)
+
+    def _bucket(self, target: str) -> TokenBucket:
+        key = target.casefold()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self._target_rate, self._target_burst)
+        return bucket
+
+    def _pick(self, now: float) -> typing.Tuple[typing.Optional[typing.Tuple[Priority, str]], float]:
+        """
+        Picks the next lane and target to send to.
+
+        Returns:
+            the lane and target, or None along with the seconds until one becomes available.
+        """
+        soonest = float("inf")
+        for priority, lane in self._lanes.items():
+            for target in lane:
+                delay = self._bucket(target).delay(now)
+                if not delay:
+                    return (priority, target), 0.0
+                soonest = min(soonest, delay)
+        return None, soonest
+
+    def _pop(self, priority: Priority, target: str, now: float) -> str:
+        """
+        Pops the next line of a target's lane, coalescing backed up lines where permitted.
+        """
+        lane = self._lanes[priority]
+        queue = lane[target]
+        line = queue.popleft()
+        text, limit = line.text, line.limit
+
+        if self._coalesce and priority is not Priority.SIGNAL and queue:
+            # only coalesce what couldn't be sent right away anyway
+            available = min(self._bucket(target).tokens(now), self._global.tokens(now)) - 1
+            while queue and len(queue) > available:
+                # reset formatting, so it won't bleed into the next line
+                joined = text + ("\x0F" if _FORMAT_CODE.search(text) else "") + self._separator
+                joined += queue[0].text
+                if len(joined.encode("utf-8", "surrogatepass")) > min(limit, queue[0].limit):
+                    break
+                text, limit = joined, min(limit, queue[0].limit)
+                queue.popleft()
+                self._coalesced += 1
+
+        if queue:
+            # round robin amongst the targets of a lane
+            lane.move_to_end(target)
+        else:
+            del lane[target]
+        return text
+
+    async def _run(self):
+        """
+        Sends queued lines until every lane is drained.
+        """
+        try:
+            while any(self._lanes.values()):
+                now = monotonic()
+                delay = self._global.delay(now)
+                picked = None
+                if not delay:
+                    picked, delay = self._pick(now)
+                if picked is None:
+                    self._throttled += 1
+                    await asyncio.sleep(delay)
+                    continue
+
+                priority, target = picked
+                text = self._pop(priority, target, now)
+                self._global.take(now)
+                self._bucket(target).take(now)
+                try:
+                    await self._send(target, text)
+                # a broad catch is exactly what we want, one failing line mustn't kill the sender
+                except Exception:  # pylint: disable=broad-except
+                    logger.exception("failed to send {!r} to {}", text, target)
+                self._sent[priority] += 1
+        finally:
+            self._sender = None
+            # forget targets whose buckets have fully recovered, they'd be created afresh anyway
+            now = monotonic()
+            for key in [key for key, bucket in self._buckets.items()
+                        if bucket.tokens(now) >= bucket.burst]:
+                del self._buckets[key]
+
+    async def join(self):
+        """
+        Waits until every lane has been drained.
+        """
+        while self._sender is not None:
+            await asyncio.shield(self._sender)
+
+    @property
+    def depths(self) -> typing.Dict[Priority, int]:
+        """
+        Number of queued lines, by lane
+        """
+        return {priority: sum(map(len, lane.values())) for priority, lane in self._lanes.items()}
+
+    @property
+    def sent(self) -> typing.Dict[Priority, int]:
+        """
+        Number of lines sent, by lane
+        """
+        return dict(self._sent)
+
+    @property
+    def coalesced(self) -> int:
+        """
+        Number of lines that were coalesced into a preceding line
+        """
+        return self._coalesced
+
+    @property
+    def throttled(self) -> int:
+        """
+        Number of times the sender had to wait for a token
+        """
+        return self._throttled
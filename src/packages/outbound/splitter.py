@@ -0,0 +1,229 @@
+"""
+splitter.py - Byte-budget aware splitting of outbound messages
+
+IRC limits a line to 512 bytes, including the prefix the server adds when relaying it. Lines are
+split on that byte budget, preferring word boundaries, without ever cutting a UTF-8 sequence or an
+mIRC formatting code in half. Formatting active at a split is re-applied at the start of the
+continuation, so a long colored line stays colored all the way through.
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import re
+import typing
+
+_FORMAT_CODE = re.compile(r"\x03(?:\d{1,2}(?:,\d{1,2})?)?"
+                          r"|\x04(?:[0-9a-fA-F]{6}(?:,[0-9a-fA-F]{6})?)?"
+                          r"|[\x02\x1D\x1F\x1E\x11\x16\x0F]")
+"""a single mIRC formatting code, including its arguments"""
+
+_TOGGLES = "\x02\x1D\x1F\x1E\x11\x16"
+"""bold, italic, underline, strikethrough, monospace and reverse, in their restoring order"""
+
+_RESET = "\x0F"
+"""resets all formatting"""
+
+
+class _Formatting(typing.NamedTuple):
+    """
+    Formatting state at a given point in a line
+    """
+    toggles: str = ""
+    color: typing.Tuple[str, ...] = ()
+    hex_color: typing.Tuple[str, ...] = ()
+
+    def apply(self, code: str) -> "_Formatting":
+        """
+        Returns the state after *code*.
+        """
+        if code == _RESET:
+            return _Formatting()
+        if code in _TOGGLES:
+            toggles = self.toggles.replace(code, "") if code in self.toggles else self.toggles + code
+            return self._replace(toggles="".join(sorted(toggles, key=_TOGGLES.index)))
+
+        arguments = code[1:].split(",") if len(code) > 1 else []
+        current = self.color if code[0] == "\x03" else self.hex_color
+        if not arguments:
+            updated: typing.Tuple[str, ...] = ()
+        elif len(arguments) == 1:
+            # a lone foreground keeps the background as it was
+            updated = (arguments[0],) + current[1:]
+        else:
+            updated = tuple(arguments)
+
+        return self._replace(**{"color" if code[0] == "\x03" else "hex_color": updated})
+
+    def restore(self) -> typing.List[str]:
+        """
+        Codes re-establishing this state on a fresh line.
+        """
+        codes = list(self.toggles)
+        if self.color:
+            # zero padded, so the code can't swallow a leading digit of the text that follows.
+            codes.append("\x03" + ",".join(part.zfill(2) for part in self.color))
+        if self.hex_color:
+            codes.append("\x04" + ",".join(self.hex_color))
+        return codes
+
+
+class _Atom(typing.NamedTuple):
+    """
+    An indivisible part of a line, a formatting code or a single character
+    """
+    text: str
+    is_code: bool
+    offset: typing.Optional[int]
+    """offset into the original line, None for codes restoring formatting after a split"""
+    width: int
+
+
+def _characters(line: str, start: int, end: int) -> typing.Iterator[_Atom]:
+    for offset in range(start, end):
+        yield _Atom(line[offset], False, offset, len(line[offset].encode("utf-8", "surrogatepass")))
+
+
+def _atoms(line: str) -> typing.Iterator[_Atom]:
+    """
+    Yields the atoms of *line*, in order.
+    """
+    position = 0
+    for match in _FORMAT_CODE.finditer(line):
+        yield from _characters(line, position, match.start())
+        yield _Atom(match.group(), True, match.start(), len(match.group()))
+        position = match.end()
+    yield from _characters(line, position, len(line))
+
+
+_SEPARATOR = _Atom("\x02\x02", True, None, 2)
+"""
+a no-op pair of codes, keeping a color code from swallowing digits that weren't originally
+following it
+"""
+
+
+def _split_line(line: str, limit: int) -> typing.List[str]:
+    """
+    Splits a single line into chunks of at most *limit* UTF-8 encoded bytes.
+    """
+    if len(line.encode("utf-8", "surrogatepass")) <= limit:
+        return [line]
+
+    chunks: typing.List[str] = []
+    formatting = _Formatting()
+    current: typing.List[_Atom] = []
+    size = 0
+    content = False
+    # position in current and formatting state right after the last space, if any
+    space: typing.Optional[typing.Tuple[int, _Formatting]] = None
+
+    def separated(atom: _Atom) -> bool:
+        # whether a code ending the chunk would swallow part of atom, that wasn't following it before
+        previous = current[-1] if current else None
+        return (previous is not None and previous.is_code
+                and (previous.offset is None or previous.offset + len(previous.text) != atom.offset)
+                and _FORMAT_CODE.match(previous.text + line[atom.offset:atom.offset + 7]).end()
+                > len(previous.text))
+
+    def overflows(atom: _Atom) -> bool:
+        return size + atom.width + (_SEPARATOR.width if separated(atom) else 0) > limit
+
+    def append(atom: _Atom):
+        nonlocal size
+        if separated(atom):
+            current.append(_SEPARATOR)
+            size += _SEPARATOR.width
+        current.append(atom)
+        size += atom.width
+
+    def start(state: _Formatting, carried: typing.Sequence[_Atom] = ()):
+        nonlocal current, size, content, space
+        prefix = state.restore()
+        # restoring formatting mustn't eat up the budget meant for content
+        for codes in (prefix, []) if sum(map(len, prefix)) <= limit // 4 else ([],):
+            current, size, content, space = [], 0, False, None
+            for code in codes:
+                current.append(_Atom(code, True, None, len(code)))
+                size += len(code)
+            running = state
+            for atom in carried:
+                append(atom)
+                if atom.is_code:
+                    running = running.apply(atom.text)
+                    continue
+                content = True
+                if atom.text == " ":
+                    space = (len(current), running)
+            if size <= limit:
+                break
+
+    def flush(atoms: typing.Sequence[_Atom]):
+        chunks.append("".join(atom.text for atom in atoms))
+
+    for atom in _atoms(line):
+        skip = False
+        while overflows(atom):
+            if not content:
+                # only formatting so far, there's nothing worth splitting off
+                if atom.is_code:
+                    formatting = formatting.apply(atom.text)
+                    skip = True
+                else:
+                    start(_Formatting())
+                break
+            if atom.text == " ":
+                # overflowing on a space, the space itself becomes the split
+                flush(current)
+                start(formatting)
+                skip = True
+                break
+            head = current[:space[0] - 1] if space else ()
+            if any(not item.is_code and not item.text.isspace() for item in head):
+                index, at_space = space
+                flush(head)
+                start(at_space, current[index:])
+            else:
+                flush(current)
+                start(formatting)
+        if skip:
+            continue
+
+        append(atom)
+        if atom.is_code:
+            formatting = formatting.apply(atom.text)
+        else:
+            content = True
+            if atom.text == " ":
+                space = (len(current), formatting)
+
+    if content or not chunks:
+        flush(current)
+    return chunks
+
+
+def split_message(message: str, limit: int) -> typing.List[str]:
+    """
+    Splits a message into lines of at most *limit* UTF-8 encoded bytes each.
+
+    Embedded newlines always split, carriage returns are dropped.
+
+    Args:
+        message (str): the message to split
+        limit (int): byte budget of a single line's payload
+
+    Returns:
+        List[str]: the lines to send, in order
+
+    Examples:
+        >>> split_message("pink fluffy unicorns", 12)
+        ['pink fluffy', 'unicorns']
+        >>> split_message("\\x02bold words", 8)
+        ['\\x02bold', '\\x02words']
+    """
+    return [chunk
+            for line in message.replace("\r", "").split("\n")
+            for chunk in _split_line(line, limit)]
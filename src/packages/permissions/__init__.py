@@ -10,6 +10,9 @@ See LICENSE.md
 """
 __all__ = [
     "Permission",
+    "Guards",
+    "guards_of",
+    "get_permission",
     "require_dm",
     "require_channel",
     "require_permission",
@@ -20,8 +23,8 @@ __all__ = [
     "ADMIN",
 ]
 from src.config import PLUGIN_MANAGER
-from .permissions import Permission, require_permission, require_dm, require_channel, RAT, \
-    TECHRAT, RECRUIT, OVERSEER, ADMIN
+from .permissions import Permission, Guards, guards_of, get_permission, require_permission, \
+    require_dm, require_channel, RAT, TECHRAT, RECRUIT, OVERSEER, ADMIN
 from . import permissions
 
 PLUGIN_MANAGER.register(permissions)
@@ -14,10 +14,11 @@ This module is built on top of the Pydle system.
 
 from loguru import logger
 from functools import wraps
-from typing import Any, Union, Callable, Dict, Set
+from typing import Any, Union, Callable, Dict, Optional, Set
 
 from src.config import CONFIG_MARKER
 from ..context import Context
+from .resolver import VhostResolver, WILDCARD
 
 
 @CONFIG_MARKER
@@ -53,6 +54,9 @@ def validate_config(data: Dict):
             if not isinstance(vhost, str):
                 logger.warning(f"subkey for {key} was not a string, instead got {vhost}")
                 raise ValueError(KEY_VALIDATION_FAILED_)
+            if "*" in (vhost[len(WILDCARD):] if vhost.startswith(WILDCARD) else vhost):
+                logger.warning(f"{key} contains {vhost}, wildcards may only lead as '{WILDCARD}'")
+                raise ValueError(KEY_VALIDATION_FAILED_)
 
 
 @CONFIG_MARKER
@@ -64,12 +68,18 @@ def rehash_handler(data: Dict):
         data (typing.Dict): new configuration data to apply.
 
     """
+    global _by_vhost, _resolver  # pylint: disable=global-statement, invalid-name
     logger.debug("applying new permissions scheme...")
-    RECRUIT.update(data['permissions']['recruit'])
-    RAT.update(data['permissions']['rat'])
-    OVERSEER.update(data['permissions']['overseer'])
-    TECHRAT.update(data['permissions']['techrat'])
-    ADMIN.update(data['permissions']['administrator'])
+    levels = {key: set(data['permissions'][key]['vhosts']) for key in _LEVELS}
+    # built in one pass, a vhost moving between levels ends up with the one it moved to
+    by_vhost = {vhost: _LEVELS[key] for key, vhosts in levels.items() for vhost in vhosts}
+    resolver = VhostResolver(by_vhost)
+
+    # swapped in as a whole, lookups never see a partially updated table
+    for key, permission in _LEVELS.items():
+        permission._vhosts = levels[key]
+        permission.level = data['permissions'][key]['level']
+    _by_vhost, _resolver = by_vhost, resolver
 
 
 class Permission:
@@ -95,7 +105,7 @@ class Permission:
         self._vhosts = vhosts if vhosts else set()
         self._denied_message = deny_message
 
-        _by_vhost.update({vhost: self for vhost in self._vhosts})
+        _register(self)
 
     def update(self, data: Dict) -> None:
         """
@@ -127,10 +137,10 @@ class Permission:
         """
         Updates the registered vhosts for this permission object
 
-        This also has the side effect of updating the _by_vhost bindings for this object.
+        This also has the side effect of rebuilding `_by_vhost` from the vhosts of every
+        permission in it and this one, vhosts of this one taking precedence.
 
-        - Items removed from `vhosts` are removed from _by_vhost and
-        - Items that are not in `vhosts` already are added to `_by_vhost`
+        Lookups rebuild their resolver upon next use, `rehash_handler` rebuilds it right away.
 
         Args:
             value (Set[str]): set of vhosts
@@ -141,30 +151,8 @@ class Permission:
         if not isinstance(value, set):
             raise TypeError(f"expected set got {type(value)}")
 
-        # determine which items have been removed
-        removed = self.vhosts - value
-
-        # determine which items are new
-        added = value - self.vhosts
-
-        # recompute _by_vhost to exclude removed vhosts we have removed
-        # ( as there is no bulk-remove method, this avoids a for loop and some function calls )
-        all_vhosts = {vhost: permission for vhost, permission in _by_vhost.items() if
-                      vhost not in removed}
-
-        # create a dict of new vhosts to register
-        new_vhosts = {vhost: self for vhost in added}
-
-        # append new vhosts to the main dict
-        all_vhosts.update(new_vhosts)
-
-        # clear the master dict (can't assign directly due to scope)
-        _by_vhost.clear()
-        # and write it all back to the master
-        _by_vhost.update(all_vhosts)
-
-        # oh and update our set whilst we are here <3
         self._vhosts = value
+        _register(self)
 
     @classmethod
     def from_dict(cls, data: Dict):
@@ -242,6 +230,29 @@ class Permission:
 # mapping between vhosts and permissions
 _by_vhost: Dict[str, Permission] = {}
 
+# resolver built from _by_vhost, None while it needs rebuilding
+_resolver: Optional[VhostResolver[Permission]] = None
+
+
+def _register(permission: Permission):
+    """
+    Rebuilds _by_vhost from the vhosts of the permissions in it and *permission*, which wins
+    vhosts claimed by several of them.
+    """
+    global _by_vhost, _resolver  # pylint: disable=global-statement, invalid-name
+    # permissions compare by level, so they're told apart by identity
+    owners = list({id(owner): owner for owner in _by_vhost.values()
+                   if owner is not permission}.values()) + [permission]
+    _by_vhost = {vhost: owner for owner in owners for vhost in owner.vhosts}
+    _resolver = None
+
+
+def _rebuild() -> VhostResolver[Permission]:
+    global _resolver  # pylint: disable=global-statement, invalid-name
+    _resolver = VhostResolver(_by_vhost)
+    return _resolver
+
+
 # TODO: implement null constructor, populate fields in post.
 _PERMISSIONS_DICT = {}
 # the uninitiated
@@ -259,6 +270,109 @@ TECHRAT = Permission()
 # The Administrator.
 ADMIN = Permission()
 
+# permission levels by their configuration key
+_LEVELS = {"recruit": RECRUIT, "rat": RAT, "overseer": OVERSEER, "techrat": TECHRAT,
+           "administrator": ADMIN}
+
+
+def get_permission(hostname: Optional[str]) -> Optional[Permission]:
+    """
+    Returns the permission granted to a hostname.
+
+    Returns:
+        Permission: the granted permission
+        None: no permission is granted
+    """
+    resolver = _resolver
+    # _by_vhost may have been replaced wholesale, bypassing invalidation
+    if resolver is None or resolver.source is not _by_vhost:
+        resolver = _rebuild()
+    return resolver.resolve(hostname)
+
+
+class Guards:
+    """
+    Requirements a command's invocation has to meet before it runs.
+
+    Guard decorators record their requirement here instead of adding a wrapper of their own, so
+    however many guards a command stacks, invoking it costs a single synchronous `check` and one
+    coroutine call. The command registry runs `check` itself and calls `target` directly.
+    """
+    __slots__ = ["target", "wrapper", "permission", "permission_message", "channel",
+                 "channel_message"]
+
+    def __init__(self, target: Callable):
+        self.target = target
+        """the guarded function"""
+        self.wrapper: Optional[Callable] = None
+        """the wrapper enforcing these guards when the function is called directly"""
+        self.permission: Optional[Permission] = None
+        """minimum permission required, None if anyone may invoke"""
+        self.permission_message: Optional[str] = None
+        """overrides the permission's denied message"""
+        self.channel: Optional[bool] = None
+        """True if a channel is required, False if a DM is required, None if either will do"""
+        self.channel_message: Optional[str] = None
+
+    def check(self, context: Context) -> Optional[str]:
+        """
+        Checks whether *context* meets every requirement.
+
+        Returns:
+            None if it does, otherwise the message to reply with.
+        """
+        if self.channel is not None and (context.channel is not None) is not self.channel:
+            logger.debug("enforcing {} requirement...", "channel" if self.channel else "DM")
+            return self.channel_message
+
+        if self.permission is not None:
+            granted = get_permission(context.user.hostname)
+            if granted is None or granted < self.permission:
+                return self.permission_message or self.permission.denied_message
+
+        return None
+
+
+def guards_of(func: Callable) -> Optional[Guards]:
+    """
+    Returns the guards of a guarded function, or None if it isn't guarded.
+    """
+    guards = getattr(func, "__guards__", None)
+    # functools.wraps copies the attribute onto foreign wrappers, which aren't ours to skip
+    if guards is not None and func in (guards.target, guards.wrapper):
+        return guards
+    return None
+
+
+def _guard(func: Callable) -> Guards:
+    """
+    Returns the guards of *func*, guarding it first if need be.
+
+    Guards are stored on both the function and its wrapper, so they are found no matter if the
+    command got registered before or after being guarded.
+    """
+    guards = guards_of(func)
+    if guards is not None:
+        return guards
+
+    guards = Guards(func)
+
+    @wraps(func)
+    async def guarded(context: Context, *args) -> Any:
+        denied = guards.check(context)
+        if denied is not None:
+            return await context.reply(denied)
+        return await func(context, *args)
+
+    guards.wrapper = guarded
+    guarded.__guards__ = guards
+    try:
+        func.__guards__ = guards
+    except AttributeError:
+        # bound methods and the like, the wrapper will still enforce
+        pass
+    return guards
+
 
 def require_permission(permission: Permission,
                        override_message: str or None = None):
@@ -276,22 +390,39 @@ def require_permission(permission: Permission,
     Returns:
 
     """
+    if not isinstance(permission, Permission):
+        raise TypeError(f"expected a Permission, got {type(permission)}")
 
     def real_decorator(func):
-        logger.debug("Inside the real_decorator")
         logger.debug(f"Wrapping a command with permission {permission}")
+        guards = _guard(func)
+        # stacked permission guards all have to pass, so only the strictest matters
+        if guards.permission is None or permission > guards.permission:
+            guards.permission = permission
+            guards.permission_message = override_message
+        return guards.wrapper
 
-        @wraps(func)
-        async def guarded(context: Context, *args):
-            if context.user.hostname in _by_vhost.keys() \
-                    and _by_vhost[context.user.hostname] >= permission:
-                return await func(context, *args)
+    return real_decorator
 
-            await context.reply(override_message if override_message else permission.denied_message)
 
-        return guarded
+def _require_context(func: Union[str, Callable], message: str, channel: bool):
+    # form of @decorator("message") and @decorator(message=str)
+    if isinstance(func, str):
+        message = func
 
-    return real_decorator
+    # direct decoration
+    if not callable(func):
+        func = None
+
+    def real_decorator(wrapped):
+        guards = _guard(wrapped)
+        guards.channel = channel
+        guards.channel_message = message
+        return guards.wrapper
+
+    # if the form is @require_decorator(*args, **kwargs) we need to call and return real_decorator
+    # otherwise we can just return real_decorator directly
+    return real_decorator(func) if func else real_decorator
 
 
 def require_channel(func: Union[str, Callable] = None,
@@ -316,53 +447,8 @@ def require_channel(func: Union[str, Callable] = None,
         ... async def my_command(context: Context):
         ...     pass
     """
-    # form of @decorator("message") and @decorator(message=str)
-    if isinstance(func, str):
-        message = func
-
-    # direct decoration
-    if not callable(func):
-        func = None
-
-    def real_decorator(wrapped):
-        """
-        The function decorator that implements the `guarded` local
+    return _require_context(func, message, channel=True)
 
-        this wrapper is necessary to prevent coro object not callable in
-        @require_channel(*args, **kwargs) form
-
-        Args:
-            wrapped (function): the function being decorated
-
-        Returns:
-            callable: guarded function
-        """
-
-        @wraps(wrapped)
-        async def guarded(context: Context, *args) -> Any:
-            """
-            Enforces channel requirement
-
-            Args:
-                context (Context): IRC command context
-
-            Returns:
-                Any: whatever the called function returned
-            """
-            if context.channel is not None:
-                return await wrapped(context, *args)
-
-            logger.debug(f"channel was None, enforcing channel requirement...")
-            await context.reply(message)
-
-        return guarded
-
-    # if the form is @require_decorator(*args, **kwargs) we need to call and return real_decorator
-    # otherwise we can just return real_decorator directly
-    return real_decorator(func) if func else real_decorator
-
-
-# def require_dm(message: str = "command {cmd} must be invoked in a private message."):
 
 def require_dm(func: Union[str, Callable] = None,
                message: str = "This command must be invoked in a channel."):
@@ -386,48 +472,4 @@ def require_dm(func: Union[str, Callable] = None,
         ... async def my_command(context: Context):
         ...     pass
     """
-    # form of @decorator("message") and @decorator(message=str)
-    if isinstance(func, str):
-        message = func
-
-    # direct decoration
-    if not callable(func):
-        func = None
-
-    def real_decorator(wrapped):
-        """
-        The function decorator that implements the `guarded` local
-
-
-        this wrapper is necessary to prevent coro object not callable in
-        @require_dm(*args, **kwargs) form
-
-        Args:
-            wrapped (function): the function being decorated
-
-        Returns:
-            callable: guarded function
-        """
-
-        @wraps(wrapped)
-        async def guarded(context: Context, *args) -> Any:
-            """
-            Enforces channel requirement
-
-            Args:
-                context (Context): IRC command context
-
-            Returns:
-                Any: whatever the called function returned
-            """
-            if context.channel is None:
-                return await wrapped(context, *args)
-
-            logger.debug(f"channel was None, enforcing channel requirement...")
-            await context.reply(message)
-
-        return guarded
-
-    # if the form is @require_dm(*args, **kwargs) we need to call and return real_decorator
-    # otherwise we can just return real_decorator directly
-    return real_decorator(func) if func else real_decorator
+    return _require_context(func, message, channel=False)
@@ -0,0 +1,102 @@
+"""
+resolver.py - Hostname to permission resolution
+
+Vhost entries are stored in a trie keyed by hostname labels in reverse order, so
+`nick.overseer.fuelrats.com` is looked up as `com`, `fuelrats`, `overseer`, `nick`. An entry is
+either exact, matching the very hostname given, or a wildcard suffix such as
+`*.overseer.fuelrats.com`, matching any hostname with at least one label in front of the suffix.
+An exact entry beats a wildcard, a longer wildcard suffix beats a shorter one.
+
+Resolved hostnames are memoized, so checking a caller that was seen before is a single dict hit.
+Resolvers are immutable once built, a change of entries means building a new resolver and swapping
+it in.
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import typing
+
+T = typing.TypeVar("T")
+
+WILDCARD = "*."
+"""prefix marking an entry as a wildcard suffix"""
+
+_MEMO_SIZE = 4096
+"""number of hostnames memoized before the memo starts over"""
+
+_MISSING = object()
+
+
+class _Node:
+    __slots__ = ["children", "exact", "wildcard"]
+
+    def __init__(self):
+        self.children: typing.Dict[str, _Node] = {}
+        self.exact = None
+        self.wildcard = None
+
+
+class VhostResolver(typing.Generic[T]):
+    """
+    Resolves hostnames to the value of their best matching entry.
+
+    Args:
+        entries: values by exact hostname or wildcard suffix, matched case insensitively
+
+    Examples:
+        >>> resolver = VhostResolver({"*.fuelrats.com": 1, "overseer.fuelrats.com": 2,
+        ...                           "*.overseer.fuelrats.com": 2, "i.see.all": 4})
+        >>> [resolver.resolve(host) for host in ("Nick.Overseer.fuelrats.com", "rat.fuelrats.com",
+        ...                                      "fuelrats.com", "i.see.all", "x.i.see.all")]
+        [2, 1, None, 4, None]
+    """
+    __slots__ = ["_root", "_memo", "source"]
+
+    def __init__(self, entries: typing.Mapping[str, T]):
+        self._root = _Node()
+        self._memo: typing.Dict[str, typing.Optional[T]] = {}
+        self.source = entries
+        """the entries the resolver was built from, later changes to them don't carry over"""
+
+        for pattern, value in entries.items():
+            wildcard = pattern.startswith(WILDCARD)
+            node = self._root
+            for label in reversed(pattern[len(WILDCARD) if wildcard else 0:].casefold().split(".")):
+                child = node.children.get(label)
+                if child is None:
+                    child = node.children[label] = _Node()
+                node = child
+            if wildcard:
+                node.wildcard = value
+            else:
+                node.exact = value
+
+    def _walk(self, hostname: str) -> typing.Optional[T]:
+        labels = hostname.casefold().split(".")
+        node = self._root
+        best = None
+        for remaining in range(len(labels) - 1, -1, -1):
+            node = node.children.get(labels[remaining])
+            if node is None:
+                return best
+            if remaining and node.wildcard is not None:
+                best = node.wildcard
+        return node.exact if node.exact is not None else best
+
+    def resolve(self, hostname: typing.Optional[str]) -> typing.Optional[T]:
+        """
+        Returns the value of the best entry matching *hostname*, None if no entry matches.
+        """
+        if hostname is None:
+            return None
+
+        value = self._memo.get(hostname, _MISSING)
+        if value is _MISSING:
+            if len(self._memo) >= _MEMO_SIZE:
+                self._memo.clear()
+            value = self._memo[hostname] = self._walk(hostname)
+        return value
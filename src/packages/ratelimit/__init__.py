@@ -0,0 +1,17 @@
+"""
+__init__.py - Per-caller rate limiting of commands
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+from src.config import PLUGIN_MANAGER
+from .ratelimit import RateLimiter, Cost, expensive, cost_of
+from . import ratelimit as _ratelimit
+
+__all__ = ["RateLimiter", "Cost", "expensive", "cost_of"]
+
+PLUGIN_MANAGER.register(_ratelimit, "ratelimit")
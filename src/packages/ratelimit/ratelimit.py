@@ -0,0 +1,215 @@
+"""
+ratelimit.py - Per-caller token bucket rate limiting
+
+Every caller gets a pair of token buckets, one for cheap commands and one for expensive ones,
+those backed by the network or the database. Callers are told apart by their services account if
+they are identified, by their hostname otherwise, so reconnecting under a new nickname doesn't
+refill anything.
+
+Requests over budget are dropped quietly, a spammer doesn't get to make us spam in turn, and
+counted. Holding a permission raises a caller's budget, and callers at or above the exempt
+permission are never limited, so overseers keep full use of the bot during an incident.
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import collections
+import enum
+import typing
+from time import monotonic
+
+from loguru import logger
+
+from src.config import CONFIG_MARKER
+from ..outbound import TokenBucket
+from ..permissions import get_permission, RECRUIT, RAT, OVERSEER, TECHRAT, ADMIN
+from ..user import User
+
+_config: typing.Dict = {
+    "enabled": True,
+    "rate": 0.5,
+    "burst": 5,
+    "expensive_rate": 0.1,
+    "expensive_burst": 2,
+    "exempt": "overseer",
+}
+"""
+Rate limiting configuration, as applied by the last rehash
+"""
+
+_PERMISSIONS = {
+    "recruit": RECRUIT,
+    "rat": RAT,
+    "overseer": OVERSEER,
+    "techrat": TECHRAT,
+    "administrator": ADMIN,
+}
+"""permissions by the name of their configuration section"""
+
+_PRUNE_EVERY = 256
+"""number of requests between sweeps of fully recovered buckets"""
+
+
+class Cost(enum.Enum):
+    """
+    Budget a command is paid from
+    """
+    CHEAP = "cheap"
+    EXPENSIVE = "expensive"
+    """backed by the network or the database"""
+
+
+@CONFIG_MARKER
+def validate_config(data: typing.Dict):
+    """
+    Validate new configuration data.
+
+    The ratelimit section is optional, missing keys fall back to their defaults.
+
+    Args:
+        data (typing.Dict): new configuration data  to validate
+
+    Raises:
+        ValueError:  config section failed to validate.
+    """
+    section = data.get("ratelimit", {})
+
+    if "enabled" in section and not isinstance(section["enabled"], bool):
+        raise ValueError("[ratelimit]enabled must be a boolean.")
+
+    for key in ("rate", "expensive_rate"):
+        if key in section and (not isinstance(section[key], (int, float)) or section[key] <= 0):
+            raise ValueError(f"[ratelimit]{key} must be a positive number.")
+
+    for key in ("burst", "expensive_burst"):
+        if key in section and (not isinstance(section[key], int) or section[key] <= 0):
+            raise ValueError(f"[ratelimit]{key} must be a positive integer.")
+
+    if "exempt" in section and section["exempt"] not in _PERMISSIONS:
+        raise ValueError(f"[ratelimit]exempt must be one of {', '.join(_PERMISSIONS)}.")
+
+
+@CONFIG_MARKER
+def rehash_handler(data: typing.Dict):
+    """
+    Apply new configuration data
+
+    Exemptions apply right away, new budgets to buckets created after the rehash.
+
+    Args:
+        data (typing.Dict): new configuration data to apply.
+
+    """
+    _config.update(data.get("ratelimit", {}))
+
+
+def expensive(func: typing.Callable) -> typing.Callable:
+    """
+    Marks a command as expensive, paying for its invocations from the expensive budget.
+
+    Usage:
+        >>> @expensive
+        ... async def my_command(context):
+        ...     pass
+        >>> cost_of(my_command)
+        <Cost.EXPENSIVE: 'expensive'>
+    """
+    func.__cost__ = Cost.EXPENSIVE
+    return func
+
+
+def cost_of(func: typing.Callable) -> Cost:
+    """
+    Returns the budget invocations of *func* are paid from.
+    """
+    return getattr(func, "__cost__", Cost.CHEAP)
+
+
+class RateLimiter:
+    """
+    Per-caller rate limiter.
+
+    Arguments override the configured values of the same name.
+    """
+
+    def __init__(self, **overrides):
+        self._overrides = overrides
+        self._buckets: typing.Dict[typing.Tuple[str, Cost], TokenBucket] = {}
+        self._requests = 0
+        self._dropped: typing.Counter[Cost] = collections.Counter()
+
+    def _option(self, key: str) -> typing.Any:
+        return self._overrides.get(key, _config[key])
+
+    @staticmethod
+    def _key(user: User) -> str:
+        if user.identified and user.account:
+            return f"account:{user.account.casefold()}"
+        # pydle may not know the host yet, the nickname is all there is then
+        return f"host:{(user.hostname or user.nickname).casefold()}"
+
+    def _bucket(self, key: str, cost: Cost, scale: int) -> TokenBucket:
+        bucket = self._buckets.get((key, cost))
+        if bucket is None:
+            prefix = "expensive_" if cost is Cost.EXPENSIVE else ""
+            bucket = self._buckets[key, cost] = TokenBucket(
+                self._option(f"{prefix}rate") * scale, self._option(f"{prefix}burst") * scale)
+        return bucket
+
+    def _prune(self, now: float):
+        # fully recovered buckets would be created afresh anyway
+        for key in [key for key, bucket in self._buckets.items()
+                    if bucket.tokens(now) >= bucket.burst]:
+            del self._buckets[key]
+
+    def allow(self, user: typing.Optional[User], cost: Cost = Cost.CHEAP) -> bool:
+        """
+        Takes a request of *user* from its budget.
+
+        Args:
+            user: the caller
+            cost: budget the request is paid from
+
+        Returns:
+            bool: whether the request is within budget, it is to be dropped otherwise
+        """
+        if user is None or not self._option("enabled"):
+            return True
+
+        granted = get_permission(user.hostname)
+        if granted is not None and granted >= _PERMISSIONS[self._option("exempt")]:
+            return True
+
+        now = monotonic()
+        self._requests += 1
+        if not self._requests % _PRUNE_EVERY:
+            self._prune(now)
+
+        # every permission level held adds the base budget once more
+        scale = 1 + max(0, granted.level) if granted is not None else 1
+        bucket = self._bucket(self._key(user), cost, scale)
+        if bucket.delay(now):
+            self._dropped[cost] += 1
+            logger.debug("{} is over its {} budget, dropping request", user.nickname, cost.value)
+            return False
+
+        bucket.take(now)
+        return True
+
+    @property
+    def dropped(self) -> typing.Dict[Cost, int]:
+        """
+        Number of requests dropped, by budget
+        """
+        return dict(self._dropped)
+
+    @property
+    def tracked(self) -> int:
+        """
+        Number of buckets currently tracked
+        """
+        return len(self._buckets)
@@ -16,6 +16,7 @@ from loguru import logger
 from typing import Optional, Dict, TypedDict
 from src.config import CONFIG_MARKER
 from ..context import Context
+from ..outbound import Priority
 from ..rescue import Rescue
 from ..rules import rule
 from ..utils import Platforms
@@ -27,6 +28,11 @@ class _RatmamaConfig(TypedDict):
 
 _config: _RatmamaConfig = {"trigger_keyword": ""}
 
+ANNOUNCEMENT_PREFIX = "Incoming Client:"
+"""
+Every RatMama announcement starts with this
+"""
+
 
 @CONFIG_MARKER
 def rehash_handler(data: Dict):
@@ -114,7 +120,10 @@ async def handle_ratmama_announcement(ctx: Context) -> None:
 
     if exist_rescue:
         # we got a case already!
-        await ctx.reply(f"{client_name} has reconnected! Case #{exist_rescue.board_index}")
+        await ctx.reply(
+            f"{client_name} has reconnected! Case #{exist_rescue.board_index}",
+            priority=Priority.SIGNAL,
+        )
         # now let's make it more visible if stuff changed
         diff_response = ""
         if system_name.casefold() != exist_rescue.system.casefold():
@@ -129,7 +138,7 @@ async def handle_ratmama_announcement(ctx: Context) -> None:
             )
 
         if diff_response:
-            await ctx.reply(diff_response)
+            await ctx.reply(diff_response, priority=Priority.SIGNAL)
 
     else:
         platform = None
@@ -157,7 +166,8 @@ async def handle_ratmama_announcement(ctx: Context) -> None:
             f"Platform: {rescue.platform.value if rescue.platform else ''} - "
             f"O2: {'NOT OK' if rescue.code_red else 'OK'} - "
             f"Language: {result.group('full_language')}"
-            f" (Case #{rescue.board_index}) {platform_signal}"
+            f" (Case #{rescue.board_index}) {platform_signal}",
+            priority=Priority.SIGNAL,
         )
 
 
@@ -203,7 +213,8 @@ async def handle_ratsignal(ctx: Context) -> None:
             irc_nickname=ctx.user.nickname, client=ctx.user.nickname
         )
         await ctx.reply(
-            f"Case #{rescue.board_index} created for {ctx.user.nickname}, please set details"
+            f"Case #{rescue.board_index} created for {ctx.user.nickname}, please set details",
+            priority=Priority.SIGNAL,
         )
         return
 
@@ -238,5 +249,6 @@ async def handle_ratsignal(ctx: Context) -> None:
         f"Case created for {rescue.client}"
         f" on {rescue.platform.name} in {rescue.system}. "
         f"{'O2 status is okay' if not code_red else 'This is a CR!'} "
-        f"- {rescue.platform.name.upper()}_SIGNAL"
+        f"- {rescue.platform.name.upper()}_SIGNAL",
+        priority=Priority.SIGNAL,
     )
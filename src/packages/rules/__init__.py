@@ -9,9 +9,13 @@ Licensed under the BSD 3-Clause License.
 See LICENSE.md
 """
 
-from .rules import rule, clear_rules
+from .rules import rule, clear_rules, set_stats_hook, has_candidates
+from ._rule_index import DispatchStats
 
 __all__ = [
     "rule",
-    "clear_rules"
+    "clear_rules",
+    "set_stats_hook",
+    "has_candidates",
+    "DispatchStats",
 ]
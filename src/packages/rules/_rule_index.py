@@ -0,0 +1,290 @@
+"""
+_rule_index.py - Registration-time dispatch index for rules.
+
+Rather than walking every registered rule for every message, rules are grouped into buckets by the
+first character their pattern can possibly match, and every bucket is compiled into (at most) two
+alternation automatons, one matched against the first word and one against the full message.
+
+Python's regex engine tries the branches of an alternation strictly left to right, so an
+alternation built in registration order yields exactly the rule a linear scan would have found.
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+from __future__ import annotations
+
+import re
+import typing
+
+try:  # python 3.11 moved the regex parser into the re package
+    from re import _parser as sre_parse  # pylint: disable=no-name-in-module
+except ImportError:  # pragma: no cover
+    import sre_parse
+
+if typing.TYPE_CHECKING:
+    from .rules import Rule
+
+_SCOPED_FLAGS = ((re.IGNORECASE, "i"), (re.MULTILINE, "m"), (re.DOTALL, "s"))
+"""regex flags that can be expressed as a scoped inline flag group, and their inline letters"""
+
+_UNCOMBINABLE_FLAGS = re.VERBOSE | re.ASCII | re.LOCALE | re.DEBUG
+"""regex flags we refuse to embed into a combined automaton"""
+
+_GROUP_REFERENCES = {sre_parse.GROUPREF, sre_parse.GROUPREF_EXISTS}
+
+
+class DispatchStats(typing.NamedTuple):
+    """
+    Statistics of a single rule lookup, as handed to the stats hook.
+    """
+
+    prefixless: bool
+    """whether prefixless rules were being considered"""
+    candidates: int
+    """number of rules that survived the literal-prefix bucketing"""
+    evaluated: int
+    """number of compiled patterns actually evaluated"""
+    rule: typing.Optional[Rule]
+    """the rule that matched, if any"""
+
+
+def _walk(parsed) -> typing.Iterator[typing.Tuple]:
+    """
+    Recursively yields every (opcode, argument) pair of a parsed pattern.
+    """
+    for opcode, argument in parsed:
+        yield opcode, argument
+        if isinstance(argument, (list, tuple)):
+            for item in argument:
+                if isinstance(item, sre_parse.SubPattern):
+                    yield from _walk(item)
+                elif isinstance(item, list):
+                    # branches store their alternatives as a list of subpatterns
+                    for branch in item:
+                        if isinstance(branch, sre_parse.SubPattern):
+                            yield from _walk(branch)
+
+
+def _first_literal(pattern: typing.Pattern) -> typing.Optional[str]:
+    """
+    Determine the first character *pattern* is guaranteed to consume, if there is one.
+
+    Zero-width assertions (``^``, ``\\b``) in front of the first literal are skipped over.
+
+    Examples:
+        >>> _first_literal(re.compile(r"^banan(a|e)$"))
+        'b'
+        >>> _first_literal(re.compile(r"\\bdrillsignal\\b"))
+        'd'
+        >>> _first_literal(re.compile(r"(g|b)aah")) is None
+        True
+    """
+    try:
+        parsed = sre_parse.parse(pattern.pattern, pattern.flags)
+    except (re.error, TypeError):  # pragma: no cover
+        return None
+
+    for opcode, argument in parsed:
+        if opcode is sre_parse.AT:
+            continue
+        if opcode is sre_parse.LITERAL:
+            return chr(argument)
+        return None
+
+    return None
+
+
+def _bucket_keys(pattern: typing.Pattern) -> typing.Optional[typing.FrozenSet[str]]:
+    """
+    Determine the ASCII characters a message must start with for *pattern* to possibly match.
+
+    Returns:
+        frozenset of characters, or None if the pattern may match messages starting with anything.
+    """
+    first = _first_literal(pattern)
+    if first is None:
+        return None
+
+    if not pattern.flags & re.IGNORECASE:
+        # a case sensitive non-ascii literal can never match an ascii message, the empty bucket
+        # set keeps it out of every ascii bucket whilst the catch-all automaton still holds it.
+        return frozenset((first,)) if first.isascii() else frozenset()
+
+    if not first.isascii():
+        # case folding of non-ascii characters may well produce an ascii character, so we
+        # can't reason about these.
+        return None
+
+    return frozenset((first.lower(), first.upper()))
+
+
+def _is_combinable(pattern: typing.Pattern) -> bool:
+    """
+    Whether *pattern* can be embedded into an alternation without altering its meaning.
+    """
+    if not isinstance(pattern.pattern, str) or pattern.flags & _UNCOMBINABLE_FLAGS:
+        return False
+
+    # inline global flags, such as a leading (?x), can't be scoped to a single alternative
+    if re.compile(pattern.pattern).flags & ~re.UNICODE:
+        return False
+
+    # named groups may collide with those of other rules, numbered back-references would point
+    # at the wrong group once the pattern gets embedded
+    if pattern.groupindex:
+        return False
+
+    parsed = sre_parse.parse(pattern.pattern, pattern.flags)
+    return not any(opcode in _GROUP_REFERENCES for opcode, _ in _walk(parsed))
+
+
+class _Automaton:
+    """
+    A single alternation over an ordered set of patterns.
+
+    Every alternative is wrapped in a capturing group, the index of the matched alternative's
+    group maps back to the rule's position.
+    """
+    __slots__ = ["_pattern", "_positions"]
+
+    def __init__(self, rules: typing.Sequence[typing.Tuple[int, Rule]]):
+        alternatives = []
+        self._positions: typing.Dict[int, typing.Tuple[int, Rule]] = {}
+
+        group = 1
+        for position, rule in rules:
+            flags = "".join(letter for flag, letter in _SCOPED_FLAGS if rule.pattern.flags & flag)
+            alternatives.append(f"(?{flags}:({rule.pattern.pattern}))")
+            self._positions[group] = (position, rule)
+            group += 1 + rule.pattern.groups
+
+        self._pattern = re.compile("|".join(alternatives))
+
+    def match(self, string: str) -> typing.Optional[typing.Tuple[int, Rule]]:
+        """
+        Match *string* against the automaton.
+
+        Returns:
+            position and rule of the first rule to match, or None.
+        """
+        match = self._pattern.match(string)
+        if match is None:
+            return None
+        # the wrapping group is the outermost of its alternative, thus the last one to close.
+        return self._positions[match.lastindex]
+
+
+class _Bucket:
+    """
+    The rules that may match a message starting with a given character, in registration order.
+    """
+    __slots__ = ["size", "_word", "_full", "_singles"]
+
+    def __init__(self, rules: typing.Sequence[typing.Tuple[int, Rule]]):
+        self.size = len(rules)
+
+        combinable = [item for item in rules if _is_combinable(item[1].pattern)]
+        word = [item for item in combinable if not item[1].full_message]
+        full = [item for item in combinable if item[1].full_message]
+        try:
+            self._word = _Automaton(word) if word else None
+            self._full = _Automaton(full) if full else None
+        except re.error:  # pragma: no cover
+            # something we failed to foresee, fall back to evaluating rules one by one
+            self._word = self._full = None
+            combinable = []
+
+        # rules that can't be combined are evaluated on their own, in order.
+        combined = {position for position, _ in combinable}
+        self._singles = [item for item in rules if item[0] not in combined]
+
+    def match(self, word: str, full: str) -> typing.Tuple[typing.Optional[Rule], int]:
+        """
+        Find the first rule, in registration order, that matches.
+
+        Args:
+            word: first word of the message.
+            full: the complete message.
+
+        Returns:
+            the matched rule (or None) and the number of patterns evaluated.
+        """
+        evaluated = 0
+        best: typing.Optional[typing.Tuple[int, Rule]] = None
+
+        for automaton, string in ((self._word, word), (self._full, full)):
+            if automaton is None:
+                continue
+            evaluated += 1
+            found = automaton.match(string)
+            if found is not None and (best is None or found[0] < best[0]):
+                best = found
+
+        for position, rule in self._singles:
+            if best is not None and position > best[0]:
+                break
+            evaluated += 1
+            if rule.pattern.match(full if rule.full_message else word):
+                best = position, rule
+                break
+
+        return (best[1] if best else None), evaluated
+
+
+class RuleIndex:
+    """
+    Dispatch index over an ordered sequence of rules.
+
+    The index is immutable, it is rebuilt whenever a rule gets registered.
+    """
+    __slots__ = ["_buckets", "_fallback", "_everything"]
+
+    def __init__(self, rules: typing.Sequence[Rule]):
+        keyed: typing.Dict[str, typing.List[typing.Tuple[int, Rule]]] = {}
+        wildcards: typing.List[typing.Tuple[int, Rule]] = []
+
+        for position, rule in enumerate(rules):
+            keys = _bucket_keys(rule.pattern)
+            if keys is None:
+                wildcards.append((position, rule))
+                continue
+            for key in keys:
+                keyed.setdefault(key, []).append((position, rule))
+
+        self._buckets = {key: _Bucket(sorted(members + wildcards, key=lambda item: item[0]))
+                         for key, members in keyed.items()}
+        self._fallback = _Bucket(wildcards)
+        self._everything = _Bucket(list(enumerate(rules)))
+
+    def bucket_size(self, first: str) -> int:
+        """
+        Number of rules that could possibly match a message starting with *first*.
+        """
+        return self._bucket(first).size
+
+    def _bucket(self, first: str) -> _Bucket:
+        bucket = self._buckets.get(first)
+        if bucket is not None:
+            return bucket
+        return self._fallback if first.isascii() else self._everything
+
+    def lookup(self, word: str, full: str) -> typing.Tuple[typing.Optional[Rule], int, int]:
+        """
+        Look up the first rule matching a message.
+
+        Args:
+            word: first word of the message
+            full: the complete message
+
+        Returns:
+            the rule (or None), the number of candidates and the number of evaluated patterns.
+        """
+        bucket = self._bucket(full[:1])
+        if not bucket.size:
+            return None, 0, 0
+        rule, evaluated = bucket.match(word, full)
+        return rule, bucket.size, evaluated
@@ -13,12 +13,18 @@ See LICENSE.md
 
 import re
 from loguru import logger
-from typing import Callable, NamedTuple, Pattern, List, Tuple, Optional
+from typing import Callable, NamedTuple, Pattern, List, Tuple, Optional, Sequence
 
+from ._rule_index import RuleIndex, DispatchStats
 
 _rules: List["Rule"] = []
 _prefixless_rules: List["Rule"] = []
 
+_index = RuleIndex(_rules)
+_prefixless_index = RuleIndex(_prefixless_rules)
+
+_stats_hook: Optional[Callable[[DispatchStats], None]] = None
+
 
 class Rule(NamedTuple):
     """
@@ -93,6 +99,9 @@ def rule(regex: str, *, case_sensitive: bool = False, full_message: bool = False
     Ordering is actually ensured by requiring access to *after*, by making sure that it has been
     registered before this one.
 
+    Registering a rule rebuilds the dispatch index, so registration is comparatively expensive
+    whereas looking up a rule stays cheap no matter how many rules there are.
+
     Raises:
         DuplicateRuleException: If the same rule has already been registered.
         RuleNotPresentException: If the rule *after* hasn't yet been registered.
@@ -118,6 +127,7 @@ def rule(regex: str, *, case_sensitive: bool = False, full_message: bool = False
             except ValueError:
                 raise RuleNotPresentException(after)
 
+        _rebuild_index()
         logger.info(f"New rule matching '{regex}' "
                     f"case-{'' if case_sensitive else 'in'} sensitively was created.")
         return tuple_
@@ -125,11 +135,14 @@ def rule(regex: str, *, case_sensitive: bool = False, full_message: bool = False
     return decorator
 
 
-def get_rule(words: List[str], words_eol: List[str],
+def get_rule(words: List[str], words_eol: Sequence[str],
              prefixless: bool) -> Tuple[Optional[Callable], tuple]:
     """
     Attempt to find a rule in the given dict of patterns and rules.
 
+    Only the rules whose literal prefix is compatible with the message are considered, and those
+    are evaluated through the index's combined automatons rather than one by one.
+
     Args:
         words: Words of the message.
         words_eol: Words of the message, but each including everything to the end of it.
@@ -140,19 +153,58 @@ def get_rule(words: List[str], words_eol: List[str],
             2-tuple of the command function and the extra args that it should
             be called with.
     """
-    for rule in _prefixless_rules if prefixless else _rules:
-        if rule.full_message:
-            match = rule.pattern.match(words_eol[0])
-        else:
-            match = rule.pattern.match(words[0])
+    index = _prefixless_index if prefixless else _index
+    found, candidates, evaluated = index.lookup(words[0], words_eol[0])
+
+    if _stats_hook is not None:
+        _stats_hook(DispatchStats(prefixless, candidates, evaluated, found))
+
+    if found is None:
+        return None, ()
+
+    if found.pass_match:
+        # the automaton's match carries the groups of the entire bucket, rerun ours on its own
+        target = words_eol[0] if found.full_message else words[0]
+        return found.underlying, (found.pattern.match(target),)
+
+    return found.underlying, ()
+
+
+def has_candidates(first: str, prefixless: bool) -> bool:
+    """
+    Cheaply determine whether any rule could match a message starting with *first*.
+
+    This consults the literal-prefix buckets only, no pattern is evaluated.
 
-        if match is not None:
-            if rule.pass_match:
-                return rule.underlying, (match,)
+    Args:
+        first: first character of the message
+        prefixless: Whether or not we're looking for prefixless rules.
 
-            return rule.underlying, ()
+    Returns:
+        bool: False if no registered rule can possibly match.
+    """
+    index = _prefixless_index if prefixless else _index
+    return index.bucket_size(first) > 0
+
+
+def set_stats_hook(hook: Optional[Callable[[DispatchStats], None]]):
+    """
+    Sets the callable invoked with the :class:`DispatchStats` of every rule lookup.
 
-    return None, ()
+    Args:
+        hook: callable to invoke, or None to disable the hook.
+    """
+    global _stats_hook  # pylint: disable=global-statement
+    _stats_hook = hook
+
+
+def _rebuild_index():
+    """
+    Rebuilds the dispatch indexes from the registered rules.
+    """
+    global _index, _prefixless_index  # pylint: disable=global-statement
+    _index = RuleIndex(_rules)
+    _prefixless_index = RuleIndex(_prefixless_rules)
 
 
 def clear_rules():
@@ -162,3 +214,4 @@ def clear_rules():
 
     _prefixless_rules.clear()
     _rules.clear()
+    _rebuild_index()
@@ -0,0 +1,97 @@
+"""
+histogram.py - Fixed-bucket histograms of durations
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import bisect
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+"""upper bounds of the histogram buckets, in seconds. Anything above lands in an overflow bucket"""
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram of durations, in seconds
+    """
+    __slots__ = ["counts", "total", "maximum"]
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def observe(self, value: float):
+        """
+        Record a single duration.
+        """
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.total += value
+        self.maximum = max(self.maximum, value)
+
+    @property
+    def count(self) -> int:
+        """
+        Number of recorded durations
+        """
+        return sum(self.counts)
+
+    def quantile(self, quantile: float) -> float:
+        """
+        Estimate a quantile, as the upper bound of the bucket it falls into, capped at the
+        largest recorded duration.
+
+        Examples:
+            >>> histogram = Histogram()
+            >>> for value in (0.002, 0.002, 0.2, 3.0):
+            ...     histogram.observe(value)
+            >>> histogram.quantile(0.5)
+            0.0025
+            >>> histogram.quantile(0.99)
+            3.0
+        """
+        count = self.count
+        if not count:
+            return 0.0
+        rank = quantile * count
+        cumulative = 0
+        for bound, bucket in zip(BUCKETS, self.counts):
+            cumulative += bucket
+            if cumulative >= rank:
+                return min(bound, self.maximum)
+        return self.maximum
+
+    def render_prometheus(self, metric: str, labels: str) -> list:
+        """
+        Lines of the histogram in the Prometheus text exposition format.
+
+        Examples:
+            >>> histogram = Histogram()
+            >>> histogram.observe(0.002)
+            >>> histogram.render_prometheus("seconds", 'name="ping"')[:2]
+            ['seconds_bucket{name="ping",le="0.001"} 0', 'seconds_bucket{name="ping",le="0.0025"} 1']
+        """
+        lines = []
+        cumulative = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            cumulative += count
+            lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f"{metric}_sum{{{labels}}} {self.total}")
+        lines.append(f"{metric}_count{{{labels}}} {self.count}")
+        return lines
+
+
+def format_duration(seconds: float) -> str:
+    """
+    Human readable duration, milliseconds below a second.
+
+    Examples:
+        >>> format_duration(0.0123), format_duration(2.5)
+        ('12ms', '2.50s')
+    """
+    return f"{seconds * 1000:.0f}ms" if seconds < 1 else f"{seconds:.2f}s"
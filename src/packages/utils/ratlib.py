@@ -23,6 +23,15 @@ import humanfriendly
 
 STRIPPED_CHARS = '\t'
 
+_CONTROL_CODE_REGEX = re.compile(r"([\x02\x1D\x1F\x1E\x11\x16\x0F]|"
+                                 r"(\x03([0-9]{1,2}(,[0-9]{1,2})?)?)|"
+                                 r"(\x04([0-9a-fA-F]{6}(,[0-9a-fA-F]{6})?)?))"
+                                 )
+"""IRC control codes for color, bold, underline, etc. along with their arguments"""
+
+_STRIP_TABLE = str.maketrans('', '', STRIPPED_CHARS)
+"""translation table deleting every one of STRIPPED_CHARS"""
+
 
 class Platforms(Enum):
     """
@@ -121,19 +130,17 @@ def sanitize(message: str) -> str:
     Returns:
         str: sanitized text string.
     """
-    sanitized_string = message
+    # Fast path, the vast majority of lines are plain text already. Control codes, STRIPPED_CHARS
+    # and any whitespace but the plain space are all non-printable.
+    if (message.isprintable() and "  " not in message
+            and not message.startswith(" ") and not message.endswith(" ")):
+        return message
 
     # Remove IRC control codes for color, bold, underline, etc.
-    control_code_regex = re.compile(r"([\x02\x1D\x1F\x1E\x11\x16\x0F]|"
-                                    r"(\x03([0-9]{1,2}(,[0-9]{1,2})?)?)|"
-                                    r"(\x04([0-9a-fA-F]{6}(,[0-9a-fA-F]{6})?)?))"
-                                    )
-    sanitized_string = control_code_regex.sub('', sanitized_string)
+    sanitized_string = _CONTROL_CODE_REGEX.sub('', message)
 
     # Remove stripped characters. (e.g. Tabs)
-    for character in sanitized_string:
-        if character in STRIPPED_CHARS:
-            sanitized_string = sanitized_string.replace(character, '')
+    sanitized_string = sanitized_string.translate(_STRIP_TABLE)
 
     sanitized_string = ' '.join(sanitized_string.split())
 
@@ -1,4 +1,5 @@
 from src.mechaclient import MechaClient
+from src.packages.outbound import Priority
 
 
 class MockBot(MechaClient):
@@ -86,10 +87,11 @@ class MockBot(MechaClient):
             }
         }
 
-    async def message(self, target: str, message: str):
+    async def message(self, target: str, message: str, priority: Priority = Priority.REPLY):
         self.sent_messages.append({
             "target": target,
-            "message": message
+            "message": message,
+            "priority": priority,
         })
 
     async def whois(self, name: str) -> dict:
@@ -81,3 +81,21 @@ async def test_rehash_successful(bot_fx, callable_fx, monkeypatch):
     assert some_checksum in bot_fx.sent_messages[1]['message']
     # and that success is
     assert "success" in bot_fx.sent_messages[1]['message']
+
+
+@pytest.mark.asyncio
+async def test_rehash_flushes_transaction_log(bot_fx, callable_fx, async_callable_fx, monkeypatch):
+    """
+    Verifies rehash writes the buffered transaction log rows before reloading.
+    """
+    context = await Context.from_message(bot_fx, "#unittest", "some_admin", "!rehash")
+
+    callable_fx.return_value = ({}, 'abcdefghijk')
+    monkeypatch.setattr(administration, "setup", callable_fx)
+    async_callable_fx.return_value = True
+    monkeypatch.setattr(administration.transaction_log, "flush_all", async_callable_fx)
+
+    await administration.cmd_rehash(context)
+
+    assert async_callable_fx.was_called
+    assert "success" in bot_fx.sent_messages[1]['message']
@@ -246,6 +246,7 @@ async def test_inject_creates_rescue(bot_fx, cr_state: bool, platform: Platforms
     await bot_fx.on_message("#ratchat", "some_ov",
                             f"!inject {client} {platform.value} {'cr' if cr_state else ''} {payload}",
                             )
+    await bot_fx.dispatcher.join()
     message = ""
     while "case opened" not in message and bot_fx.sent_messages:
         message = bot_fx.sent_messages.pop(0)["message"].casefold()
@@ -0,0 +1,90 @@
+"""
+test_facts.py - tests for the fact lookup commands
+
+Copyright (c) 2020 The Fuel Rats Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE
+"""
+import pytest
+
+from src.commands import facts
+from src.packages.commands import rat_command
+from src.packages.context import Context
+from src.packages.fact_manager import FactManager, FuzzyIndex, TextIndex
+from src.packages.ratelimit import Cost, cost_of
+
+pytestmark = [pytest.mark.unit, pytest.mark.commands]
+
+
+class FakeFactManager(FactManager):
+    """
+    Fact manager knowing no facts, but a few names
+    """
+
+    def __init__(self):  # pylint: disable=super-init-not-called
+        self._names = FuzzyIndex([("assign", "en"), ("assist", "en"), ("prep", "en")])
+        self._snapshot = {}
+        self._texts = TextIndex([("prep", "en", "Drop from supercruise, then stop."),
+                                 ("prep", "de", "Verlasse den Supercruise.")])
+
+    async def find_many(self, requests, admit=None):
+        return [None] * len(requests)
+
+
+@pytest.fixture
+def fake_facts_fx(bot_fx) -> FakeFactManager:
+    bot_fx.fact_manager = FakeFactManager()
+    return bot_fx.fact_manager
+
+
+@pytest.mark.asyncio
+async def test_factsearch(bot_fx, fake_facts_fx):
+    ctx = await Context.from_message(bot_fx, "#unit_test", "unit_test", "!factsearch assi")
+    await facts.cmd_factsearch(ctx)
+
+    assert bot_fx.sent_messages[0]['message'] == "Facts similar to 'assi': assign, assist"
+
+
+@pytest.mark.asyncio
+async def test_factsearch_nothing(bot_fx, fake_facts_fx):
+    ctx = await Context.from_message(bot_fx, "#unit_test", "unit_test", "!factsearch xyzzy de")
+    await facts.cmd_factsearch(ctx)
+
+    assert bot_fx.sent_messages[0]['message'] == "No facts similar to 'xyzzy'."
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("enabled, replies", ((False, []),
+                                              (True, ["No fact named 'assing', did you mean "
+                                                      "!assign, !assist?"])))
+async def test_fact_miss_suggestion(bot_fx, fake_facts_fx, monkeypatch, enabled, replies):
+    monkeypatch.setattr(FakeFactManager, "suggestions_enabled", staticmethod(lambda: enabled))
+    ctx = await Context.from_message(bot_fx, "#unit_test", "unit_test", "!assing SomeRat")
+
+    assert not await rat_command.handle_fact(ctx)
+    assert [sent['message'] for sent in bot_fx.sent_messages] == replies
+
+
+@pytest.mark.asyncio
+async def test_factfind(bot_fx, fake_facts_fx):
+    ctx = await Context.from_message(bot_fx, "#unit_test", "unit_test", "!factfind supercruise")
+    await facts.cmd_factfind(ctx)
+
+    assert bot_fx.sent_messages[0]['message'] == \
+        "Facts mentioning 'supercruise': prep-de, prep-en"
+
+
+@pytest.mark.asyncio
+async def test_factfind_nothing(bot_fx, fake_facts_fx):
+    ctx = await Context.from_message(bot_fx, "#unit_test", "unit_test", "!factfind beacon on")
+    await facts.cmd_factfind(ctx)
+
+    assert bot_fx.sent_messages[0]['message'] == "No facts mention 'beacon on'."
+
+
+def test_searches_expensive():
+    assert cost_of(facts.cmd_factsearch) is Cost.EXPENSIVE
+    assert cost_of(facts.cmd_factfind) is Cost.EXPENSIVE
@@ -0,0 +1,113 @@
+"""
+test_capture.py - tests for the inbound traffic capture
+
+Copyright (c) 2020 The Fuel Rats Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE
+"""
+import gzip
+import importlib.util
+import pathlib
+
+import pytest
+
+from src.packages.capture import CaptureWriter, CaptureFormatError, read_capture
+from src.packages.capture import capture as capture_module
+
+pytestmark = [pytest.mark.unit, pytest.mark.capture]
+
+
+@pytest.mark.parametrize("name", ["traffic.capture", "traffic.capture.gz"])
+def test_round_trip(tmp_path, name):
+    path = str(tmp_path / name)
+    messages = [
+        ("#fuelrats", "some_ov", "overseer.fuelrats.com", "!assign 3 SomeRat"),
+        ("#ratchat", "lurker", None, "tabs\tand \\backslashes\\ and\nnewlines\r"),
+        ("#fuelrats", "RatMama[Bot]", "bot.fuelrats.com", "\x0304RATSIGNAL\x03 - CMDR Client"),
+    ]
+    with CaptureWriter(path) as writer:
+        for message in messages:
+            writer.write(*message)
+
+    records = list(read_capture(path))
+
+    assert [(record.channel, record.sender, record.hostname, record.message)
+            for record in records] == messages
+    offsets = [record.offset for record in records]
+    assert offsets == sorted(offsets)
+    assert records[0].timestamp <= records[-1].timestamp
+
+
+def test_compressed(tmp_path):
+    path = str(tmp_path / "traffic.capture.gz")
+    with CaptureWriter(path) as writer:
+        writer.write("#fuelrats", "some_ov", None, "o7")
+
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        assert file.readline().startswith(capture_module.MAGIC)
+
+
+@pytest.mark.parametrize("content", [
+    "not a capture\n",
+    f"{capture_module.MAGIC} 99 0.0\n",
+    f"{capture_module.MAGIC} {capture_module.VERSION} 0.0\n0.1\t#fuelrats\tmissing fields\n",
+])
+def test_malformed(tmp_path, content):
+    path = tmp_path / "traffic.capture"
+    path.write_text(content, encoding="utf-8")
+
+    with pytest.raises(CaptureFormatError):
+        list(read_capture(str(path)))
+
+
+@pytest.mark.parametrize("section", [{"file": 42}, {"file": None}])
+def test_validate_config(section):
+    with pytest.raises(ValueError):
+        capture_module.validate_config({"capture": section})
+
+
+@pytest.mark.asyncio
+async def test_client_captures(bot_fx, tmp_path):
+    path = str(tmp_path / "traffic.capture")
+    bot_fx.start_capture(path)
+    assert bot_fx.capturing
+
+    await bot_fx.on_message("#unit_test", "unit_test", "just some chatter")
+    await bot_fx.on_message("#unit_test", "nobody", "who am I")
+    bot_fx.stop_capture()
+    assert not bot_fx.capturing
+
+    records = list(read_capture(path))
+    assert [(record.channel, record.sender, record.message) for record in records] == [
+        ("#unit_test", "unit_test", "just some chatter"),
+        ("#unit_test", "nobody", "who am I"),
+    ]
+    assert records[0].hostname == bot_fx.users["unit_test"]["hostname"]
+    assert records[1].hostname is None
+
+
+@pytest.mark.asyncio
+async def test_replay_smoke(tmp_path, configuration_fx, capsys):
+    """
+    Verify the replay tool replays a capture without any invocation failing, facts included.
+    """
+    tool = pathlib.Path(__file__).resolve().parents[2] / "tools" / "replay_capture.py"
+    spec = importlib.util.spec_from_file_location("replay_capture", str(tool))
+    replay_capture = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(replay_capture)
+
+    path = str(tmp_path / "traffic.capture")
+    with CaptureWriter(path) as writer:
+        writer.write("#unit_test", "some_rat", "rat.fuelrats.com", "just some chatter")
+        writer.write("#unit_test", "some_rat", "rat.fuelrats.com", "!prep some_client")
+        writer.write("#unit_test", "lurker", None, "!nosuchfact")
+
+    await replay_capture.replay(path, 0, configuration_fx, facts=False, trace=False)
+
+    report = capsys.readouterr().out
+    assert report.startswith("replayed 3 lines")
+    lanes = [line for line in report.splitlines() if " lane: " in line]
+    assert lanes and all("failed=0 " in line for line in lanes)
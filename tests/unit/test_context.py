@@ -12,7 +12,7 @@ See LICENSE.md
 """
 import pytest
 
-from src.packages.context.context import Context, _split_message
+from src.packages.context.context import Context, _split_message, WordsEol
 import hypothesis
 from hypothesis import strategies
 import itertools
@@ -127,3 +127,41 @@ def test_split_hypothesis(data: str):
         assert not any(char.isspace() for char in word)
 
     assert len(words_out) == data.count(" ") + 1, "failed to tokenize words as expected"
+
+
+@pytest.mark.parametrize("payload", ["pink fluffy unicorns", "  dancing\ton   rainbows ", "",
+                                     "single"])
+def test_words_eol_list_compatible(payload: str):
+    """Verifies words_eol behaves exactly like the eagerly built list it replaces."""
+    words, words_eol = _split_message(payload)
+    expected = [" ".join(words[i:]) for i, _ in enumerate(words)]
+
+    assert isinstance(words_eol, WordsEol)
+    assert len(words_eol) == len(expected)
+    assert list(words_eol) == expected
+    assert words_eol == expected
+    assert expected == words_eol
+    assert words_eol[1:] == expected[1:]
+    assert repr(words_eol) == repr(expected)
+    for index in range(-len(expected), len(expected)):
+        assert words_eol[index] == expected[index]
+
+
+def test_words_eol_index_error():
+    """Verifies out of range access raises just like a list would."""
+    _, words_eol = _split_message("pink fluffy unicorns")
+
+    with pytest.raises(IndexError):
+        _ = words_eol[3]
+
+
+def test_words_eol_long_message():
+    """Verifies long pasted lines keep a single copy of the message around."""
+    payload = " ".join(["word"] * 10_000)
+
+    words, words_eol = _split_message(payload)
+
+    assert len(words_eol) == 10_000
+    assert words_eol[0] == payload
+    assert words_eol[9_999] == "word"
+    assert words_eol[2].startswith("word word")
@@ -11,9 +11,14 @@ Licensed under the BSD 3-Clause License.
 
 See LICENSE
 """
+import asyncio
+
 import psycopg2
 import pytest
-from psycopg2 import extensions, sql
+from psycopg2 import extensions, pool, sql
+
+from src.packages.database import CircuitOpenError, DatabaseManager, State, metrics
+from src.packages.offline_awareness import OfflineAwareABC
 
 pytestmark = [pytest.mark.unit, pytest.mark.database_manager]
 
@@ -135,3 +140,353 @@ async def test_db_query_direct(test_dbm_fx):
 def test_validate_config_invalid(configuration_fx, data, test_dbm_fx):
     with pytest.raises(ValueError):
         test_dbm_fx.validate_config(data={'database': data})
+
+
+@pytest.mark.asyncio
+async def test_transaction_single_transaction(test_dbm_fx, test_dbm_pool_fx):
+    """
+    Verify the statements of a unit of work share a single transaction.
+    """
+    query = sql.SQL("SELECT txid_current()")
+    used = len(test_dbm_pool_fx._used)
+    async with test_dbm_fx.transaction() as transaction:
+        first = await transaction.query(query, ())
+        second = await transaction.query(query, ())
+
+    assert first == second
+    assert len(test_dbm_pool_fx._used) == used
+
+
+@pytest.mark.asyncio
+async def test_transaction_rollback(test_dbm_fx, test_dbm_pool_fx):
+    """
+    Verify a unit of work raising rolls back, releasing its connection.
+    """
+    used = len(test_dbm_pool_fx._used)
+    with pytest.raises(psycopg2.ProgrammingError):
+        async with test_dbm_fx.transaction() as transaction:
+            await transaction.query(sql.SQL("SELECT * FROM no_such_table"), ())
+
+    assert len(test_dbm_pool_fx._used) == used
+    async with test_dbm_fx.transaction() as transaction:
+        assert await transaction.query(sql.SQL("SELECT 1"), ()) == [(1,)]
+
+
+@pytest.mark.asyncio
+async def test_transaction_query_type_error(test_dbm_fx):
+    async with test_dbm_fx.transaction() as transaction:
+        with pytest.raises(TypeError):
+            await transaction.query("SELECT 1", ())
+
+
+@pytest.mark.asyncio
+async def test_query_keeps_loop_running(test_dbm_fx):
+    """
+    Verify the event loop keeps running while a query waits on the database.
+    """
+    ticks = 0
+
+    async def tick():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    ticker = asyncio.ensure_future(tick())
+    try:
+        await test_dbm_fx.query(sql.SQL("SELECT pg_sleep(0.2)"), ())
+    finally:
+        ticker.cancel()
+
+    assert ticks >= 5
+
+
+@pytest.mark.asyncio
+async def test_query_timeout(test_dbm_fx, test_dbm_pool_fx):
+    """
+    Verify a query exceeding its timeout is cancelled server side, releasing its connection.
+    """
+    used = len(test_dbm_pool_fx._used)
+    with pytest.raises(extensions.QueryCanceledError):
+        await test_dbm_fx.query(sql.SQL("SELECT pg_sleep(10)"), (), timeout=0.1)
+
+    # the connection is released once the server acknowledged the cancellation
+    for _ in range(100):
+        if len(test_dbm_pool_fx._used) == used:
+            break
+        await asyncio.sleep(0.01)
+    assert len(test_dbm_pool_fx._used) == used
+    assert await test_dbm_fx.query(sql.SQL("SELECT 1"), ()) == [(1,)]
+
+
+@pytest.mark.asyncio
+async def test_query_cancelled(test_dbm_fx):
+    """
+    Verify cancelling the awaiting task cancels the query server side.
+    """
+    query = asyncio.ensure_future(test_dbm_fx.query(sql.SQL("SELECT pg_sleep(10)"), ()))
+    await asyncio.sleep(0.1)
+    query.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await query
+
+    running = sql.SQL("SELECT COUNT(*) FROM pg_stat_activity "
+                      "WHERE query = 'SELECT pg_sleep(10)' AND state = 'active'")
+    for _ in range(100):
+        if await test_dbm_fx.query(running, ()) == [(0,)]:
+            break
+        await asyncio.sleep(0.01)
+    assert await test_dbm_fx.query(running, ()) == [(0,)]
+
+
+@pytest.mark.asyncio
+async def test_transaction_timeout(test_dbm_fx, test_dbm_pool_fx):
+    """
+    Verify a transaction's statement exceeding its timeout rolls the transaction back.
+    """
+    used = len(test_dbm_pool_fx._used)
+    with pytest.raises(extensions.QueryCanceledError):
+        async with test_dbm_fx.transaction(timeout=0.1) as transaction:
+            await transaction.query(sql.SQL("SELECT pg_sleep(10)"), ())
+
+    assert len(test_dbm_pool_fx._used) == used
+
+
+def test_validate_config_timeout(test_dbm_fx):
+    data = {'host': 'localhost',
+            'port': 5432,
+            'dbname': 'circle_test',
+            'username': 'root',
+            'password': 'mecha',
+            'timeout': -1}
+    with pytest.raises(ValueError):
+        test_dbm_fx.validate_config(data={'database': data})
+
+
+@pytest.mark.asyncio
+async def test_statement_prepared_once(test_dbm_fx):
+    """
+    Verify a declared statement is prepared once per connection, and executed by name.
+    """
+    statement = test_dbm_fx.statement("test_add", sql.SQL("SELECT %s::int + %s::int, '100%%'"))
+    assert test_dbm_fx.statement("test_add", sql.SQL("SELECT %s::int + %s::int, '100%%'")) is statement
+
+    prepared = sql.SQL("SELECT COUNT(*) FROM pg_prepared_statements WHERE name = 'test_add'")
+    async with test_dbm_fx.transaction() as transaction:
+        assert await transaction.query(statement, (1, 2)) == [(3, '100%')]
+        assert await transaction.query(statement, (3, 4)) == [(7, '100%')]
+        assert await transaction.query(prepared, ()) == [(1,)]
+
+
+@pytest.mark.asyncio
+async def test_statement_named_parameters(test_dbm_fx):
+    statement = test_dbm_fx.statement(
+        "test_named", sql.SQL("SELECT %(word)s::text || %(other)s::text || %(word)s::text"))
+
+    assert statement.execute_text == 'EXECUTE "test_named" (%(word)s, %(other)s)'
+    assert await test_dbm_fx.query(statement, {"word": "a", "other": "b"}) == [("aba",)]
+
+
+def test_statement_redeclared(test_dbm_fx):
+    test_dbm_fx.statement("test_redeclared", sql.SQL("SELECT 1"))
+    with pytest.raises(ValueError):
+        test_dbm_fx.statement("test_redeclared", sql.SQL("SELECT 2"))
+
+
+@pytest.mark.asyncio
+async def test_transaction_restores_session(test_dbm_fx, test_dbm_pool_fx):
+    """
+    Verify a connection is handed back to the pool in autocommit mode after a transaction.
+    """
+    async with test_dbm_fx.transaction() as transaction:
+        await transaction.query(sql.SQL("SELECT 1"), ())
+        connection = transaction._connection
+        assert not connection.autocommit
+
+    assert connection.autocommit
+    assert connection.encoding == 'UTF8'
+
+
+@pytest.mark.asyncio
+async def test_is_connected_releases(test_dbm_fx, test_dbm_pool_fx):
+    used = len(test_dbm_pool_fx._used)
+    assert await test_dbm_fx.is_connected()
+    assert len(test_dbm_pool_fx._used) == used
+
+
+@pytest.mark.asyncio
+async def test_pool_warms_up_lazily():
+    """
+    Verify no connection is opened on instantiation, the monitor opens them in the background.
+    """
+    database = DatabaseManager()
+    assert not database._dbpool._pool and not database._dbpool._used
+
+    database.start_monitor()
+    try:
+        for _ in range(100):
+            if len(database._dbpool._pool) == DatabaseManager.MIN_CONNECTIONS:
+                break
+            await asyncio.sleep(0.01)
+        assert len(database._dbpool._pool) == DatabaseManager.MIN_CONNECTIONS
+        assert not database._dbpool._used
+    finally:
+        database._monitor.cancel()
+        database._dbpool.closeall()
+
+
+@pytest.mark.asyncio
+async def test_checkouts_wait_for_connections():
+    """
+    Verify queries and transactions beyond the pool's capacity wait for a connection, rather
+    than fail.
+    """
+    database = DatabaseManager()
+    count = DatabaseManager.MAX_CONNECTIONS + 5
+
+    async def unit_of_work():
+        async with database.transaction() as transaction:
+            return await transaction.query(sql.SQL("SELECT pg_sleep(0.05), 1"), ())
+
+    try:
+        rows = await asyncio.gather(
+            *(database.query(sql.SQL("SELECT pg_sleep(0.05), 1"), ()) for _ in range(count)),
+            *(unit_of_work() for _ in range(count)))
+        assert all(row[0][1] == 1 for row in rows)
+        assert not database._dbpool._used
+    finally:
+        database._dbpool.closeall()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_checkouts_released():
+    """
+    Verify connections whose checkout got cancelled are handed back to the pool.
+    """
+    database = DatabaseManager()
+    try:
+        queries = [asyncio.ensure_future(database.query(sql.SQL("SELECT 1"), ()))
+                   for _ in range(DatabaseManager.MAX_CONNECTIONS)]
+        # let the checkouts get under way on the thread pool
+        await asyncio.sleep(0)
+        for query in queries:
+            query.cancel()
+        await asyncio.gather(*queries, return_exceptions=True)
+
+        for _ in range(100):
+            if not database._dbpool._used:
+                break
+            await asyncio.sleep(0.01)
+        assert not database._dbpool._used
+        assert await database.query(sql.SQL("SELECT 1"), ()) == [(1,)]
+    finally:
+        database._dbpool.closeall()
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker(monkeypatch):
+    """
+    Verify repeated failures to connect open the breaker, going offline, and a successful trial
+    closes it again, going back online.
+    """
+    monkeypatch.setattr(OfflineAwareABC, "online", True)
+    database = DatabaseManager()
+    config = database._dbpool._kwargs
+    port = config["port"]
+    monkeypatch.setitem(config, "port", 1)
+
+    for _ in range(database._breaker.threshold):
+        with pytest.raises(psycopg2.OperationalError):
+            await database.query(sql.SQL("SELECT 1"), ())
+    assert database.circuit is State.OPEN
+
+    with pytest.raises(CircuitOpenError):
+        await database.query(sql.SQL("SELECT 1"), ())
+    assert not await database.is_connected()
+    await asyncio.sleep(0)
+    assert not OfflineAwareABC.online
+
+    monkeypatch.setitem(config, "port", port)
+    database._breaker.reset_timeout = 0
+    assert await database.query(sql.SQL("SELECT 1"), ()) == [(1,)]
+    assert database.circuit is State.CLOSED
+    await asyncio.sleep(0)
+    assert OfflineAwareABC.online
+    database._dbpool.closeall()
+
+
+@pytest.mark.asyncio
+async def test_pool_error_not_an_answer(monkeypatch):
+    """
+    Verify the pool failing to hand out a connection neither closes the breaker nor resets its
+    failure count, the database was never asked.
+    """
+    database = DatabaseManager()
+
+    def exhausted(transaction):
+        raise pool.PoolError("Raised by Pytest")
+
+    monkeypatch.setattr(database, "_acquire", exhausted)
+    for _ in range(database._breaker.threshold):
+        database._breaker.failure()
+    database._breaker.reset_timeout = 0
+
+    assert not await database.is_connected()
+    assert database.circuit is State.HALF_OPEN
+    with pytest.raises(pool.PoolError):
+        await database.query(sql.SQL("SELECT 1"), ())
+    assert database._breaker._failures == database._breaker.threshold
+
+
+@pytest.mark.asyncio
+async def test_monitor_survives_failed_checks(monkeypatch):
+    """
+    Verify a health check raising unexpectedly doesn't stop the monitor.
+    """
+    database = DatabaseManager()
+    checks = []
+
+    async def broken():
+        checks.append(None)
+        raise RuntimeError("Raised by Pytest")
+
+    monkeypatch.setattr(database, "_health_interval", 0)
+    monkeypatch.setattr(database, "is_connected", broken)
+    database.start_monitor()
+    try:
+        for _ in range(100):
+            if len(checks) >= 2:
+                break
+            await asyncio.sleep(0.01)
+        assert len(checks) >= 2
+        assert not database._monitor.done()
+    finally:
+        database._monitor.cancel()
+        await asyncio.gather(database._monitor, return_exceptions=True)
+        database._dbpool.closeall()
+
+
+@pytest.mark.asyncio
+async def test_metrics(test_dbm_fx, monkeypatch):
+    """
+    Verify statements, checkouts and errors are recorded once database statistics are enabled.
+    """
+    monkeypatch.setattr(metrics, "_statements", {})
+    monkeypatch.setattr(metrics, "_pools", {})
+    await test_dbm_fx.query(sql.SQL("SELECT 1"), ())
+    assert not metrics._statements and not metrics._pools
+
+    monkeypatch.setitem(metrics._config, "database", True)
+    statement = test_dbm_fx.statement("test_metrics", sql.SQL("SELECT generate_series(1, %s)"))
+    await test_dbm_fx.query(statement, (3,))
+    async with test_dbm_fx.transaction() as transaction:
+        await transaction.query(sql.SQL("SELECT 1"), ())
+    with pytest.raises(psycopg2.ProgrammingError):
+        await test_dbm_fx.query(sql.SQL("SELECT * FROM no_such_table"), ())
+
+    assert metrics._statements[("database", "test_metrics")].rows == 3
+    assert metrics._statements[("database", metrics.AD_HOC)].duration.count == 1
+    assert metrics._pools["database"].checkout.count == 3
+    assert metrics._pools["database"].errors == {"UndefinedTable": 1}
+    size, in_use = metrics.pool_sizes()["database"]
+    assert size >= 1
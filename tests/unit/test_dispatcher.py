@@ -0,0 +1,234 @@
+"""
+test_dispatcher.py - tests for the per-target command dispatcher
+
+Copyright (c) 2020 The Fuel Rats Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE
+"""
+import asyncio
+
+import pytest
+
+from src.packages.context import Context
+from src.packages.dispatcher import Dispatcher, Lane, OverflowPolicy
+from src.packages.dispatcher import dispatcher as dispatcher_module
+
+pytestmark = [pytest.mark.unit, pytest.mark.dispatcher, pytest.mark.asyncio]
+
+
+def _context(bot, user, target: str, message: str) -> Context:
+    words = message.split(" ")
+    return Context(bot, user, target, words, [message])
+
+
+class _Recorder:
+    """
+    Handler recording invocations, blocking those for which a gate is set up
+    """
+
+    def __init__(self):
+        self.started = []
+        self.finished = []
+        self.errors = []
+        self.gates = {}
+
+    async def __call__(self, ctx: Context):
+        self.started.append(ctx.words[0])
+        gate = self.gates.get(ctx.words[0])
+        if gate is not None:
+            await gate.wait()
+        if ctx.words[0] == "explode":
+            raise RuntimeError("expected during testing")
+        self.finished.append(ctx.words[0])
+
+    async def on_error(self, ctx: Context, ex: Exception):
+        self.errors.append((ctx.words[0], ex))
+
+
+async def test_order_per_target(bot_fx, user_fx):
+    """
+    Verifies invocations of a single target execute in order, one at a time.
+    """
+    recorder = _Recorder()
+    recorder.gates["first"] = asyncio.Event()
+    dispatcher = Dispatcher(recorder, recorder.on_error)
+
+    for word in ("first", "second", "third"):
+        dispatcher.submit(_context(bot_fx, user_fx, "#ratchat", word))
+    await asyncio.sleep(0)
+
+    assert recorder.started == ["first"]
+    assert dispatcher.depths == {("#ratchat", Lane.COMMAND): 2}
+
+    recorder.gates["first"].set()
+    await dispatcher.join()
+
+    assert recorder.finished == ["first", "second", "third"]
+    assert not dispatcher.depths
+    assert dispatcher.metrics[Lane.COMMAND].completed == 3
+
+
+async def test_targets_run_concurrently(bot_fx, user_fx):
+    """
+    Verifies a slow command does not hold up other targets.
+    """
+    recorder = _Recorder()
+    recorder.gates["slow"] = asyncio.Event()
+    dispatcher = Dispatcher(recorder, recorder.on_error)
+
+    dispatcher.submit(_context(bot_fx, user_fx, "#ratchat", "slow"))
+    dispatcher.submit(_context(bot_fx, user_fx, "#fuelrats", "fast"))
+    await asyncio.sleep(0)
+
+    assert recorder.finished == ["fast"]
+    assert dispatcher.in_flight == 1
+
+    recorder.gates["slow"].set()
+    await dispatcher.join()
+    assert recorder.finished == ["fast", "slow"]
+
+
+async def test_signal_lane_bypasses_commands(bot_fx, user_fx):
+    """
+    Verifies signals never wait behind commands, neither of the same target nor due to the cap.
+    """
+    recorder = _Recorder()
+    recorder.gates["slow"] = asyncio.Event()
+    dispatcher = Dispatcher(recorder, recorder.on_error, max_in_flight=1)
+
+    dispatcher.submit(_context(bot_fx, user_fx, "#fuelrats", "slow"))
+    dispatcher.submit(_context(bot_fx, user_fx, "#fuelrats", "command"))
+    dispatcher.submit(_context(bot_fx, user_fx, "#fuelrats", "ratsignal"), Lane.SIGNAL)
+    await asyncio.sleep(0)
+
+    assert recorder.finished == ["ratsignal"]
+
+    recorder.gates["slow"].set()
+    await dispatcher.join()
+    assert recorder.finished == ["ratsignal", "slow", "command"]
+
+
+async def test_in_flight_cap(bot_fx, user_fx):
+    """
+    Verifies no more than max_in_flight commands execute concurrently.
+    """
+    recorder = _Recorder()
+    gate = asyncio.Event()
+    dispatcher = Dispatcher(recorder, recorder.on_error, max_in_flight=2)
+
+    for index in range(4):
+        recorder.gates[f"cmd{index}"] = gate
+        dispatcher.submit(_context(bot_fx, user_fx, f"#channel{index}", f"cmd{index}"))
+    await asyncio.sleep(0)
+
+    assert recorder.started == ["cmd0", "cmd1"]
+    assert dispatcher.in_flight == 2
+
+    gate.set()
+    await dispatcher.join()
+    assert sorted(recorder.finished) == ["cmd0", "cmd1", "cmd2", "cmd3"]
+
+
+@pytest.mark.parametrize("policy, expected", [
+    (OverflowPolicy.DROP_NEWEST, ["blocker", "one", "two"]),
+    (OverflowPolicy.DROP_OLDEST, ["blocker", "two", "three"]),
+])
+async def test_overflow(bot_fx, user_fx, policy: OverflowPolicy, expected):
+    """
+    Verifies full queues shed load according to the overflow policy, counting every drop.
+    """
+    recorder = _Recorder()
+    recorder.gates["blocker"] = asyncio.Event()
+    dispatcher = Dispatcher(recorder, recorder.on_error, queue_size=2, overflow=policy)
+
+    dispatcher.submit(_context(bot_fx, user_fx, "#ratchat", "blocker"))
+    await asyncio.sleep(0)
+    accepted = [dispatcher.submit(_context(bot_fx, user_fx, "#ratchat", word))
+                for word in ("one", "two", "three")]
+
+    assert accepted == [True, True, policy is OverflowPolicy.DROP_OLDEST]
+    assert dispatcher.metrics[Lane.COMMAND].dropped == 1
+
+    recorder.gates["blocker"].set()
+    await dispatcher.join()
+    assert recorder.finished == expected
+
+
+async def test_errors_are_reported(bot_fx, user_fx):
+    """
+    Verifies a failing invocation is reported and does not stop its queue.
+    """
+    recorder = _Recorder()
+    dispatcher = Dispatcher(recorder, recorder.on_error)
+
+    dispatcher.submit(_context(bot_fx, user_fx, "#ratchat", "explode"))
+    dispatcher.submit(_context(bot_fx, user_fx, "#ratchat", "after"))
+    await dispatcher.join()
+
+    assert [word for word, _ in recorder.errors] == ["explode"]
+    assert isinstance(recorder.errors[0][1], RuntimeError)
+    assert recorder.finished == ["after"]
+    assert dispatcher.metrics[Lane.COMMAND].failed == 1
+
+
+async def test_failing_error_handler(bot_fx, user_fx):
+    """
+    Verifies an error handler failing in turn does not stop the queue.
+    """
+    recorder = _Recorder()
+
+    async def on_error(ctx: Context, ex: Exception):
+        raise RuntimeError("expected during testing")
+
+    dispatcher = Dispatcher(recorder, on_error)
+    dispatcher.submit(_context(bot_fx, user_fx, "#ratchat", "explode"))
+    dispatcher.submit(_context(bot_fx, user_fx, "#ratchat", "after"))
+    await dispatcher.join()
+
+    assert recorder.finished == ["after"]
+    assert not dispatcher.depths
+
+
+async def test_cancelled_worker_replaced(bot_fx, user_fx):
+    """
+    Verifies a queue whose worker got cancelled is drained by a fresh worker.
+    """
+    recorder = _Recorder()
+    recorder.gates["stuck"] = asyncio.Event()
+    dispatcher = Dispatcher(recorder, recorder.on_error)
+
+    dispatcher.submit(_context(bot_fx, user_fx, "#ratchat", "stuck"))
+    dispatcher.submit(_context(bot_fx, user_fx, "#ratchat", "queued"))
+    await asyncio.sleep(0)
+    worker, = dispatcher._workers.values()
+    worker.cancel()
+    await asyncio.gather(worker, return_exceptions=True)
+
+    dispatcher.submit(_context(bot_fx, user_fx, "#ratchat", "after"))
+    await dispatcher.join()
+
+    assert recorder.finished == ["queued", "after"]
+    assert not dispatcher.depths
+
+
+@pytest.mark.parametrize("section", [
+    {"max_in_flight": 0},
+    {"queue_size": "many"},
+    {"overflow": "drop_everything"},
+])
+async def test_validate_config_rejects(section):
+    """
+    Verifies invalid dispatcher configuration is rejected.
+    """
+    with pytest.raises(ValueError):
+        dispatcher_module.validate_config({"dispatcher": section})
+
+
+async def test_validate_config_optional():
+    """
+    Verifies the dispatcher section is optional.
+    """
+    dispatcher_module.validate_config({})
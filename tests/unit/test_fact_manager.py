@@ -11,14 +11,22 @@ Licensed under the BSD 3-Clause License.
 
 See LICENSE.md
 """
+import asyncio
 import datetime
 
 import psycopg2
+import psycopg2.pool
 import pytest
 from psycopg2 import sql
 from psycopg2 import DatabaseError
 
+from src.packages.database import metrics
 from src.packages.fact_manager.fact_manager import FactManager, Fact
+from src.packages.fact_manager import fact_cache
+from src.packages.fact_manager.fact_cache import FactCache
+from src.packages.fact_manager.fact_index import FuzzyIndex, TextIndex
+from src.packages.fact_manager import transaction_log
+from src.packages.fact_manager.transaction_log import TransactionLogWriter
 
 pytestmark = [pytest.mark.unit, pytest.mark.fact_manager]
 
@@ -271,6 +279,7 @@ async def test_facthistory_return(test_fm_fx):
 
     history = await test_fm_fx.fact_history('stats', 'en')
     assert history is not None
+    assert history[0][3] == 'Marked for Delete'
 
 
 @pytest.mark.asyncio
@@ -347,6 +356,8 @@ async def test_find_exception_handling(test_fm_fx, monkeypatch):
         raise psycopg2.ProgrammingError("Raised by Pytest - Fire in the hole!")
 
     monkeypatch.setattr(test_fm_fx, "query", boomstick)
+    # an earlier test may have cached the fact, sparing the query
+    monkeypatch.setattr(test_fm_fx, "_cache", FactCache(0))
 
     with pytest.raises(psycopg2.ProgrammingError):
         result = await test_fm_fx.find('test', 'en')
@@ -355,16 +366,20 @@ async def test_find_exception_handling(test_fm_fx, monkeypatch):
 @pytest.mark.asyncio
 async def test_log_exception_handling(test_fm_fx, monkeypatch):
     """
-    Verify the error is caught if psycopg2.ProgrammingError is raised.
+    Verify a log row failing to be written is kept, rather than raised to the caller.
     """
 
     async def boomstick(*args, **kwargs):
-        raise psycopg2.ProgrammingError("Raised by Pytest - Fire in the hole!")
+        raise psycopg2.OperationalError("Raised by Pytest - Fire in the hole!")
 
-    monkeypatch.setattr(test_fm_fx, "query", boomstick)
+    with monkeypatch.context() as patch:
+        patch.setattr(test_fm_fx, "query", boomstick)
+        await test_fm_fx.add_transaction('test', 'en', 'Shatt', 'Edited')
+        assert not await test_fm_fx._log.flush()
+        assert test_fm_fx._log.pending == 1
 
-    with pytest.raises(psycopg2.ProgrammingError):
-        result = await test_fm_fx.add_transaction('test', 'en', 'Shatt', 'Edited')
+    assert await test_fm_fx._log.flush()
+    assert test_fm_fx._log.pending == 0
 
 
 @pytest.mark.asyncio
@@ -395,3 +410,584 @@ async def test_mfdlist_handling(test_fm_fx, monkeypatch):
 
     with pytest.raises(psycopg2.ProgrammingError):
         result = await test_fm_fx.mfd_list()
+
+
+@pytest.mark.asyncio
+async def test_find_cached(test_fm_fx, monkeypatch):
+    """
+    Verify a fact found once is served from the cache, without touching the database.
+    """
+    found = await test_fm_fx.find('stats', 'en')
+
+    async def boomstick(*args, **kwargs):
+        raise psycopg2.ProgrammingError("Raised by Pytest - Fire in the hole!")
+
+    monkeypatch.setattr(test_fm_fx, "query", boomstick)
+    hits = test_fm_fx.cache_info.hits
+
+    assert await test_fm_fx.exists('stats', 'en')
+    assert await test_fm_fx.find('stats', 'en') is found
+    assert test_fm_fx.cache_info.hits == hits + 1
+
+
+@pytest.mark.asyncio
+async def test_mfd_invalidates_cache(test_fm_fx):
+    """
+    Verify toggling the mfd flag isn't masked by a cached copy of the fact.
+    """
+    test_fact = Fact(name='test131', lang='en', message='This is a test fact for pytest',
+                     editedby='Shatt', author='Shatt', mfd=False, edited=None, aliases=[])
+    await test_fm_fx.add(test_fact)
+    assert not (await test_fm_fx.find('test131', 'en')).mfd
+
+    await test_fm_fx.mfd('test131', 'en')
+    assert (await test_fm_fx.find('test131', 'en')).mfd
+
+    await test_fm_fx.delete('test131', 'en')
+    assert not await test_fm_fx.exists('test131', 'en')
+
+
+def test_fact_cache_lru():
+    """
+    Verify the least recently used fact is evicted first, and counters keep up.
+    """
+    cache = FactCache(2)
+    facts = [Fact(name=name, lang='en', message=f"{name} fact", editedby='Shatt', author='Shatt',
+                  edited=None, aliases=[]) for name in ('alpha', 'beta', 'gamma')]
+
+    cache.put(facts[0])
+    cache.put(facts[1])
+    assert cache.get('alpha', 'en') is facts[0]
+    cache.put(facts[2])
+
+    assert cache.get('beta', 'en') is None
+    assert ('alpha', 'en') in cache and ('gamma', 'en') in cache
+    assert cache.info == (1, 1, 1, 2, 2)
+
+    cache.invalidate('alpha', 'en')
+    assert cache.get('alpha', 'en') is None
+
+
+def test_fact_cache_disabled():
+    cache = FactCache(0)
+    cache.put(Fact(name='alpha', lang='en', message='alpha fact', editedby='Shatt',
+                   author='Shatt', edited=None, aliases=[]))
+
+    assert not len(cache)
+
+
+@pytest.fixture
+def preloaded_fm_fx(test_fm_fx) -> FactManager:
+    """
+    A second fact manager on the test tables, whose snapshot doesn't outlive the test
+    """
+    return FactManager(fact_table=test_fm_fx._fact_table, fact_log=test_fm_fx._fact_log)
+
+
+@pytest.mark.asyncio
+async def test_preload_serves_reads(preloaded_fm_fx, monkeypatch):
+    """
+    Verify a preloaded manager answers reads from its snapshot, even with the database gone.
+    """
+    await preloaded_fm_fx.preload()
+    assert preloaded_fm_fx.preloaded
+
+    async def boomstick(*args, **kwargs):
+        raise psycopg2.OperationalError("Raised by Pytest - Fire in the hole!")
+
+    monkeypatch.setattr(preloaded_fm_fx, "query", boomstick)
+
+    assert await preloaded_fm_fx.exists('stats', 'en')
+    assert not await preloaded_fm_fx.exists('stats', 'de')
+    assert (await preloaded_fm_fx.find('test', 'en')).author == 'Shatt'
+    assert await preloaded_fm_fx.find('nope', 'en') is None
+
+    assert not await preloaded_fm_fx.refresh()
+    assert await preloaded_fm_fx.exists('stats', 'en')
+
+
+@pytest.mark.asyncio
+async def test_refresh_picks_up_changes(test_fm_fx, preloaded_fm_fx):
+    """
+    Verify writes made through another manager show after a refresh, and not before.
+    """
+    await preloaded_fm_fx.preload()
+    assert not await preloaded_fm_fx.refresh()
+
+    test_fact = Fact(name='test141', lang='en', message='This is a test fact for pytest',
+                     editedby='Shatt', author='Shatt', mfd=False, edited=None, aliases=[])
+    await test_fm_fx.add(test_fact)
+    assert not await preloaded_fm_fx.exists('test141', 'en')
+    assert await preloaded_fm_fx.refresh()
+    assert await preloaded_fm_fx.exists('test141', 'en')
+
+    await test_fm_fx.edit_message('test141', 'en', 'Shatt', 'edited elsewhere')
+    assert await preloaded_fm_fx.refresh()
+    assert (await preloaded_fm_fx.find('test141', 'en')).message == 'edited elsewhere'
+
+    await test_fm_fx.mfd('test141', 'en')
+    assert await preloaded_fm_fx.refresh()
+    assert (await preloaded_fm_fx.find('test141', 'en')).mfd
+
+    await test_fm_fx.delete('test141', 'en')
+    assert await preloaded_fm_fx.refresh()
+    assert not await preloaded_fm_fx.exists('test141', 'en')
+
+
+@pytest.mark.asyncio
+async def test_preloaded_writes_update_snapshot(preloaded_fm_fx):
+    """
+    Verify writes through a preloaded manager show right away.
+    """
+    await preloaded_fm_fx.preload()
+    test_fact = Fact(name='test151', lang='en', message='This is a test fact for pytest',
+                     editedby='Shatt', author='Shatt', mfd=False, edited=None, aliases=[])
+
+    await preloaded_fm_fx.add(test_fact)
+    assert await preloaded_fm_fx.exists('test151', 'en')
+
+    await preloaded_fm_fx.mfd('test151', 'en')
+    await preloaded_fm_fx.delete('test151', 'en')
+    assert not await preloaded_fm_fx.exists('test151', 'en')
+
+
+@pytest.mark.asyncio
+async def test_missing_fact_cached(test_fm_fx, monkeypatch):
+    """
+    Verify a fact found missing isn't looked up again, until it gets added.
+    """
+    assert not await test_fm_fx.exists('assing', 'en')
+
+    async def boomstick(*args, **kwargs):
+        raise psycopg2.ProgrammingError("Raised by Pytest - Fire in the hole!")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(test_fm_fx, "query", boomstick)
+        assert not await test_fm_fx.exists('assing', 'en')
+        assert await test_fm_fx.find('assing', 'en') is None
+
+    await test_fm_fx.add(Fact(name='assing', lang='en', message='Did you mean !assign?',
+                              editedby='Shatt', author='Shatt', edited=None, aliases=[]))
+    assert await test_fm_fx.exists('assing', 'en')
+    await test_fm_fx._destroy('assing', 'en')
+
+
+def test_fact_cache_missing_expires(monkeypatch):
+    """
+    Verify facts are only remembered as missing for negative_ttl seconds.
+    """
+    now = 1000.0
+    monkeypatch.setattr("src.packages.fact_manager.fact_cache.monotonic", lambda: now)
+    cache = FactCache(2, negative_ttl=10)
+
+    cache.put_missing('alpha', 'en')
+    assert cache.is_missing('alpha', 'en')
+    assert not cache.is_missing('alpha', 'de')
+
+    now += 10
+    assert not cache.is_missing('alpha', 'en')
+
+
+def test_fact_cache_expires(monkeypatch):
+    """
+    Verify facts are only served from the cache for ttl seconds, or until evicted without one.
+    """
+    now = 1000.0
+    monkeypatch.setattr("src.packages.fact_manager.fact_cache.monotonic", lambda: now)
+    expiring, lasting = FactCache(2, ttl=10), FactCache(2, ttl=0)
+    fact = Fact(name='alpha', lang='en', message='alpha fact', editedby='Shatt', author='Shatt',
+                edited=None, aliases=[])
+    expiring.put(fact)
+    lasting.put(fact)
+
+    now += 9
+    assert expiring.get('alpha', 'en') is fact
+
+    now += 1
+    assert ('alpha', 'en') not in expiring
+    assert expiring.get('alpha', 'en') is None
+    assert lasting.get('alpha', 'en') is fact
+
+
+def test_fact_cache_missing_bounded():
+    cache = FactCache(2, negative_ttl=10)
+    for name in ('alpha', 'beta', 'gamma'):
+        cache.put_missing(name, 'en')
+
+    assert not cache.is_missing('alpha', 'en')
+    assert cache.is_missing('gamma', 'en')
+
+    cache.invalidate('gamma', 'en')
+    assert not cache.is_missing('gamma', 'en')
+
+
+@pytest.mark.asyncio
+async def test_alias_resolves(test_fm_fx, monkeypatch):
+    """
+    Verify a fact can be asked for by its aliases, without an extra query.
+    """
+    await test_fm_fx.add_alias('stats', 'en', 'Statistics', 'Shatt')
+    assert (await test_fm_fx.find('stats', 'en')).aliases == ['statistics']
+
+    async def boomstick(*args, **kwargs):
+        raise psycopg2.ProgrammingError("Raised by Pytest - Fire in the hole!")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(test_fm_fx, "query", boomstick)
+        assert await test_fm_fx.exists('statistics', 'en')
+        assert (await test_fm_fx.find('statistics', 'en')).name == 'stats'
+
+    assert not await test_fm_fx.exists('statistics', 'de')
+
+    history = await test_fm_fx.fact_history('stats', 'en')
+    assert history[0][3] == 'Alias added'
+
+    await test_fm_fx.remove_alias('statistics', 'en', 'statistics', 'Shatt')
+    assert not await test_fm_fx.exists('statistics', 'en')
+
+
+@pytest.mark.asyncio
+async def test_reads_never_load_names(preloaded_fm_fx, monkeypatch):
+    """
+    Verify reads make do without the fact indices, which the background refresh loads.
+    """
+    fact = Fact(name='cached', lang='en', message='cached fact', editedby='Shatt',
+                author='Shatt', edited=None, aliases=[])
+    preloaded_fm_fx._cache.put(fact)
+
+    async def boomstick(*args, **kwargs):
+        raise psycopg2.OperationalError("Raised by Pytest - Fire in the hole!")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(preloaded_fm_fx, "query", boomstick)
+        assert await preloaded_fm_fx.find('cached', 'en') is fact
+        assert await preloaded_fm_fx.suggest('cachd', 'en') == []
+        assert await preloaded_fm_fx.search_text('test fact') == []
+    assert preloaded_fm_fx._aliases is None
+
+    monkeypatch.setitem(fact_cache._config, "preload", False)
+    preloaded_fm_fx.start_refresh()
+    try:
+        for _ in range(100):
+            if preloaded_fm_fx._aliases is not None:
+                break
+            await asyncio.sleep(0.01)
+        assert preloaded_fm_fx._names is not None
+        assert (await preloaded_fm_fx.suggest('tests', 'en'))[0] == 'test'
+        assert ('test', 'en') in await preloaded_fm_fx.search_text('test fact')
+    finally:
+        preloaded_fm_fx._refresher.cancel()
+
+
+@pytest.mark.asyncio
+async def test_alias_collisions(test_fm_fx):
+    """
+    Verify aliases can't be taken twice, nor shadow a fact's name.
+    """
+    with pytest.raises(ValueError):
+        await test_fm_fx.add_alias('stats', 'en', 'test', 'Shatt')
+
+    test_fact = Fact(name='test161', lang='en', message='This is a test fact for pytest',
+                     editedby='Shatt', author='Shatt', edited=None, aliases=['t161'])
+    await test_fm_fx.add(test_fact)
+    assert await test_fm_fx.exists('t161', 'en')
+
+    with pytest.raises(ValueError):
+        await test_fm_fx.add_alias('stats', 'en', 't161', 'Shatt')
+
+    with pytest.raises(ValueError):
+        await test_fm_fx.add(Fact(name='t161', lang='en', message='shadowed', editedby='Shatt',
+                                  author='Shatt', edited=None, aliases=[]))
+
+    await test_fm_fx.mfd('t161', 'en')
+    await test_fm_fx.delete('t161', 'en')
+    assert not await test_fm_fx.exists('t161', 'en')
+    assert not await test_fm_fx.exists('test161', 'en')
+
+
+@pytest.mark.asyncio
+async def test_preloaded_aliases(test_fm_fx, preloaded_fm_fx):
+    """
+    Verify aliases set elsewhere show in a preloaded manager after a refresh.
+    """
+    await preloaded_fm_fx.preload()
+    await test_fm_fx.add_alias('test', 'en', 'testing', 'Shatt')
+    assert not await preloaded_fm_fx.exists('testing', 'en')
+
+    assert await preloaded_fm_fx.refresh()
+    assert (await preloaded_fm_fx.find('testing', 'en')).name == 'test'
+
+    await test_fm_fx.remove_alias('test', 'en', 'testing', 'Shatt')
+    assert await preloaded_fm_fx.refresh()
+    assert not await preloaded_fm_fx.exists('testing', 'en')
+
+
+@pytest.mark.asyncio
+async def test_find_many_falls_back(test_fm_fx, monkeypatch):
+    """
+    Verify facts fall back to english in a single query, reporting the language they came in.
+    """
+    queries = []
+    query = test_fm_fx.query
+
+    async def counting(*args, **kwargs):
+        queries.append(args)
+        return await query(*args, **kwargs)
+
+    monkeypatch.setattr(test_fm_fx, "query", counting)
+    await test_fm_fx._ensure_names()
+    queries.clear()
+
+    found = await test_fm_fx.find_many([('test', 'de_at'), ('stats', 'en'), ('missing', 'fr')])
+
+    assert [(fact.name, fact.lang) if fact else None for fact in found] == [
+        ('test', 'en'), ('stats', 'en'), None]
+    assert len(queries) == 1
+
+    found = await test_fm_fx.find_many([('test', 'de_at'), ('missing', 'fr')])
+    assert found[0].lang == 'en' and found[1] is None
+    assert len(queries) == 1
+
+
+@pytest.mark.asyncio
+async def test_find_many_preloaded(preloaded_fm_fx):
+    await preloaded_fm_fx.preload()
+    found = await preloaded_fm_fx.find_many([('stats', 'ru'), ('missing', 'en')])
+
+    assert found[0].lang == 'en'
+    assert found[1] is None
+
+
+@pytest.mark.asyncio
+async def test_edit_message_logged(test_fm_fx):
+    """
+    Verify an edit logs the message it replaced.
+    """
+    before = (await test_fm_fx.find('test', 'en')).message
+    await test_fm_fx.edit_message('test', 'en', 'Shatt', 'Edited and logged at once.')
+
+    history = await test_fm_fx.fact_history('test', 'en')
+    assert history[0][2:4] == ('Shatt', 'Edited')
+    assert history[0][5:] == (before, 'Edited and logged at once.')
+
+
+@pytest.mark.asyncio
+async def test_mfd_missing_fact(test_fm_fx):
+    with pytest.raises(ValueError):
+        await test_fm_fx.mfd('notafact', 'en')
+
+
+@pytest.mark.asyncio
+async def test_transaction_rolls_back(test_fm_fx):
+    """
+    Verify nothing written within a unit of work sticks if it raises.
+    """
+    insert = sql.SQL(f"INSERT INTO {test_fm_fx._fact_table} (name, lang, message) "
+                     f"VALUES (%s, %s, %s)")
+
+    with pytest.raises(RuntimeError):
+        async with test_fm_fx.transaction() as transaction:
+            await transaction.query(insert, ('test181', 'en', 'rolled back'))
+            raise RuntimeError("Raised by Pytest")
+
+    assert not await test_fm_fx.query(
+        sql.SQL(f"SELECT name FROM {test_fm_fx._fact_table} WHERE name=%s"), ('test181',))
+
+
+def test_fuzzy_index_search():
+    """
+    Verify names are found by their typos, most similar first, and forgotten when removed.
+    """
+    index = FuzzyIndex([('assign', 'en'), ('assist', 'en'), ('prep', 'en'), ('prep', 'de')])
+
+    assert index.search('assing', 'en') == ['assign', 'assist']
+    assert index.search('assing', 'en', limit=1) == ['assign']
+    assert index.search('prpe', 'de', threshold=0.1) == ['prep']
+    assert index.search('zzz', 'en') == []
+
+    index.remove('assign', 'en')
+    assert ('assign', 'en') not in index
+    assert index.search('assing', 'en') == ['assist']
+    assert len(index) == 3
+
+
+@pytest.mark.asyncio
+async def test_suggest_maintained(test_fm_fx, monkeypatch):
+    """
+    Verify suggestions follow facts being added and deleted, without querying the database.
+    """
+    await test_fm_fx.add(Fact(name='pcwing', lang='en', message='Wing up on PC', editedby='Shatt',
+                              author='Shatt', edited=None, aliases=['pcwr']))
+
+    async def boomstick(*args, **kwargs):
+        raise psycopg2.ProgrammingError("Raised by Pytest - Fire in the hole!")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(test_fm_fx, "query", boomstick)
+        assert (await test_fm_fx.suggest('pcwign', 'en'))[0] == 'pcwing'
+        assert (await test_fm_fx.suggest('pcwign', 'de'))[0] == 'pcwing'
+        assert 'pcwr' in await test_fm_fx.suggest('pcwr', 'en')
+
+    await test_fm_fx.mfd('pcwing', 'en')
+    await test_fm_fx.delete('pcwing', 'en')
+    assert await test_fm_fx.suggest('pcwign', 'en') == []
+    assert await test_fm_fx.suggest('pcwr', 'en') == []
+
+
+def test_text_index_ranking():
+    """
+    Verify rarer words weigh more, and removed or replaced messages are forgotten.
+    """
+    index = TextIndex([('prep', 'en', 'Drop out of supercruise and stop, then log out.'),
+                       ('beacon', 'en', 'Turn on your wing beacon.'),
+                       ('logout', 'en', 'Log out to the main menu.')])
+
+    assert index.search('supercruise log') == [('prep', 'en'), ('logout', 'en')]
+    assert index.search('SUPERCRUISE', limit=1) == [('prep', 'en')]
+    assert index.search('nothing') == []
+
+    index.add('prep', 'en', 'Stop and wait.')
+    assert index.search('supercruise') == []
+    index.remove('beacon', 'en')
+    assert ('beacon', 'en') not in index
+    assert len(index) == 2
+
+
+@pytest.mark.asyncio
+async def test_search_text_maintained(test_fm_fx, monkeypatch):
+    """
+    Verify text search follows facts being added, edited and deleted.
+    """
+    assert await test_fm_fx.search_text('supercruise') == []
+
+    await test_fm_fx.add(Fact(name='test201', lang='en', message='Drop from supercruise.',
+                              editedby='Shatt', author='Shatt', edited=None, aliases=[]))
+
+    async def boomstick(*args, **kwargs):
+        raise psycopg2.ProgrammingError("Raised by Pytest - Fire in the hole!")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(test_fm_fx, "query", boomstick)
+        assert await test_fm_fx.search_text('supercruise') == [('test201', 'en')]
+
+    await test_fm_fx.edit_message('test201', 'en', 'Shatt', 'Drop from hyperspace.')
+    assert await test_fm_fx.search_text('supercruise') == []
+    assert await test_fm_fx.search_text('hyperspace') == [('test201', 'en')]
+
+    await test_fm_fx.mfd('test201', 'en')
+    await test_fm_fx.delete('test201', 'en')
+    assert await test_fm_fx.search_text('hyperspace') == []
+
+
+@pytest.mark.asyncio
+async def test_find_prepared(test_fm_fx):
+    """
+    Verify fact lookups run a statement prepared on the connection.
+    """
+    test_fm_fx._cache.clear()
+    async with test_fm_fx.transaction() as transaction:
+        found = await transaction.query(test_fm_fx._statements["fact_find"], ('test', 'en'))
+        assert "fact_find" in transaction._connection.prepared
+
+    assert test_fm_fx._fact_from_row(found[0]).message == (await test_fm_fx.find('test', 'en')).message
+    assert await test_fm_fx.mfd_list(1) == []
+
+
+@pytest.mark.asyncio
+async def test_statements_recorded_as_facts(test_fm_fx, monkeypatch):
+    """
+    Verify fact statements are recorded under the facts subsystem, by name.
+    """
+    monkeypatch.setitem(metrics._config, "database", True)
+    monkeypatch.setattr(metrics, "_statements", {})
+    test_fm_fx._cache.clear()
+
+    await test_fm_fx.find('test', 'en')
+
+    assert metrics._statements[("facts", "fact_find")].rows == 1
+
+
+class FakeLogManager:
+    """
+    Stands in for the database manager of a transaction log writer, recording the batches.
+    """
+
+    def __init__(self):
+        self.batches = []
+        self.error = None
+
+    async def query(self, statement, values):
+        if self.error is not None:
+            raise self.error
+        self.batches.append(values)
+        return []
+
+
+@pytest.fixture
+def log_writer_fx(monkeypatch):
+    monkeypatch.setitem(transaction_log._config, "log_batch_size", 3)
+    monkeypatch.setitem(transaction_log._config, "log_flush_interval", 60)
+    monkeypatch.setitem(transaction_log._config, "log_backlog", 4)
+    return TransactionLogWriter(FakeLogManager(), None)
+
+
+@pytest.mark.asyncio
+async def test_transaction_log_batches(log_writer_fx):
+    """
+    Verify log rows are written once a batch fills up, as a single statement taking columns.
+    """
+    log_writer_fx.append(('a', 'en', 'Shatt', 'Added'))
+    log_writer_fx.append(('b', 'en', 'Shatt', 'Added'))
+    await asyncio.sleep(0)
+    assert log_writer_fx._manager.batches == []
+    assert log_writer_fx.pending == 2
+
+    log_writer_fx.append(('c', 'en', 'Shatt', 'Deleted'))
+    assert await log_writer_fx.flush()
+    assert log_writer_fx._manager.batches == [(['a', 'b', 'c'], ['en'] * 3, ['Shatt'] * 3,
+                                               ['Added', 'Added', 'Deleted'])]
+    assert log_writer_fx.written == 3
+
+
+@pytest.mark.asyncio
+async def test_transaction_log_interval(log_writer_fx, monkeypatch):
+    """
+    Verify a batch that doesn't fill up is written once the flush interval elapsed.
+    """
+    monkeypatch.setitem(transaction_log._config, "log_flush_interval", 0.01)
+    log_writer_fx.append(('a', 'en', 'Shatt', 'Added'))
+    await asyncio.sleep(0.05)
+
+    assert log_writer_fx._manager.batches == [(['a'], ['en'], ['Shatt'], ['Added'])]
+    assert log_writer_fx.pending == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("error", [psycopg2.OperationalError, psycopg2.pool.PoolError])
+async def test_transaction_log_offline(log_writer_fx, error):
+    """
+    Verify log rows are kept while the database is unavailable, dropping the oldest beyond the
+    backlog, and written once it is back.
+    """
+    log_writer_fx._manager.error = error("Raised by Pytest")
+    for name in "abcde":
+        log_writer_fx.append((name, 'en'))
+    assert not await transaction_log.flush_all()
+    assert log_writer_fx.pending == 4
+    assert log_writer_fx.dropped == 1
+
+    log_writer_fx._manager.error = None
+    log_writer_fx._elapsed()
+    await asyncio.sleep(0)
+    assert log_writer_fx.pending == 0
+    assert log_writer_fx._manager.batches == [(['b', 'c', 'd'], ['en'] * 3), (['e'], ['en'])]
+
+
+@pytest.mark.parametrize("key, value", [("log_batch_size", 0), ("log_backlog", 1.5),
+                                        ("log_flush_interval", 0), ("log_flush_interval", True)])
+def test_transaction_log_config_invalid(key, value):
+    """
+    Verify invalid transaction log settings are rejected.
+    """
+    with pytest.raises(ValueError):
+        transaction_log.validate_config({"facts": {key: value}})
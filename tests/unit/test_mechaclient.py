@@ -209,6 +209,7 @@ async def test_mechaclient_on_message_exception(bot_fx):
         raise NotImplementedError("This message is expected during testing.")
 
     result = await bot_fx.on_message("#pytesting", "SomeUser", "!exploding_payload")
+    await bot_fx.dispatcher.join()
 
     assert result is None
     assert bot_fx.sent_messages
@@ -0,0 +1,202 @@
+"""
+test_outbound.py - tests for the outbound message scheduler
+
+Copyright (c) 2020 The Fuel Rats Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE
+"""
+import pytest
+
+from src.packages.outbound import OutboundScheduler, Priority, TokenBucket, split_message
+from src.packages.outbound import scheduler as scheduler_module
+
+pytestmark = [pytest.mark.unit, pytest.mark.outbound]
+
+
+class _Sink:
+    """
+    Records sent lines, optionally failing on a given line
+    """
+
+    def __init__(self, fail_on: str = None):
+        self.lines = []
+        self.fail_on = fail_on
+
+    async def __call__(self, target: str, line: str):
+        if line == self.fail_on:
+            raise ConnectionError("expected during testing")
+        self.lines.append((target, line))
+
+
+def _scheduler(sink: _Sink, **kwargs) -> OutboundScheduler:
+    options = dict(rate=1000.0, burst=100, target_rate=1000.0, target_burst=100, coalesce=False)
+    options.update(kwargs)
+    return OutboundScheduler(sink, lambda target: 400, **options)
+
+
+@pytest.mark.parametrize("message, limit, expected", [
+    ("short", 400, ["short"]),
+    ("one\ntwo\r\nthree", 400, ["one", "two", "three"]),
+    ("pink fluffy unicorns", 11, ["pink fluffy", "unicorns"]),
+    ("unbreakable", 4, ["unbr", "eaka", "ble"]),
+    ("日本語", 7, ["日本", "語"]),
+    ("\x0304colored words in a row", 16, ["\x0304colored words", "\x0304in a row"]),
+    ("\x0304,01colored words in a row", 24, ["\x0304,01colored words in a", "\x0304,01row"]),
+    ("\x02bold\x02 plain words", 10, ["\x02bold\x02", "plain", "words"]),
+])
+def test_split_message(message: str, limit: int, expected):
+    """
+    Verifies messages are split on byte budgets and word boundaries, carrying formatting along.
+    """
+    assert split_message(message, limit) == expected
+
+
+def test_split_message_keeps_codes_whole():
+    """
+    Verifies a formatting code is never cut in half, and every line stays within its budget.
+    """
+    message = "x" * 8 + "\x0312,01" + "y" * 8
+    lines = split_message(message, 10)
+
+    assert all(len(line.encode()) <= 10 for line in lines)
+    assert "".join(lines).count("\x0312,01") >= 1
+    assert all(line.count("\x03") == line.count("\x0312,01") for line in lines)
+
+
+def test_split_message_separates_restored_color():
+    """
+    Verifies a restored color can't swallow digits it wasn't originally followed by.
+    """
+    lines = split_message("\x02\x0304" + "a" * 6 + "\x0f" + "12", 9)
+    assert all(len(line.encode()) <= 9 for line in lines)
+    assert "".join(lines).replace("\x02\x02", "").endswith("\x0f12")
+
+
+@pytest.mark.asyncio
+async def test_priority_order():
+    """
+    Verifies higher priority lanes are drained first.
+    """
+    sink = _Sink()
+    scheduler = _scheduler(sink)
+
+    scheduler.submit("#ratchat", "bulk", Priority.BULK)
+    scheduler.submit("#ratchat", "reply", Priority.REPLY)
+    scheduler.submit("#fuelrats", "signal", Priority.SIGNAL)
+    await scheduler.join()
+
+    assert [line for _, line in sink.lines] == ["signal", "reply", "bulk"]
+    assert scheduler.sent == {Priority.SIGNAL: 1, Priority.REPLY: 1, Priority.BULK: 1}
+
+
+@pytest.mark.asyncio
+async def test_target_bucket_throttles():
+    """
+    Verifies a target's bucket throttles it, whilst other targets keep going.
+    """
+    sink = _Sink()
+    scheduler = _scheduler(sink, target_rate=50.0, target_burst=1)
+
+    scheduler.submit("#ratchat", "one\ntwo")
+    scheduler.submit("#fuelrats", "three")
+    await scheduler.join()
+
+    assert sink.lines == [("#ratchat", "one"), ("#fuelrats", "three"), ("#ratchat", "two")]
+    assert scheduler.throttled
+
+
+@pytest.mark.asyncio
+async def test_coalesce_backlog():
+    """
+    Verifies lines backed up beyond what the buckets permit get coalesced.
+    """
+    sink = _Sink()
+    scheduler = _scheduler(sink, target_burst=1, target_rate=50.0, coalesce=True, separator=" | ")
+
+    scheduler.submit("#ratchat", "one\ntwo\nthree")
+    await scheduler.join()
+
+    assert sink.lines == [("#ratchat", "one | two | three")]
+    assert scheduler.coalesced == 2
+
+
+@pytest.mark.asyncio
+async def test_no_coalescing_within_budget():
+    """
+    Verifies lines are left alone when they can be sent right away.
+    """
+    sink = _Sink()
+    scheduler = _scheduler(sink, coalesce=True)
+
+    scheduler.submit("#ratchat", "one\ntwo\nthree")
+    await scheduler.join()
+
+    assert [line for _, line in sink.lines] == ["one", "two", "three"]
+    assert not scheduler.coalesced
+
+
+@pytest.mark.asyncio
+async def test_signals_never_coalesce():
+    """
+    Verifies signal lines are always sent on their own.
+    """
+    sink = _Sink()
+    scheduler = _scheduler(sink, target_burst=1, target_rate=50.0, coalesce=True)
+
+    scheduler.submit("#fuelrats", "RATSIGNAL one\nRATSIGNAL two", Priority.SIGNAL)
+    await scheduler.join()
+
+    assert [line for _, line in sink.lines] == ["RATSIGNAL one", "RATSIGNAL two"]
+
+
+@pytest.mark.asyncio
+async def test_send_failure_keeps_sending():
+    """
+    Verifies a failing line doesn't stop the sender.
+    """
+    sink = _Sink(fail_on="boom")
+    scheduler = _scheduler(sink)
+
+    scheduler.submit("#ratchat", "boom\nafter")
+    await scheduler.join()
+
+    assert sink.lines == [("#ratchat", "after")]
+    assert not any(scheduler.depths.values())
+
+
+@pytest.mark.asyncio
+async def test_reply_priority(bot_fx, context_fx):
+    """
+    Verifies Context.reply hands its priority on to the bot.
+    """
+    await context_fx.reply("RATSIGNAL", priority=Priority.SIGNAL)
+    await context_fx.reply("regular")
+
+    assert [item["priority"] for item in bot_fx.sent_messages] == [Priority.SIGNAL, Priority.REPLY]
+
+
+@pytest.mark.parametrize("section", [
+    {"rate": 0},
+    {"target_burst": 1.5},
+    {"coalesce": "yes"},
+    {"separator": 3},
+])
+def test_validate_config_rejects(section):
+    """
+    Verifies invalid outbound configuration is rejected.
+    """
+    with pytest.raises(ValueError):
+        scheduler_module.validate_config({"outbound": section})
+
+
+def test_token_bucket_stale_timestamp():
+    """Verifies a timestamp taken before the bucket was created doesn't cost it a token"""
+    now = scheduler_module.monotonic()
+    bucket = TokenBucket(1.0, 1)
+
+    assert not bucket.delay(now)
+    bucket.take(now)
+    assert bucket.delay(now)
@@ -13,6 +13,7 @@ See LICENSE.md
 This module is built on top of the Pydle system.
 
 """
+import copy
 from typing import Set
 
 import pytest
@@ -20,7 +21,9 @@ import pytest
 import src.packages.commands.rat_command as Commands
 from src.packages.context import Context
 from src.packages.permissions import permissions
-from src.packages.permissions import require_permission, require_channel, require_dm, Permission
+from src.packages.permissions import require_permission, require_channel, require_dm, Permission, \
+    guards_of
+from src.packages.permissions.resolver import VhostResolver
 
 
 
@@ -109,6 +112,15 @@ class TestPermissions(object):
         await Commands.trigger(context)
         assert restricted_command_fx.was_called_once
 
+    @pytest.mark.asyncio
+    async def test_restricted_command_personal_vhost(self, bot_fx, restricted_command_fx,
+                                                     monkeypatch):
+        data = dict(bot_fx.users["some_ov"], hostname="some_ov.overseer.fuelrats.com")
+        monkeypatch.setitem(bot_fx.users, "some_ov", data)
+        context = await Context.from_message(bot_fx, "#somechannel", "some_ov", "!restricted")
+        await Commands.trigger(context)
+        assert restricted_command_fx.was_called_once
+
     @pytest.mark.asyncio
     async def test_require_channel_valid(self, bot_fx, context_channel_fx):
         """Verifies @require_channel does not stop commands invoked in a channel"""
@@ -212,6 +224,54 @@ class TestPermissions(object):
         retn = await potato(context_channel_fx)
         assert retn != "oh noes!"
 
+    def test_stacked_guards_single_wrapper(self):
+        """Verifies stacked guards share one wrapper, exposing their requirements"""
+
+        async def potato(context: Context):
+            return "hot potato!"
+
+        guarded = require_channel("in a channel, please")(
+            require_permission(permissions.RAT)(require_permission(permissions.OVERSEER)(potato)))
+        guards = guards_of(guarded)
+
+        assert guarded.__wrapped__ is potato
+        assert guards is guards_of(potato)
+        assert guards.target is potato
+        assert guards.permission is permissions.OVERSEER
+        assert guards.channel is True
+        assert guards.channel_message == "in a channel, please"
+
+    @pytest.mark.asyncio
+    async def test_guards_check(self, bot_fx, context_channel_fx, context_pm_fx):
+        @require_channel("channel only")
+        @require_permission(permissions.TECHRAT, "techrats only")
+        async def potato(context: Context):
+            pass
+
+        guards = guards_of(potato)
+        assert guards.check(context_pm_fx) == "channel only"
+        assert guards.check(context_channel_fx) == "techrats only"
+        admin = await Context.from_message(bot_fx, "#unit_test", "some_admin", "!potato")
+        assert guards.check(admin) is None
+
+    def test_require_permission_garbage(self):
+        with pytest.raises(TypeError):
+            require_permission([permissions.RAT])
+
+    @pytest.mark.asyncio
+    async def test_guarded_after_registration(self, bot_fx, async_callable_fx):
+        """Verifies guards applied on top of the command decorator are still enforced"""
+        Commands.command("late_guarded")(async_callable_fx)
+        require_permission(permissions.OVERSEER)(async_callable_fx)
+        try:
+            context = await Context.from_message(bot_fx, "#unit_test", "some_recruit",
+                                                 "!late_guarded")
+            await Commands.trigger(context)
+            assert not async_callable_fx.was_called
+            assert Commands.get_guards("LATE_GUARDED").permission is permissions.OVERSEER
+        finally:
+            del Commands._registered_commands["late_guarded"]
+
     @pytest.mark.parametrize("vhost",
                              [{"unittest.fuelrats.com"}, {"potato.fuelrats.com"}, {"i.see.all"}])
     def test_permission_registers_vhost(self, vhost, monkeypatch):
@@ -320,3 +380,64 @@ class TestPermissions(object):
     def test_validate_config_bad_data(self, data):
         with pytest.raises(ValueError):
             permissions.validate_config({"permissions": data})
+
+    @pytest.mark.parametrize("vhost", ["*.rat.*.com", "rat.*", "*"])
+    def test_validate_config_bad_wildcard(self, vhost, configuration_fx):
+        data = copy.deepcopy(configuration_fx["permissions"])
+        data["rat"]["vhosts"] = [vhost]
+
+        with pytest.raises(ValueError):
+            permissions.validate_config({"permissions": data})
+
+    @pytest.mark.parametrize("hostname, expected", [
+        ("rat.fuelrats.com", "RAT"),
+        ("SomeRat.Rat.FuelRats.com", "RAT"),
+        ("some.nested.overseer.fuelrats.com", "OVERSEER"),
+        ("i.see.all", "ADMIN"),
+        ("sub.i.see.all", None),
+        ("fuelrats.com", None),
+        ("rat.fuelrats.com.evil.net", None),
+        (None, None),
+    ])
+    def test_get_permission(self, hostname, expected):
+        expected = getattr(permissions, expected) if expected else None
+        assert permissions.get_permission(hostname) is expected
+
+    def test_rehash_swaps_resolver(self, configuration_fx):
+        data = copy.deepcopy(configuration_fx)
+        data["permissions"]["overseer"]["vhosts"] = ["*.overseer.example.com"]
+        try:
+            permissions.rehash_handler(data)
+            assert permissions._resolver is not None
+            assert permissions.get_permission("some.overseer.example.com") is permissions.OVERSEER
+            assert permissions.get_permission("overseer.fuelrats.com") is None
+            assert permissions.get_permission("rat.fuelrats.com") is permissions.RAT
+        finally:
+            permissions.rehash_handler(configuration_fx)
+
+        assert permissions.get_permission("overseer.fuelrats.com") is permissions.OVERSEER
+
+    def test_rehash_moves_vhost(self, configuration_fx):
+        """Verifies a vhost moved to another level resolves to the level it moved to"""
+        data = copy.deepcopy(configuration_fx)
+        moved = data["permissions"]["rat"]["vhosts"].pop(0)
+        data["permissions"]["recruit"]["vhosts"].append(moved)
+        try:
+            permissions.rehash_handler(data)
+            assert permissions.get_permission(moved) is permissions.RECRUIT
+            assert moved in permissions.RECRUIT.vhosts
+            assert moved not in permissions.RAT.vhosts
+        finally:
+            permissions.rehash_handler(configuration_fx)
+
+        assert permissions.get_permission(moved) is permissions.RAT
+
+    def test_resolver_precedence(self):
+        resolver = VhostResolver({"*.fuelrats.com": "any", "*.rat.fuelrats.com": "rat",
+                                  "special.rat.fuelrats.com": "special"})
+
+        assert resolver.resolve("x.fuelrats.com") == "any"
+        assert resolver.resolve("rat.fuelrats.com") == "any"
+        assert resolver.resolve("x.rat.fuelrats.com") == "rat"
+        assert resolver.resolve("special.rat.fuelrats.com") == "special"
+        assert resolver.resolve("x.special.rat.fuelrats.com") == "rat"
@@ -0,0 +1,78 @@
+"""
+test_prefilter.py - tests for the inbound line pre-classifier
+
+Copyright (c) 2020 The Fuel Rats Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE
+"""
+import re
+
+import pytest
+
+from src.packages.commands import PreFilter, LineKind
+from src.packages.context import Context
+from src.packages.rules import rules
+from src.packages.rules._rule_index import RuleIndex
+
+pytestmark = [pytest.mark.unit, pytest.mark.prefilter]
+
+
+@pytest.fixture
+def prefixless_rule_fx(monkeypatch, async_callable_fx):
+    """
+    Replaces the prefixless rule index with one only knowing about a single drillsignal rule.
+    """
+    drillsignal = rules.Rule(re.compile(r"\bdrillsignal\b", re.IGNORECASE), async_callable_fx,
+                             True, False)
+    monkeypatch.setattr(rules, "_prefixless_index", RuleIndex([drillsignal]))
+    return drillsignal
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("", LineKind.EMPTY),
+    ("!assign 3 SomeRat", LineKind.PREFIXED),
+    ("!", LineKind.PREFIXED),
+    ("drillsignal Sol, PC, O2 OK", LineKind.PREFIXLESS),
+    ("DRILLSIGNAL", LineKind.PREFIXLESS),
+    ("Incoming Client: SomeClient - System: Fuelum", LineKind.PREFIXLESS),
+    ("lul, 0mg haxor", LineKind.CHATTER),
+    ("wr+ #3", LineKind.CHATTER),
+    ("the drillsignal is elsewhere", LineKind.CHATTER),
+])
+def test_classify(prefixless_rule_fx, message: str, expected: LineKind):
+    """
+    Verifies lines get classified as expected.
+    """
+    assert PreFilter().classify(message) is expected
+
+
+def test_counters(prefixless_rule_fx):
+    """
+    Verifies the hit and drop counters account for every classified line.
+    """
+    prefilter = PreFilter()
+    for message in ("!ping", "drillsignal", "hello", "", "how are you"):
+        prefilter.classify(message)
+
+    assert prefilter.hits == 2
+    assert prefilter.drops == 3
+    assert prefilter.counters == {LineKind.PREFIXED: 1, LineKind.PREFIXLESS: 1,
+                                  LineKind.CHATTER: 2, LineKind.EMPTY: 1}
+
+
+@pytest.mark.asyncio
+async def test_chatter_skips_context(bot_fx, prefixless_rule_fx, monkeypatch, async_callable_fx):
+    """
+    Verifies no context gets built for chatter, whilst the message history is still maintained.
+    """
+    monkeypatch.setattr(Context, "from_message", async_callable_fx)
+
+    await bot_fx.on_message("#unit_test", "unit_test", "just some chatter")
+
+    assert not async_callable_fx.was_called
+    assert bot_fx.last_user_message["unit_test"] == "just some chatter"
+    assert bot_fx.get_last_message("#unit_test", "unit_test") == "just some chatter"
+    assert bot_fx.prefilter.drops == 1
@@ -20,6 +20,7 @@ import pytest
 import src.packages.commands.rat_command as Commands
 from src.packages.commands.rat_command import NameCollisionException
 from src.packages.context.context import Context
+from src.packages.fact_manager import Fact, FactManager
 
 
 
@@ -147,3 +148,29 @@ class TestRatCommand(object):
         await Commands.trigger(ctx)
 
         del Commands._registered_commands[name.casefold()]
+
+    @pytest.mark.asyncio
+    async def test_handle_fact_many(self, bot_fx):
+        """
+        Verifies several facts in one message are fetched at once, and replied to in order.
+        """
+        requested = []
+
+        class FakeFactManager(FactManager):
+            def __init__(self):  # pylint: disable=super-init-not-called
+                pass
+
+            async def find_many(self, requests, admit=None):
+                requested.append(requests)
+                return [Fact(name=name, lang='en', message=f"{name} fact", aliases=[],
+                             author='Shatt', edited=None, editedby='Shatt')
+                        if name != 'nope' else None for name, _ in requests]
+
+        bot_fx.fact_manager = FakeFactManager()
+        ctx = await Context.from_message(bot_fx, "#unit_test", "unit_test",
+                                         "!prep !nope !pcquit-DE Some_Client !notafact")
+
+        assert await Commands.handle_fact(ctx)
+        assert requested == [[('prep', 'en'), ('nope', 'en'), ('pcquit', 'de')]]
+        assert [sent['message'] for sent in bot_fx.sent_messages] == [
+            "Some_Client !notafact : prep fact", "Some_Client !notafact : pcquit fact"]
@@ -0,0 +1,147 @@
+"""
+test_ratelimit.py - tests for the per-caller command rate limiter
+
+Copyright (c) 2020 The Fuel Rats Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE
+"""
+import pytest
+
+from src.packages.commands import rat_command
+from src.packages.context import Context
+from src.packages.fact_manager import Fact, FactManager
+from src.packages.ratelimit import RateLimiter, Cost, expensive, cost_of
+from src.packages.ratelimit import ratelimit as ratelimit_module
+
+pytestmark = [pytest.mark.unit, pytest.mark.ratelimit]
+
+
+def _limiter(**kwargs) -> RateLimiter:
+    options = dict(enabled=True, rate=0.001, burst=3, expensive_rate=0.001, expensive_burst=1,
+                   exempt="overseer")
+    options.update(kwargs)
+    return RateLimiter(**options)
+
+
+def test_budget_exhausted(bot_fx):
+    limiter = _limiter()
+    user = bot_fx.get_user("unit_test")
+
+    assert [limiter.allow(user) for _ in range(5)] == [True, True, True, False, False]
+    assert limiter.dropped == {Cost.CHEAP: 2}
+
+
+def test_budgets_separate(bot_fx):
+    limiter = _limiter()
+    user = bot_fx.get_user("unit_test")
+
+    assert limiter.allow(user, Cost.EXPENSIVE)
+    assert not limiter.allow(user, Cost.EXPENSIVE)
+    assert limiter.allow(user, Cost.CHEAP)
+    assert limiter.dropped == {Cost.EXPENSIVE: 1}
+
+
+def test_callers_separate(bot_fx):
+    limiter = _limiter()
+
+    assert limiter.allow(bot_fx.get_user("unit_test"), Cost.EXPENSIVE)
+    assert limiter.allow(bot_fx.get_user("unit_test[bot]"), Cost.EXPENSIVE)
+    assert limiter.tracked == 2
+
+
+def test_permission_raises_budget(bot_fx):
+    """Verifies a recruit (level 0) gets the base budget, a rat (level 1) twice of it"""
+    limiter = _limiter(exempt="administrator")
+    recruit = bot_fx.get_user("some_recruit")
+    overseer = bot_fx.get_user("some_ov")
+
+    assert sum(limiter.allow(recruit) for _ in range(10)) == 3
+    assert sum(limiter.allow(overseer) for _ in range(20)) == 9
+
+
+@pytest.mark.parametrize("nickname", ["some_ov", "some_admin"])
+def test_exempt(bot_fx, nickname: str):
+    limiter = _limiter()
+    user = bot_fx.get_user(nickname)
+
+    assert all(limiter.allow(user, Cost.EXPENSIVE) for _ in range(50))
+    assert not limiter.dropped
+    assert not limiter.tracked
+
+
+def test_disabled(bot_fx):
+    limiter = _limiter(enabled=False)
+    user = bot_fx.get_user("unit_test")
+
+    assert all(limiter.allow(user) for _ in range(50))
+
+
+def test_expensive():
+    async def cheap(context):
+        pass
+
+    @expensive
+    async def costly(context):
+        pass
+
+    assert cost_of(cheap) is Cost.CHEAP
+    assert cost_of(costly) is Cost.EXPENSIVE
+
+
+@pytest.mark.asyncio
+async def test_trigger_drops_quietly(bot_fx, async_callable_fx, monkeypatch):
+    monkeypatch.setattr(bot_fx, "_rate_limiter", _limiter(burst=1))
+    rat_command.command("limited")(async_callable_fx)
+    try:
+        for _ in range(3):
+            ctx = await Context.from_message(bot_fx, "#unit_test", "unit_test", "!limited")
+            await rat_command.trigger(ctx)
+    finally:
+        del rat_command._registered_commands["limited"]
+
+    assert len(async_callable_fx.calls) == 1
+    assert not bot_fx.sent_messages
+    assert bot_fx.rate_limiter.dropped == {Cost.CHEAP: 2}
+
+
+@pytest.mark.asyncio
+async def test_facts_expensive_only_from_database(bot_fx, monkeypatch):
+    """
+    Verifies facts answered from memory are cheap, only those fetched pay the expensive budget.
+    """
+    monkeypatch.setattr(bot_fx, "_rate_limiter", _limiter(burst=10))
+    fetched = []
+
+    class FakeFactManager(FactManager):
+        def __init__(self):  # pylint: disable=super-init-not-called
+            pass
+
+        async def find_many(self, requests, admit=None):
+            name = requests[0][0]
+            if name.startswith("cached") or admit():
+                fetched.append(name)
+                return [Fact(name=name, lang='en', message=f"{name} fact", aliases=[],
+                             author='Shatt', edited=None, editedby='Shatt')]
+            return None
+
+    monkeypatch.setattr(bot_fx, "fact_manager", FakeFactManager(), raising=False)
+    for word in ("cached1", "cached2", "cached3", "fetched1", "fetched2", "cached4"):
+        ctx = await Context.from_message(bot_fx, "#unit_test", "unit_test", f"!{word}")
+        await rat_command.trigger(ctx)
+
+    assert fetched == ["cached1", "cached2", "cached3", "fetched1", "cached4"]
+    assert bot_fx.rate_limiter.dropped == {Cost.EXPENSIVE: 1}
+
+
+@pytest.mark.parametrize("section", [
+    {"enabled": "yes"},
+    {"rate": 0},
+    {"expensive_burst": 1.5},
+    {"exempt": "potato"},
+])
+def test_validate_config(section):
+    with pytest.raises(ValueError):
+        ratelimit_module.validate_config({"ratelimit": section})
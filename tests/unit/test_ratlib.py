@@ -50,7 +50,12 @@ SANITIZE_TEST_LIST = [
     ('123456,Banana', ',Banana'),
     ('FF0000Red 00fF00Green 0000ffBlue', 'Red Green Blue'),
     ('no 4ite56AdcBms2, fo\tx onlyFF66AA, final des\tt555555ination',
-     'no items, fox only, final destination')
+     'no items, fox only, final destination'),
+    ('fr+  #3', 'fr+ #3'),
+    (' leading and trailing ', 'leading and trailing'),
+    ('non\xa0breaking space', 'non breaking space'),
+    ('multiple\nlines', 'multiple lines'),
+    ('', ''),
 ]
 
 
@@ -70,6 +75,14 @@ def test_sanitize(input_message, expected_message):
     assert ratlib.sanitize(input_message) == expected_message
 
 
+def test_sanitize_fast_path():
+    """
+    Verifies plain text is handed back as is, without being rebuilt.
+    """
+    message = "!assign 3 SomeRat AnotherRat"
+    assert ratlib.sanitize(message) is message
+
+
 def test_singleton_direct_inheritance():
     """
     Verifies the Singleton class behaves as expected for classes directly inheriting
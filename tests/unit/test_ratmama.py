@@ -15,6 +15,7 @@ import pytest
 
 import src.packages.ratmama as ratmama
 from src.packages.context.context import Context
+from src.packages.outbound import Priority
 from src.packages.rescue.rat_rescue import Platforms
 
 pytestmark = [pytest.mark.unit, pytest.mark.ratsignal_parse, pytest.mark.asyncio]
@@ -96,7 +97,8 @@ async def test_announcer_reconnect(bot_fx, async_callable_fx, monkeypatch):
     rescue = context.bot.board["SomeClient"]
     index = rescue.board_index
 
-    assert async_callable_fx.was_called_with(f"SomeClient has reconnected! Case #{index}")
+    assert async_callable_fx.was_called_with(f"SomeClient has reconnected! Case #{index}",
+                                             priority=Priority.SIGNAL)
 
 
 async def test_announcer_reconnect_with_changes(bot_fx, async_callable_fx, monkeypatch):
@@ -122,7 +124,8 @@ async def test_announcer_reconnect_with_changes(bot_fx, async_callable_fx, monke
     await ratmama.handle_ratmama_announcement(context2)
 
     assert async_callable_fx.was_called_with("System changed! Platform changed!"
-                                             " O2 Status changed, it is now CODE RED!")
+                                             " O2 Status changed, it is now CODE RED!",
+                                             priority=Priority.SIGNAL)
 
 
 async def test_announce_from_invalid_user(bot_fx, async_callable_fx, monkeypatch):
@@ -4,6 +4,7 @@ import pytest
 
 from src.packages.context.context import Context
 from src.packages.commands import trigger
+from src.packages.rules import DispatchStats, set_stats_hook
 from src.packages.rules.rules import rule, clear_rules, RuleNotPresentException, DuplicateRuleException, \
     get_rule
 from tests.fixtures.mock_callables import AsyncCallableMock, InstanceOf, CallableMock
@@ -190,3 +191,116 @@ async def test_get_rule(prefixless: bool, pass_match: bool):
         assert isinstance(extra_args[0], Match)
     else:
         assert () == extra_args
+
+
+@pytest.fixture
+def stats_hook_fx(callable_fx: CallableMock):
+    """Installs a callable mock as the rules stats hook for the duration of the test."""
+    set_stats_hook(callable_fx)
+    yield callable_fx
+    set_stats_hook(None)
+
+
+@pytest.mark.parametrize("message,expected", [
+    ("gaah", 0),
+    ("baah", 1),
+    ("gaah there", 0),
+    ("baah baah", 1),
+    ("baah blacksheep", 2),
+])
+def test_get_rule_order_across_targets(message: str, expected: int):
+    """
+    Ensures the dispatch index honours registration order between word and full-message rules.
+    """
+    underlying = [object(), object(), object()]
+    rule("gaah")(underlying[0])
+    rule("(b|g)aah( baah)?$", full_message=True)(underlying[1])
+    rule("baah", full_message=True)(underlying[2])
+
+    words = message.split()
+    words_eol = [" ".join(words[i:]) for i in range(len(words))]
+    fun, _ = get_rule(words, words_eol, prefixless=False)
+
+    assert fun is underlying[expected]
+
+
+@pytest.mark.parametrize("message,expected", [
+    ("abab", 1),
+    ("abcd", 0),
+    ("ABAB", 1),
+])
+def test_get_rule_back_reference(message: str, expected: int):
+    """
+    Ensures rules that can't be folded into the combined automaton still keep their place.
+    """
+    underlying = [object(), object(), object()]
+    rule("abcd")(underlying[0])
+    rule("(ab)\\1")(underlying[1])
+    rule("ab")(underlying[2])
+
+    fun, extra_args = get_rule([message], [message], prefixless=False)
+
+    assert fun is underlying[expected]
+    assert () == extra_args
+
+
+@pytest.mark.parametrize("message", ["Vaah", "vaah", "ſaah", "7aah"])
+def test_get_rule_wildcard_bucket(message: str):
+    """
+    Ensures rules without a literal prefix are considered for every message.
+    """
+    underlying = object()
+    rule("vo")(object())
+    rule(".aah")(underlying)
+
+    fun, _ = get_rule([message], [message], prefixless=False)
+
+    assert fun is underlying
+
+
+def test_get_rule_pass_match_own_groups():
+    """
+    Ensures the match object handed to a rule only carries that rule's groups.
+    """
+    rule("her(lo)")(object())
+    rule("h(e)(y)", pass_match=True)(object())
+
+    _, extra_args = get_rule(["hey"], ["hey"], prefixless=False)
+
+    assert extra_args[0].groups() == ("e", "y")
+
+
+def test_get_rule_stats_flat(stats_hook_fx: CallableMock):
+    """
+    Ensures the number of evaluated patterns does not grow with the number of rules.
+    """
+    for index in range(100):
+        rule(f"word{index}$")(object())
+        rule(f"full message {index}$", full_message=True)(object())
+    wanted = rule("x(a|b)")(object())
+
+    fun, _ = get_rule(["xa"], ["xa"], prefixless=False)
+
+    assert fun is wanted.underlying
+    assert stats_hook_fx.was_called_once
+    stats = stats_hook_fx.calls[0].args[0]
+    assert stats.candidates == 1
+    assert stats.evaluated == 1
+    assert stats.rule == wanted
+
+    get_rule(["word42"], ["word42 and more"], prefixless=False)
+    stats = stats_hook_fx.calls[1].args[0]
+    assert stats.candidates == 100
+    assert stats.evaluated == 1
+
+
+def test_get_rule_stats_no_candidates(stats_hook_fx: CallableMock):
+    """
+    Ensures messages without any compatible rule skip regex evaluation entirely.
+    """
+    rule("drillsignal", prefixless=True)(object())
+
+    fun, _ = get_rule(["hello"], ["hello there"], prefixless=True)
+
+    assert fun is None
+    assert stats_hook_fx.calls[0].args[0] == DispatchStats(True, 0, 0, None)
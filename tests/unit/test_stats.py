@@ -0,0 +1,242 @@
+"""
+test_stats.py - tests for the invocation statistics
+
+Copyright (c) 2020 The Fuel Rats Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE
+"""
+import asyncio
+import time
+
+import pytest
+
+from src.commands import administration
+from src.packages.commands import rat_command, stats
+from src.packages.context import Context
+from src.packages.database import metrics
+
+pytestmark = [pytest.mark.unit, pytest.mark.stats]
+
+
+@pytest.fixture
+def stats_fx(monkeypatch):
+    """
+    Isolates the recorded statistics from those of other tests
+    """
+    monkeypatch.setattr(stats, "_stats", {})
+    return stats
+
+
+def test_histogram_buckets():
+    """
+    Verifies durations land in the bucket of their upper bound, and beyond the last in overflow.
+    """
+    histogram = stats.Histogram()
+    for value in (0.001, 0.0011, 42.0):
+        histogram.observe(value)
+
+    assert histogram.counts[0] == 1
+    assert histogram.counts[1] == 1
+    assert histogram.counts[-1] == 1
+    assert histogram.count == 3
+    assert histogram.quantile(1.0) == 42.0
+
+
+def test_histogram_quantile_capped():
+    """
+    Verifies quantiles never exceed the largest recorded duration.
+    """
+    histogram = stats.Histogram()
+    for value in (0.011, 0.012, 0.015):
+        histogram.observe(value)
+    assert histogram.quantile(0.5) == histogram.quantile(0.99) == 0.015
+
+
+@pytest.mark.asyncio
+async def test_stopwatch_separates_awaited_time():
+    """
+    Verifies time spent awaiting isn't counted as busy, whilst time spent executing is.
+    """
+
+    async def sleepy():
+        await asyncio.sleep(0.05)
+        return "slept"
+
+    async def busy():
+        time.sleep(0.05)
+        return "worked"
+
+    stopwatch = stats.Stopwatch()
+    assert await stopwatch.run(sleepy()) == "slept"
+    assert stopwatch.busy < 0.025
+
+    stopwatch = stats.Stopwatch()
+    assert await stopwatch.run(busy()) == "worked"
+    assert stopwatch.busy >= 0.05
+
+
+@pytest.mark.asyncio
+async def test_stopwatch_propagates_cancellation():
+    """
+    Verifies cancelling the measuring task cancels the measured coroutine.
+    """
+    cancelled = asyncio.Event()
+
+    async def forever():
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    task = asyncio.ensure_future(stats.Stopwatch().run(forever()))
+    await asyncio.sleep(0)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert cancelled.is_set()
+
+
+@pytest.mark.asyncio
+async def test_trigger_records_commands(stats_fx, bot_fx, monkeypatch):
+    """
+    Verifies trigger records commands under their primary alias, including failures.
+    """
+    monkeypatch.setattr(rat_command, "_registered_commands", {})
+    monkeypatch.setattr(rat_command, "_command_names", {})
+
+    @rat_command.command("stats_ok", "stats_alias")
+    async def cmd_ok(ctx):
+        await asyncio.sleep(0)
+
+    @rat_command.command("stats_boom")
+    async def cmd_boom(ctx):
+        raise RuntimeError("expected during testing")
+
+    await rat_command.trigger(await Context.from_message(bot_fx, "#unit_test", "unit_test",
+                                                         "!stats_alias"))
+    with pytest.raises(RuntimeError):
+        await rat_command.trigger(await Context.from_message(bot_fx, "#unit_test", "unit_test",
+                                                             "!stats_boom"))
+
+    recorded = stats_fx.snapshot()
+    assert recorded[(stats.Kind.COMMAND, "stats_ok")].outcomes[stats.Outcome.OK] == 1
+    assert recorded[(stats.Kind.COMMAND, "stats_boom")].outcomes[stats.Outcome.ERROR] == 1
+
+
+@pytest.mark.asyncio
+async def test_trigger_records_fact_miss(stats_fx, bot_fx, monkeypatch, async_callable_fx):
+    """
+    Verifies missing facts are recorded as misses, under a single name.
+    """
+    monkeypatch.setattr(rat_command, "handle_fact", async_callable_fx)
+
+    await rat_command.trigger(await Context.from_message(bot_fx, "#unit_test", "unit_test",
+                                                         "!nosuchfact"))
+
+    recorded = stats_fx.snapshot()
+    assert list(recorded) == [(stats.Kind.FACT, "fact")]
+    assert recorded[(stats.Kind.FACT, "fact")].outcomes[stats.Outcome.MISS] == 1
+
+
+def test_render_prometheus(stats_fx):
+    """
+    Verifies the exposition format holds cumulative buckets, sums, counts and outcomes.
+    """
+    stats_fx.record(stats.Kind.RULE, 'we"ird', 0.2, 0.1, stats.Outcome.OK)
+    stats_fx.record(stats.Kind.RULE, 'we"ird', 20.0, 19.0, stats.Outcome.ERROR)
+    rendered = stats_fx.render_prometheus()
+
+    labels = 'kind="rule",name="we\\"ird"'
+    assert f'mecha_invocation_seconds_bucket{{{labels},le="0.25"}} 1' in rendered
+    assert f'mecha_invocation_seconds_bucket{{{labels},le="+Inf"}} 2' in rendered
+    assert f"mecha_invocation_seconds_count{{{labels}}} 2" in rendered
+    assert f"mecha_invocation_awaited_seconds_sum{{{labels}}} 19.1" in rendered
+    assert f'mecha_invocations_total{{{labels},outcome="error"}} 1' in rendered
+
+
+def test_write_prometheus(stats_fx, tmp_path):
+    """
+    Verifies the statistics file gets written in place.
+    """
+    stats_fx.record(stats.Kind.COMMAND, "ping", 0.01, 0.0, stats.Outcome.OK)
+    path = tmp_path / "mecha.prom"
+
+    stats_fx.write_prometheus(str(path))
+
+    assert path.read_text() == stats_fx.render_prometheus()
+    assert not (tmp_path / "mecha.prom.tmp").exists()
+
+
+@pytest.mark.asyncio
+async def test_stats_command(stats_fx, bot_fx):
+    """
+    Verifies !stats summarizes the recorded statistics.
+    """
+    stats_fx.record(stats.Kind.COMMAND, "quote", 0.02, 0.015, stats.Outcome.OK)
+    ctx = await Context.from_message(bot_fx, "#unit_test", "some_admin", "!stats quote")
+
+    await administration.cmd_stats(ctx)
+
+    assert bot_fx.sent_messages[-1]["message"].startswith("command quote: n=1 p50=20ms")
+
+
+@pytest.mark.asyncio
+async def test_stats_command_denied(stats_fx, bot_fx):
+    """
+    Verifies !stats is restricted to techrats.
+    """
+    ctx = await Context.from_message(bot_fx, "#unit_test", "some_recruit", "!stats")
+
+    await administration.cmd_stats(ctx)
+
+    assert "command" not in bot_fx.sent_messages[-1]["message"]
+
+
+@pytest.fixture
+def database_metrics_fx(monkeypatch):
+    """
+    Enables the database statistics, isolated from those of other tests
+    """
+    monkeypatch.setitem(metrics._config, "database", True)
+    monkeypatch.setattr(metrics, "_statements", {})
+    monkeypatch.setattr(metrics, "_pools", {})
+    return metrics
+
+
+@pytest.mark.asyncio
+async def test_stats_command_database(database_metrics_fx, bot_fx):
+    """
+    Verifies !stats database summarizes the database statistics.
+    """
+    database_metrics_fx.record_statement("facts", "fact_find", 0.002, 1)
+
+    ctx = await Context.from_message(bot_fx, "#unit_test", "some_admin", "!stats database")
+    await administration.cmd_stats(ctx)
+
+    assert bot_fx.sent_messages[-1]["message"] == \
+        "statement facts.fact_find: n=1 p50=2ms p95=2ms max=2ms rows=1"
+
+
+@pytest.mark.asyncio
+async def test_stats_command_database_disabled(bot_fx):
+    ctx = await Context.from_message(bot_fx, "#unit_test", "some_admin", "!stats database")
+    await administration.cmd_stats(ctx)
+
+    assert bot_fx.sent_messages[-1]["message"] == "database statistics are disabled."
+
+
+def test_render_prometheus_database(stats_fx, database_metrics_fx):
+    """
+    Verifies database statistics are rendered alongside, once enabled.
+    """
+    database_metrics_fx.record_error("facts", ValueError())
+    database_metrics_fx.record_statement("facts", "fact_find", 0.002, 3)
+
+    rendered = stats_fx.render_prometheus().splitlines()
+
+    assert 'mecha_db_errors_total{subsystem="facts",error="ValueError"} 1' in rendered
+    assert 'mecha_db_statement_rows_total{subsystem="facts",name="fact_find"} 3' in rendered
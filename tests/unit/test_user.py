@@ -165,3 +165,55 @@ async def test_user_eq(data: dict, monkeypatch, bot_fx):
 @pytest.mark.regressions
 def test_hash(user_fx):
     assert hash(user_fx)
+
+
+def test_user_cache_shared(bot_fx):
+    """
+    Verifies every lookup of an unchanged user shares a single instance
+    """
+    first = bot_fx.get_user("some_recruit")
+
+    assert first == User(**bot_fx.users["some_recruit"])
+    assert bot_fx.get_user("SOME_RECRUIT") is first
+    assert bot_fx.get_user("snafu") is None
+
+
+def test_user_cache_sync(bot_fx):
+    """
+    Verifies pydle syncing a user's data forgets its cached User
+    """
+    stale = bot_fx.get_user("some_recruit")
+    bot_fx._sync_user("some_recruit", {"hostname": "rat.fuelrats.com"})
+
+    fresh = bot_fx.get_user("some_recruit")
+    assert fresh is not stale
+    assert fresh.hostname == "rat.fuelrats.com"
+
+
+def test_user_cache_rename(bot_fx):
+    stale = bot_fx.get_user("some_recruit")
+    bot_fx._rename_user("some_recruit", "some_rat")
+
+    assert bot_fx.get_user("some_recruit") is None
+    renamed = bot_fx.get_user("some_rat")
+    assert renamed.nickname == "some_rat"
+    assert renamed.hostname == stale.hostname
+
+
+def test_user_cache_destroy(bot_fx):
+    bot_fx.get_user("some_recruit")
+    bot_fx._destroy_user("some_recruit")
+
+    assert bot_fx.get_user("some_recruit") is None
+    assert bot_fx.cached_users == 0
+
+
+def test_user_cache_replaced_data(bot_fx, monkeypatch):
+    """
+    Verifies data replaced behind pydle's back isn't masked by the cache
+    """
+    bot_fx.get_user("some_recruit")
+    data = dict(bot_fx.users["some_recruit"], hostname="admin.fuelrats.com")
+    monkeypatch.setitem(bot_fx.users, "some_recruit", data)
+
+    assert bot_fx.get_user("some_recruit").hostname == "admin.fuelrats.com"
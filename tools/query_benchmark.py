@@ -0,0 +1,143 @@
+"""
+query_benchmark.py - Event loop lag under concurrent fact queries
+
+Fires batches of concurrent fact lookups at the configured database while a ticker task measures
+how late the event loop wakes it up. Each batch is run twice, once through
+`DatabaseManager.query` and once the way queries used to be run, blocking right on the event loop.
+`--latency` adds a server side delay to every statement, standing in for a distant database.
+
+This script is STANDALONE and is not intended to be invoked by mecha.
+Run it from the repository root, with the testing database set up:
+
+    python tools/query_benchmark.py --concurrency 1 5 10 20 --latency 0.02 --table fact
+
+Lookups beyond the 10 pooled connections wait for one to be released, batches larger than the
+pool take longer in total while the loop lag stays flat.
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import argparse
+import asyncio
+import pathlib
+import sys
+from time import perf_counter
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+# pylint: disable=wrong-import-position
+from loguru import logger  # noqa: E402
+from psycopg2 import sql  # noqa: E402
+
+from src.config import PLUGIN_MANAGER  # noqa: E402
+from src.config._parser import load_config  # noqa: E402
+from src.packages.database import DatabaseManager  # noqa: E402
+
+TICK = 0.005
+"""seconds the ticker sleeps between measurements"""
+
+
+def _statement(table: str, latency: float) -> sql.SQL:
+    # the table comes from our own configuration, as it does for FactManager
+    return sql.SQL(f"SELECT name, lang, message, pg_sleep({float(latency)}) FROM {table} "
+                   f"WHERE name=%s AND lang=%s")
+
+
+def _blocking_query(database: DatabaseManager, query: sql.SQL, values: tuple):
+    # pylint: disable=protected-access
+    connection = database._dbpool.getconn()
+    try:
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute(query, values)
+            return cursor.fetchall()
+    finally:
+        database._dbpool.putconn(connection)
+
+
+async def _measure(batch) -> tuple:
+    """
+    Run a batch of lookups, returning the wall time and the loop lag the ticker saw.
+    """
+    lags = []
+    running = True
+
+    async def ticker():
+        while running:
+            expected = perf_counter() + TICK
+            await asyncio.sleep(TICK)
+            lags.append(max(0.0, perf_counter() - expected))
+
+    ticking = asyncio.ensure_future(ticker())
+    # let the ticker take its first measurement before the batch starts
+    await asyncio.sleep(0)
+    started = perf_counter()
+    await asyncio.gather(*batch())
+    elapsed = perf_counter() - started
+    running = False
+    await ticking
+
+    lags.sort()
+    return elapsed, lags[len(lags) // 2], lags[-1]
+
+
+async def benchmark(table: str, concurrency: list, latency: float, repeat: int):
+    """
+    Run the benchmark, printing a line per batch size and query path.
+
+    Args:
+        table: fact table to look facts up in
+        concurrency: numbers of concurrent lookups to run a batch of
+        latency: seconds of server side delay added to each statement
+        repeat: batches to run per batch size, the best one is reported
+    """
+    database = DatabaseManager()
+    query = _statement(table, latency)
+    values = ("test", "en")
+
+    async def blocking():
+        return _blocking_query(database, query, values)
+
+    for count in concurrency:
+        for label, lookup in (("query()", lambda: database.query(query, values)),
+                              ("blocking", blocking)):
+            runs = []
+            for _ in range(repeat):
+                runs.append(await _measure(lambda: [lookup() for _ in range(count)]))
+            elapsed, median, worst = min(runs)
+            print(f"{count:4d} concurrent {label:9s} {elapsed * 1e3:8.1f}ms total, "
+                  f"loop lag p50={median * 1e3:.1f}ms max={worst * 1e3:.1f}ms")
+
+
+def handle_args():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 5, 10, 20],
+                        help="numbers of concurrent lookups per batch, lookups beyond the 10 "
+                             "pooled connections wait for one")
+    parser.add_argument("--latency", type=float, default=0.01,
+                        help="seconds of server side delay added to each statement")
+    parser.add_argument("--repeat", type=int, default=3, help="batches per batch size")
+    parser.add_argument("--config", default="testing.toml",
+                        help="configuration file, relative to config/")
+    parser.add_argument("--table", help="fact table to query, [database]fact_table if omitted")
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = handle_args()
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    configuration, _ = load_config(args.config)
+    PLUGIN_MANAGER.hook.validate_config(data=configuration)  # pylint: disable=no-member
+    PLUGIN_MANAGER.hook.rehash_handler(data=configuration)  # pylint: disable=no-member
+
+    asyncio.get_event_loop().run_until_complete(
+        benchmark(args.table or configuration["database"]["fact_table"],
+                  args.concurrency, args.latency, args.repeat))
@@ -0,0 +1,178 @@
+"""
+replay_capture.py - Replays captured inbound IRC traffic against an offline bot
+
+Feeds the records of a capture file (see `[capture]` in configuration.md) through
+`MechaClient.on_message` of the unit tests' mock bot, which never touches the network. Replies are
+collected rather than sent, facts resolve as missing unless --facts is given.
+
+Reports throughput, the latency of handing each line off to the dispatcher, allocation counts and
+the slowest invocations as recorded by the command statistics.
+
+This script is STANDALONE and is not intended to be invoked by mecha.
+Run it from the repository root:
+
+    python tools/replay_capture.py logs/busy_evening.capture.gz --speed 0
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import argparse
+import asyncio
+import gc
+import pathlib
+import sys
+import tracemalloc
+from time import perf_counter
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+# pylint: disable=wrong-import-position
+from loguru import logger  # noqa: E402
+
+from src import commands  # noqa: E402 pylint: disable=unused-import
+from src.config import PLUGIN_MANAGER  # noqa: E402
+from src.config._parser import load_config  # noqa: E402
+from src.packages import ratmama  # noqa: E402 pylint: disable=unused-import
+from src.packages.capture import read_capture  # noqa: E402
+from src.packages.commands import stats  # noqa: E402
+from src.packages.fact_manager import FactManager  # noqa: E402
+from tests.fixtures.mock_bot import MockBot  # noqa: E402
+
+
+class OfflineFactManager(FactManager):
+    """
+    Fact manager that knows no facts and never touches the database
+    """
+
+    def __init__(self):  # pylint: disable=super-init-not-called
+        pass
+
+    async def exists(self, name: str, lang: str) -> bool:
+        return False
+
+    async def find_many(self, requests, admit=None):
+        return [None] * len(requests)
+
+
+def _percentile(ordered, fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def replay(path: str, speed: float, config: dict, facts: bool, trace: bool):
+    """
+    Replay a capture, then print a report.
+
+    Args:
+        path: capture file
+        speed: replay speed relative to the original, 0 replays as fast as possible
+        config: configuration to construct the bot with
+        facts: whether facts should be looked up in the configured database
+        trace: whether to trace allocations with tracemalloc
+    """
+    records = list(read_capture(path))
+    bot = MockBot(nickname=config["irc"]["nickname"], mecha_config=config)
+    if not facts:
+        bot.fact_manager = OfflineFactManager()
+
+    for record in records:
+        # senders whose host wasn't known at capture time replay as unidentified users
+        bot.users[record.sender.casefold()] = {
+            "nickname": record.sender,
+            "username": record.sender,
+            "hostname": record.hostname or "replay.invalid",
+            "away": False,
+            "away_message": None,
+            "account": record.sender if record.hostname else None,
+            "identified": record.hostname is not None,
+            "realname": record.sender,
+        }
+
+    stats.reset()
+    latencies = []
+    collections = [generation["collections"] for generation in gc.get_stats()]
+    if trace:
+        tracemalloc.start()
+    blocks = sys.getallocatedblocks()
+    loop = asyncio.get_event_loop()
+    started = loop.time()
+    wall = perf_counter()
+
+    for record in records:
+        if speed:
+            delay = record.offset / speed - (loop.time() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        else:
+            # like reading off the socket would, give the dispatcher's workers a go
+            await asyncio.sleep(0)
+        handed_off = perf_counter()
+        await bot.on_message(record.channel, record.sender, record.message)
+        latencies.append(perf_counter() - handed_off)
+
+    await bot.dispatcher.join()
+    elapsed = perf_counter() - wall
+    retained = sys.getallocatedblocks() - blocks
+    collected = [generation["collections"] - before
+                 for generation, before in zip(gc.get_stats(), collections)]
+
+    latencies.sort()
+    print(f"replayed {len(records)} lines in {elapsed:.3f}s "
+          f"({len(records) / elapsed if elapsed else 0:.1f} messages/sec), "
+          f"{len(bot.sent_messages)} replies")
+    print(f"dispatch latency p50={_percentile(latencies, 0.5) * 1e6:.0f}us "
+          f"p99={_percentile(latencies, 0.99) * 1e6:.0f}us "
+          f"max={(latencies[-1] if latencies else 0) * 1e6:.0f}us")
+    for lane, metrics in bot.dispatcher.metrics.items():
+        print(f"{lane.name.lower()} lane: submitted={metrics.submitted} dropped={metrics.dropped} "
+              f"failed={metrics.failed} mean wait={metrics.mean_wait * 1e3:.2f}ms")
+    print(f"allocated blocks retained={retained} gc collections={collected}")
+
+    if trace:
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"traced peak={peak / 1024:.1f}KiB, top allocation sites by count:")
+        for statistic in snapshot.statistics("lineno")[:5]:
+            print(f"    {statistic.count:8d} blocks {statistic.size / 1024:8.1f}KiB  "
+                  f"{statistic.traceback}")
+
+    slowest = sorted(stats.snapshot().items(),
+                     key=lambda item: item[1].wall.quantile(0.99), reverse=True)[:10]
+    if slowest:
+        print("slowest invocations:")
+    for (kind, name), value in slowest:
+        print(f"    {stats.summarize(kind, name, value)}")
+
+
+def handle_args():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("capture", help="capture file to replay")
+    parser.add_argument("--speed", type=float, default=0.0,
+                        help="replay speed, 1 replays at the original pace, 0 as fast as possible")
+    parser.add_argument("--config", default="testing.toml",
+                        help="configuration file, relative to config/")
+    parser.add_argument("--facts", action="store_true",
+                        help="look facts up in the configured database")
+    parser.add_argument("--trace", action="store_true", help="trace allocations")
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = handle_args()
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    configuration, _ = load_config(args.config)
+    PLUGIN_MANAGER.hook.validate_config(data=configuration)  # pylint: disable=no-member
+    PLUGIN_MANAGER.hook.rehash_handler(data=configuration)  # pylint: disable=no-member
+
+    asyncio.get_event_loop().run_until_complete(
+        replay(args.capture, args.speed, configuration, args.facts, args.trace))
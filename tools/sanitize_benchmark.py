@@ -0,0 +1,109 @@
+"""
+sanitize_benchmark.py - Microbenchmark for the inbound IRC text sanitizer
+
+Times `ratlib.sanitize` against the previous implementation over a synthetic corpus shaped like
+a busy rescue channel: mostly plain chatter and commands, with a sprinkling of colored
+announcements, bold text and stray tabs or double spaces.
+
+This script is STANDALONE and is not intended to be invoked by mecha.
+Run it from the repository root:
+
+    python tools/sanitize_benchmark.py --lines 10000 --repeat 5
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import argparse
+import pathlib
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from src.packages.utils.ratlib import sanitize, STRIPPED_CHARS  # noqa: E402 pylint: disable=C0413
+
+CHATTER = [
+    "o7 evening rats",
+    "wr+ #3",
+    "fr+ #12",
+    "sys conf, hopping now",
+    "!assign 3 SomeRat AnotherRat",
+    "!inject 4 client is in Fuelum, on emergency O2",
+    "#3 bc+",
+    "lul, 0mg haxor",
+    "!prep SomeClient",
+    "can anyone take a PS4 case near Colonia?",
+]
+
+FORMATTED = [
+    "\x0304RATSIGNAL\x03 - CMDR SomeClient - Reported System: \x02Fuelum\x02 - Platform: PC - "
+    "O2: \x0304NOT OK\x03 - Language: English (en-US)",
+    "Incoming Client: \x1fSomeClient\x1f - System: LHS 3447 - Platform: XB - O2: OK",
+    "\x02Bold\x02 \x1dItalic\x1d text",
+    "\x04FF0000red\x04 \x0400fF00green\x04",
+]
+
+MESSY = [
+    "fr+  #3",
+    "wr+\t#4",
+    " leading space",
+    "trailing space ",
+]
+
+
+def legacy_sanitize(message: str) -> str:
+    """
+    The sanitizer prior to precompiling, kept for comparison.
+    """
+    sanitized_string = message
+    control_code_regex = re.compile(r"([\x02\x1D\x1F\x1E\x11\x16\x0F]|"
+                                    r"(\x03([0-9]{1,2}(,[0-9]{1,2})?)?)|"
+                                    r"(\x04([0-9a-fA-F]{6}(,[0-9a-fA-F]{6})?)?))"
+                                    )
+    sanitized_string = control_code_regex.sub('', sanitized_string)
+    for character in sanitized_string:
+        if character in STRIPPED_CHARS:
+            sanitized_string = sanitized_string.replace(character, '')
+    return ' '.join(sanitized_string.split())
+
+
+def build_corpus(lines: int, seed: int):
+    """
+    Builds a corpus of roughly 90% plain, 7% formatted and 3% messy lines.
+    """
+    rng = random.Random(seed)
+    pools = (CHATTER, FORMATTED, MESSY)
+    return [rng.choice(rng.choices(pools, weights=(90, 7, 3))[0]) for _ in range(lines)]
+
+
+def handle_args():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("--lines", type=int, default=10_000, help="lines in the corpus")
+    parser.add_argument("--repeat", type=int, default=5, help="timing runs, the best is reported")
+    parser.add_argument("--seed", type=int, default=0, help="corpus random seed")
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = handle_args()
+    corpus = build_corpus(args.lines, args.seed)
+
+    assert [sanitize(line) for line in corpus] == [legacy_sanitize(line) for line in corpus], \
+        "sanitizers disagree"
+
+    results = {}
+    for name, function in (("legacy", legacy_sanitize), ("current", sanitize)):
+        best = min(timeit.repeat(lambda function=function: [function(line) for line in corpus],
+                                 number=1, repeat=args.repeat))
+        results[name] = best
+        print(f"{name:>8}: {best * 1e3:8.2f} ms  {best / len(corpus) * 1e9:8.0f} ns/line")
+
+    print(f"{'speedup':>8}: {results['legacy'] / results['current']:8.2f}x")